@@ -0,0 +1,22 @@
+-- Load-state ledger for checkpointed, resumable pipeline runs
+USE paris_traffic;
+
+CREATE TABLE etl_load_ledger (
+    source_file VARCHAR(255) NOT NULL,
+    chunk_offset INT NOT NULL,
+    source_date DATE,
+    row_count INT NOT NULL,
+    readings_count INT NOT NULL,
+    checksum CHAR(40) NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    PRIMARY KEY (source_file, chunk_offset),
+    INDEX idx_source_date (source_date)
+);
+
+CREATE TABLE etl_file_ledger (
+    source_file VARCHAR(255) PRIMARY KEY,
+    source_date DATE,
+    total_records INT NOT NULL,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,16 @@
+-- Additive sums and counts so hourly_stats can be re-aggregated exactly
+-- across hours, days and segments (see rollup.py)
+USE paris_traffic;
+
+ALTER TABLE hourly_stats
+    ADD COLUMN flow_sum BIGINT,
+    ADD COLUMN flow_count INT,
+    ADD COLUMN speed_sum DECIMAL(14, 2),
+    ADD COLUMN speed_count INT,
+    ADD COLUMN flow_speed_sum DECIMAL(14, 2),
+    ADD COLUMN flow_speed_count INT,
+    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD INDEX idx_hour_totals (hour, flow_sum, flow_count, speed_sum, speed_count, total_readings);
+
+-- Then fill it from the readings already loaded:
+--   python rollup.py
@@ -0,0 +1,19 @@
+-- Per-day speed histograms for approximate /analytics/speed-stats (see speed_sketch.py)
+USE paris_traffic;
+
+CREATE TABLE speed_sketches (
+    date DATE NOT NULL,
+    quality_score DECIMAL(3, 2) NOT NULL,
+    speed_bin INT NOT NULL,
+    readings INT NOT NULL,
+    speed_sum DECIMAL(16, 2) NOT NULL,
+    speed_sq_sum DECIMAL(22, 4) NOT NULL,
+    min_speed DECIMAL(6, 2) NOT NULL,
+    max_speed DECIMAL(6, 2) NOT NULL,
+    
+    PRIMARY KEY (date, quality_score, speed_bin),
+    INDEX idx_quality_bin (quality_score, speed_bin, readings, speed_sum, speed_sq_sum, min_speed, max_speed)
+);
+
+-- Then fill it from the readings already loaded:
+--   python rollup.py
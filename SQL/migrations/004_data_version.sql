@@ -0,0 +1,10 @@
+-- Data version counter for API result cache invalidation (see data_version.py)
+USE paris_traffic;
+
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_version (id, version) VALUES (1, 0);
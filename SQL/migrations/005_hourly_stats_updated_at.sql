@@ -0,0 +1,6 @@
+-- Index hourly_stats on updated_at, so the API's road network reads only
+-- the rows refreshed since its last check (api/network.py)
+USE paris_traffic;
+
+ALTER TABLE hourly_stats
+    ADD INDEX idx_updated_at (updated_at);
@@ -0,0 +1,33 @@
+-- Partition traffic_readings by month on timestamp (see partitions.py), so
+-- time-window queries read only the months they cover and a month can be
+-- dropped or archived as a whole partition. Partitioned InnoDB tables
+-- cannot have foreign keys, so the cascade to road_segments goes (DELETE
+-- /segments/{segment_id} deletes the readings itself), and every unique
+-- key must include timestamp, so it joins reading_id in the primary key.
+-- The ALTERs rebuild the table.
+USE paris_traffic;
+
+ALTER TABLE traffic_readings
+    DROP FOREIGN KEY traffic_readings_ibfk_1;
+
+ALTER TABLE traffic_readings
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (reading_id, timestamp);
+
+ALTER TABLE traffic_readings
+PARTITION BY RANGE COLUMNS(timestamp) (
+    PARTITION p_before VALUES LESS THAN ('2023-01-01 00:00:00'),
+    PARTITION p202301 VALUES LESS THAN ('2023-02-01 00:00:00'),
+    PARTITION p202302 VALUES LESS THAN ('2023-03-01 00:00:00'),
+    PARTITION p202303 VALUES LESS THAN ('2023-04-01 00:00:00'),
+    PARTITION p202304 VALUES LESS THAN ('2023-05-01 00:00:00'),
+    PARTITION p202305 VALUES LESS THAN ('2023-06-01 00:00:00'),
+    PARTITION p202306 VALUES LESS THAN ('2023-07-01 00:00:00'),
+    PARTITION p202307 VALUES LESS THAN ('2023-08-01 00:00:00'),
+    PARTITION p202308 VALUES LESS THAN ('2023-09-01 00:00:00'),
+    PARTITION p202309 VALUES LESS THAN ('2023-10-01 00:00:00'),
+    PARTITION p202310 VALUES LESS THAN ('2023-11-01 00:00:00'),
+    PARTITION p202311 VALUES LESS THAN ('2023-12-01 00:00:00'),
+    PARTITION p202312 VALUES LESS THAN ('2024-01-01 00:00:00'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,12 @@
+-- Record on each hourly_stats row the data version its transaction committed
+-- as, so the API's road network reads the rows of the versions it has not
+-- seen yet (api/network.py). updated_at is stamped when a statement runs, not
+-- at commit, so it could miss rows of long transactions.
+USE paris_traffic;
+
+ALTER TABLE hourly_stats
+    ADD COLUMN version BIGINT,
+    ADD INDEX idx_version (version),
+    DROP INDEX idx_updated_at;
+
+-- Existing rows keep version NULL; the network reads them when it is built.
@@ -19,7 +19,7 @@ CREATE TABLE road_segments (
 );
 
 CREATE TABLE traffic_readings (
-    reading_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    reading_id BIGINT AUTO_INCREMENT,
     segment_id VARCHAR(50) NOT NULL,
     timestamp DATETIME NOT NULL,
     traffic_flow INT,
@@ -32,13 +32,31 @@ CREATE TABLE traffic_readings (
     quality_score DECIMAL(3, 2),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
-    FOREIGN KEY (segment_id) REFERENCES road_segments(segment_id) ON DELETE CASCADE,
+    PRIMARY KEY (reading_id, timestamp),
     UNIQUE KEY unique_reading (segment_id, timestamp),
     INDEX idx_timestamp (timestamp),
     INDEX idx_traffic_state (traffic_state),
     INDEX idx_segment_time (segment_id, timestamp),
     INDEX idx_quality (data_quality_flag),
     INDEX idx_quality_score (quality_score)
+)
+-- Monthly partitions (see partitions.py). Partitioned tables cannot have
+-- foreign keys: segment deletes remove their readings explicitly.
+PARTITION BY RANGE COLUMNS(timestamp) (
+    PARTITION p_before VALUES LESS THAN ('2023-01-01 00:00:00'),
+    PARTITION p202301 VALUES LESS THAN ('2023-02-01 00:00:00'),
+    PARTITION p202302 VALUES LESS THAN ('2023-03-01 00:00:00'),
+    PARTITION p202303 VALUES LESS THAN ('2023-04-01 00:00:00'),
+    PARTITION p202304 VALUES LESS THAN ('2023-05-01 00:00:00'),
+    PARTITION p202305 VALUES LESS THAN ('2023-06-01 00:00:00'),
+    PARTITION p202306 VALUES LESS THAN ('2023-07-01 00:00:00'),
+    PARTITION p202307 VALUES LESS THAN ('2023-08-01 00:00:00'),
+    PARTITION p202308 VALUES LESS THAN ('2023-09-01 00:00:00'),
+    PARTITION p202309 VALUES LESS THAN ('2023-10-01 00:00:00'),
+    PARTITION p202310 VALUES LESS THAN ('2023-11-01 00:00:00'),
+    PARTITION p202311 VALUES LESS THAN ('2023-12-01 00:00:00'),
+    PARTITION p202312 VALUES LESS THAN ('2024-01-01 00:00:00'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
 );
 
 CREATE TABLE data_quality_log (
@@ -66,9 +84,61 @@ CREATE TABLE hourly_stats (
     total_readings INT,
     missing_readings INT,
     data_quality_score DECIMAL(3, 2),
+    flow_sum BIGINT,
+    flow_count INT,
+    speed_sum DECIMAL(14, 2),
+    speed_count INT,
+    flow_speed_sum DECIMAL(14, 2),
+    flow_speed_count INT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    version BIGINT,
     
     FOREIGN KEY (segment_id) REFERENCES road_segments(segment_id) ON DELETE CASCADE,
     UNIQUE KEY unique_hour_stat (segment_id, date, hour),
     INDEX idx_date (date),
-    INDEX idx_hour (hour)
-);
\ No newline at end of file
+    INDEX idx_hour (hour),
+    INDEX idx_hour_totals (hour, flow_sum, flow_count, speed_sum, speed_count, total_readings),
+    INDEX idx_version (version)
+);
+
+CREATE TABLE etl_load_ledger (
+    source_file VARCHAR(255) NOT NULL,
+    chunk_offset INT NOT NULL,
+    source_date DATE,
+    row_count INT NOT NULL,
+    readings_count INT NOT NULL,
+    checksum CHAR(40) NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    PRIMARY KEY (source_file, chunk_offset),
+    INDEX idx_source_date (source_date)
+);
+
+CREATE TABLE etl_file_ledger (
+    source_file VARCHAR(255) PRIMARY KEY,
+    source_date DATE,
+    total_records INT NOT NULL,
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE speed_sketches (
+    date DATE NOT NULL,
+    quality_score DECIMAL(3, 2) NOT NULL,
+    speed_bin INT NOT NULL,
+    readings INT NOT NULL,
+    speed_sum DECIMAL(16, 2) NOT NULL,
+    speed_sq_sum DECIMAL(22, 4) NOT NULL,
+    min_speed DECIMAL(6, 2) NOT NULL,
+    max_speed DECIMAL(6, 2) NOT NULL,
+    
+    PRIMARY KEY (date, quality_score, speed_bin),
+    INDEX idx_quality_bin (quality_score, speed_bin, readings, speed_sum, speed_sq_sum, min_speed, max_speed)
+);
+
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_version (id, version) VALUES (1, 0);
\ No newline at end of file
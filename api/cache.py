@@ -0,0 +1,231 @@
+from fastapi import Request, Response
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlencode
+import asyncio
+import hashlib
+import time
+import sys
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.database import execute_query_async
+import data_version
+
+try:
+    from config import CACHE_CONFIG
+except ImportError:
+    CACHE_CONFIG = {}
+
+# Cache settings, overridable with CACHE_CONFIG in config.py
+CACHE_DEFAULTS = {
+    'max_entries': 512,              # cached responses kept (least recently used evicted)
+    'max_bytes': 64 * 1024 * 1024,   # total size of cached response bodies
+    'max_age': 0,                    # Cache-Control max-age for clients (0: always revalidate)
+    'version_ttl': 1.0,              # seconds between reads of the data version
+}
+
+# GET requests under these paths are cached
+CACHED_PREFIXES = ('/analytics/',)
+
+class CachedResponse(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    media_type: str
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+class ResultCache:
+    """
+    LRU cache of serialized GET responses, valid for one data version.
+
+    The data version is a counter in MySQL (data_version.py) bumped by every
+    transaction that changes the data, including loader commits from other
+    processes. It is read at most every version_ttl seconds; when it changes,
+    every cached response is dropped. A successful POST/PUT/DELETE through
+    this process forces a fresh read on the next request.
+
+    Responses carry an ETag (hash of the body) and Cache-Control, so clients
+    revalidate with If-None-Match and get 304 Not Modified. Concurrent misses
+    for the same key wait for the first one instead of all running the query.
+
+    Usage (as HTTP middleware):
+        return await cache.handle(request, call_next)
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024,
+                 max_age: int = 0, version_ttl: float = 1.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.version_ttl = version_ttl
+
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version: Optional[int] = None
+        self._version_checked = float('-inf')
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    async def current_version(self) -> Optional[int]:
+        """The data version, or None if it cannot be read (caching is then skipped)."""
+        now = time.monotonic()
+        if now - self._version_checked < self.version_ttl:
+            return self._version
+
+        try:
+            rows = await execute_query_async(data_version.VERSION_QUERY)
+            version = rows[0]['version'] if rows else None
+        except Exception as err:
+            logger.warning(f"Cannot read the data version ({err}), not caching")
+            version = None
+        self._version_checked = now
+
+        if version != self._version:
+            if self._entries:
+                self._stats['invalidations'] += 1
+                logger.info(f"Data version {self._version} -> {version}: "
+                            f"dropping {len(self._entries)} cached responses")
+            self.clear()
+            self._version = version
+        return version
+
+    def note_write(self):
+        """Re-read the data version on the next request."""
+        self._version_checked = float('-inf')
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get(self, key: str, version: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if len(entry.body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self._stats['evictions'] += 1
+
+    def _response(self, request: Request, entry: CachedResponse, status: str) -> Response:
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': f"max-age={self.max_age}" if self.max_age else 'no-cache',
+            'X-Cache': status,
+        }
+        if _etag_matches(request.headers.get('if-none-match'), entry.etag):
+            self._stats['not_modified'] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    async def _compute(self, request: Request, key: str, version: int,
+                       call_next: Callable[[Request], Awaitable[Response]]):
+        """Run the route; returns a CachedResponse, or the route's own response if not 200."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        entry = None
+        try:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, 'body_iterator'):
+                body = b''.join([chunk async for chunk in response.body_iterator])
+            else:
+                body = response.body
+            entry = CachedResponse(version, _etag(body), body,
+                                   response.headers.get('content-type', 'application/json'))
+            self.put(key, entry)
+            return entry
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_result(entry)
+
+    async def handle(self, request: Request,
+                     call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        if request.method != 'GET' or not request.url.path.startswith(CACHED_PREFIXES):
+            response = await call_next(request)
+            if request.method in ('POST', 'PUT', 'DELETE') and response.status_code < 400:
+                self.note_write()
+            return response
+
+        version = await self.current_version()
+        if version is None:
+            return await call_next(request)
+
+        key = f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+        entry = self.get(key, version)
+        if entry is not None:
+            self._stats['hits'] += 1
+            return self._response(request, entry, 'HIT')
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            entry = await asyncio.shield(inflight)
+            if entry is not None:
+                self._stats['hits'] += 1
+                return self._response(request, entry, 'HIT')
+
+        self._stats['misses'] += 1
+        result = await self._compute(request, key, version, call_next)
+        if not isinstance(result, CachedResponse):
+            return result
+        return self._response(request, result, 'MISS')
+
+    def stats(self) -> Dict:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'data_version': self._version,
+            'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None,
+            **self._stats,
+        }
+
+_cache: Optional[ResultCache] = None
+
+def init_cache(**overrides) -> ResultCache:
+    """Create the process-wide result cache from CACHE_CONFIG (and any overrides)."""
+    global _cache
+    if _cache is None:
+        settings = {**CACHE_DEFAULTS, **CACHE_CONFIG, **overrides}
+        _cache = ResultCache(**settings)
+        logger.info(f"Result cache ready ({_cache.max_entries} entries, "
+                    f"{_cache.max_bytes // (1024 * 1024)} MB)")
+    return _cache
+
+def get_cache() -> ResultCache:
+    """The process-wide result cache, created on first use."""
+    return _cache if _cache is not None else init_cache()
@@ -1,5 +1,12 @@
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
+import aiomysql
+from contextlib import contextmanager, asynccontextmanager
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, Tuple
+import asyncio
+import threading
+import time
 import sys
 import os
 import logging
@@ -9,9 +16,337 @@ logger = logging.getLogger(__name__)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import DB_CONFIG
 
+try:
+    from config import POOL_CONFIG
+except ImportError:
+    POOL_CONFIG = {}
+
+# Pool settings, overridable with POOL_CONFIG in config.py
+POOL_DEFAULTS = {
+    'size': 5,             # connections kept open
+    'max_overflow': 10,    # extra connections opened under load, closed on release
+    'timeout': 10.0,       # seconds to wait for a free connection
+    'ping_after': 5.0,     # ping connections idle for longer than this on checkout
+}
+
+class PoolTimeoutError(Exception):
+    """No connection became free within the pool timeout."""
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections.
+
+    Up to size connections are kept open between requests; under load up to
+    max_overflow more are opened and closed again when released. When all
+    size + max_overflow connections are in use, checkout waits up to timeout
+    seconds and then raises PoolTimeoutError.
+
+    Connections run in autocommit mode, so a pooled connection never holds an
+    old read snapshot; multi-statement writes use conn.start_transaction().
+    A connection that has been idle for longer than ping_after seconds is
+    pinged on checkout and replaced if it is dead.
+
+    Usage:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+    """
+
+    def __init__(self, size: int = 5, max_overflow: int = 10, timeout: float = 10.0,
+                 ping_after: float = 5.0, **connect_args):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.connect_args = connect_args
+
+        self._idle = deque()    # (connection, released_at), most recent on the right
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+            'connections_created': 0,
+            'health_check_failures': 0,
+        }
+
+    def _connect(self) -> MySQLConnection:
+        conn = mysql.connector.connect(**self.connect_args, autocommit=True)
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def acquire(self) -> MySQLConnection:
+        """
+        Check out a healthy connection.
+
+        Raises:
+            PoolTimeoutError if none is free within timeout seconds
+            mysql.connector.Error if a new connection cannot be opened
+        """
+        deadline = time.monotonic() + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    # Reserve the slot, connect outside the lock
+                    self._open += 1
+                    conn, released_at = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection free after {self.timeout}s "
+                        f"({self._open} in use)"
+                    )
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                wait_started = time.monotonic()
+                self._cond.wait(remaining)
+                self._stats['wait_seconds'] += time.monotonic() - wait_started
+
+            self._stats['checkouts'] += 1
+
+        try:
+            if conn is None:
+                return self._connect()
+            if time.monotonic() - released_at > self.ping_after:
+                try:
+                    conn.ping(reconnect=False)
+                except mysql.connector.Error as err:
+                    logger.warning(f"Pooled connection failed health check ({err}), reconnecting")
+                    with self._cond:
+                        self._stats['health_check_failures'] += 1
+                    _close_quietly(conn)
+                    return self._connect()
+            return conn
+        except BaseException:
+            self._discard_slot()
+            raise
+
+    def release(self, conn: MySQLConnection, broken: bool = False):
+        """Return a connection (closed instead if broken, overflow or the pool is closed)."""
+        with self._cond:
+            if not broken and not self._closed and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+
+        _close_quietly(conn)
+        self._discard_slot()
+
+    def _discard_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Generator[MySQLConnection, None, None]:
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except mysql.connector.Error:
+            broken = not conn.is_connected()
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                **self._stats,
+            }
+
+    def close(self):
+        """Close idle connections; connections in use are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+def _close_quietly(conn: MySQLConnection):
+    try:
+        conn.close()
+    except mysql.connector.Error:
+        pass
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def init_pool(**overrides) -> ConnectionPool:
+    """Create the process-wide pool from POOL_CONFIG (and any overrides)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = {**POOL_DEFAULTS, **POOL_CONFIG, **overrides}
+            _pool = ConnectionPool(**settings, **DB_CONFIG)
+            logger.info(f"Connection pool ready (size {settings['size']}, "
+                        f"overflow {settings['max_overflow']})")
+        return _pool
+
+def close_pool():
+    """Close the process-wide pool (at app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_pool() -> ConnectionPool:
+    """The process-wide pool for sync callers, created on first use."""
+    return _pool if _pool is not None else init_pool()
+
+class AsyncConnectionPool:
+    """
+    aiomysql pool with the same settings and stats as ConnectionPool, used
+    by the async routes so a request waiting on MySQL does not hold a thread.
+
+    size connections are opened at startup (minsize) and up to max_overflow
+    more under load; overflow connections are closed when released while
+    size connections are already idle. Checkout waits up to timeout seconds.
+    aiomysql drops connections closed by the server; on top of that,
+    connections idle for longer than ping_after seconds are pinged.
+    """
+
+    def __init__(self, pool: aiomysql.Pool, size: int, max_overflow: int,
+                 timeout: float, ping_after: float):
+        self.pool = pool
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+            'health_check_failures': 0,
+        }
+
+    @classmethod
+    async def create(cls, size: int = 5, max_overflow: int = 10, timeout: float = 10.0,
+                     ping_after: float = 5.0, **connect_args) -> 'AsyncConnectionPool':
+        # DB_CONFIG uses mysql-connector names; aiomysql calls the schema 'db'
+        connect_args = dict(connect_args)
+        if 'database' in connect_args:
+            connect_args['db'] = connect_args.pop('database')
+        pool = await aiomysql.create_pool(minsize=size, maxsize=size + max_overflow,
+                                          autocommit=True, charset='utf8mb4', **connect_args)
+        return cls(pool, size, max_overflow, timeout, ping_after)
+
+    async def acquire(self) -> aiomysql.Connection:
+        """
+        Check out a healthy connection.
+
+        Raises:
+            PoolTimeoutError if none is free within timeout seconds
+        """
+        if self.pool.freesize == 0 and self.pool.size >= self.pool.maxsize:
+            self._stats['waits'] += 1
+
+        started = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(self.pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"No database connection free after {self.timeout}s "
+                f"({self.pool.size} in use)"
+            ) from None
+        finally:
+            self._stats['wait_seconds'] += time.monotonic() - started
+        self._stats['checkouts'] += 1
+
+        if asyncio.get_running_loop().time() - conn.last_usage > self.ping_after:
+            try:
+                await conn.ping(reconnect=True)
+            except Exception as err:
+                logger.warning(f"Pooled connection failed health check ({err})")
+                self._stats['health_check_failures'] += 1
+                conn.close()
+                self.pool.release(conn)
+                raise
+        return conn
+
+    def release(self, conn: aiomysql.Connection, broken: bool = False):
+        if broken or self.pool.freesize >= self.size:
+            conn.close()
+        self.pool.release(conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncGenerator[aiomysql.Connection, None]:
+        conn = await self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (aiomysql.OperationalError, aiomysql.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def stats(self) -> Dict:
+        return {
+            'size': self.size,
+            'max_overflow': self.max_overflow,
+            'open': self.pool.size,
+            'idle': self.pool.freesize,
+            'in_use': self.pool.size - self.pool.freesize,
+            **self._stats,
+        }
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+_async_pool: Optional[AsyncConnectionPool] = None
+
+async def init_async_pool(**overrides) -> AsyncConnectionPool:
+    """Create the async pool (at app startup) from POOL_CONFIG (and any overrides)."""
+    global _async_pool
+    if _async_pool is None:
+        settings = {**POOL_DEFAULTS, **POOL_CONFIG, **overrides}
+        _async_pool = await AsyncConnectionPool.create(**settings, **DB_CONFIG)
+        logger.info(f"Async connection pool ready (size {_async_pool.size}, "
+                    f"overflow {_async_pool.max_overflow})")
+    return _async_pool
+
+async def close_async_pool():
+    """Close the async pool (at app shutdown)."""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """The async pool, created on first use outside the app."""
+    return _async_pool if _async_pool is not None else await init_async_pool()
+
 def get_connection() -> MySQLConnection:
     """
-    Create and return a MySQL database connection.
+    Create and return a new (unpooled) MySQL database connection.
     
     Returns:
         MySQLConnection object
@@ -37,15 +372,14 @@ def execute_query(query: str, params: tuple = None) -> list:
     Returns:
         List of row dictionaries
     """
-    conn = get_connection()
-    try:
+    with get_pool().connection() as conn:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute(query, params or ())
-        results = cursor.fetchall()
-        return results
-    finally:
-        cursor.close()
-        conn.close()
+        try:
+            cursor.execute(query, params or ())
+            results = cursor.fetchall()
+            return results
+        finally:
+            cursor.close()
 
 def execute_write(query: str, params: tuple = None) -> int:
     """
@@ -58,15 +392,96 @@ def execute_write(query: str, params: tuple = None) -> int:
     Returns:
         Number of affected rows
     """
-    conn = get_connection()
-    try:
+    with get_pool().connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(query, params or ())
-        conn.commit()
-        return cursor.rowcount
-    except mysql.connector.Error as err:
-        conn.rollback()
-        raise
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        try:
+            cursor.execute(query, params or ())
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+async def execute_query_async(query: str, params: tuple = None) -> list:
+    """
+    Execute a SELECT query on the async pool and return results.
+    
+    Args:
+        query: SQL query string
+        params: Query parameters (for parameterized queries)
+        
+    Returns:
+        List of row dictionaries
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params or None)
+            return list(await cursor.fetchall())
+
+async def execute_write_async(query: str, params: tuple = None) -> int:
+    """
+    Execute an INSERT, UPDATE, or DELETE query on the async pool.
+    
+    Args:
+        query: SQL query string
+        params: Query parameters
+        
+    Returns:
+        Number of affected rows
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, params or None)
+            return cursor.rowcount
+async def stream_query_async(query: str, params: tuple = None,
+                             batch_size: int = 10000) -> AsyncGenerator[list, None]:
+    """
+    Execute a SELECT query on the async pool with a server-side cursor and
+    yield its rows in batches, so large results are never held in memory at once.
+    
+    Args:
+        query: SQL query string
+        params: Query parameters (for parameterized queries)
+        batch_size: Rows per batch
+        
+    Yields:
+        Lists of up to batch_size row tuples
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor(aiomysql.SSCursor) as cursor:
+            await cursor.execute(query, params or None)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+async def execute_transaction_async(statements: List[Tuple[str, Any]]) -> List[int]:
+    """
+    Execute several writes on the async pool in one transaction.
+    
+    Args:
+        statements: (query, params) pairs, executed in order. A list of
+            tuples as params runs the query once per tuple (executemany)
+        
+    Returns:
+        Number of affected rows per statement
+    """
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        await conn.begin()
+        try:
+            counts = []
+            async with conn.cursor() as cursor:
+                for query, params in statements:
+                    if params and isinstance(params, list) and isinstance(params[0], tuple):
+                        await cursor.executemany(query, params)
+                    else:
+                        await cursor.execute(query, params or None)
+                    counts.append(cursor.rowcount)
+            await conn.commit()
+            return counts
+        except BaseException:
+            await conn.rollback()
+            raise
\ No newline at end of file
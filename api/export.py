@@ -0,0 +1,116 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncGenerator, AsyncIterable, Callable, Dict, List, Sequence
+import csv
+import io
+import json
+
+import pyarrow as pa
+
+# Encoders for GET /readings/export. Each one takes the row batches of a
+# server-side cursor (stream_query_async) and yields encoded chunks, so an
+# export holds one batch at a time whatever its size. Rows are tuples in
+# EXPORT_COLUMNS order.
+
+EXPORT_COLUMNS = [
+    'reading_id', 'segment_id', 'timestamp', 'traffic_flow', 'avg_speed',
+    'traffic_state', 'sensor_status', 'is_flow_imputed', 'is_speed_corrected',
+    'data_quality_flag', 'quality_score',
+]
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+EXPORT_SCHEMA = pa.schema([
+    ('reading_id', pa.int64()),
+    ('segment_id', pa.string()),
+    ('timestamp', pa.timestamp('s')),
+    ('traffic_flow', pa.int32()),
+    ('avg_speed', pa.float64()),
+    ('traffic_state', _DICTIONARY),
+    ('sensor_status', _DICTIONARY),
+    ('is_flow_imputed', pa.bool_()),
+    ('is_speed_corrected', pa.bool_()),
+    ('data_quality_flag', _DICTIONARY),
+    ('quality_score', pa.float64()),
+])
+
+# MySQL returns BOOLEAN columns as 0/1
+_BOOLEAN_COLUMNS = {'is_flow_imputed', 'is_speed_corrected'}
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+def _value(column: str, value):
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if column in _BOOLEAN_COLUMNS:
+        return bool(value)
+    return value
+
+async def ndjson_chunks(batches: AsyncIterable[List[tuple]]) -> AsyncGenerator[bytes, None]:
+    """One JSON object per line."""
+    async for rows in batches:
+        lines = [json.dumps({column: _value(column, value)
+                             for column, value in zip(EXPORT_COLUMNS, row)},
+                            ensure_ascii=False, separators=(',', ':'))
+                 for row in rows]
+        yield ('\n'.join(lines) + '\n').encode()
+
+async def csv_chunks(batches: AsyncIterable[List[tuple]]) -> AsyncGenerator[bytes, None]:
+    """CSV with a header row; NULL is an empty field."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows([[_value(column, value) for column, value in zip(EXPORT_COLUMNS, row)]
+                          for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _record_batch(rows: Sequence[tuple]) -> pa.RecordBatch:
+    arrays = []
+    for position, field in enumerate(EXPORT_SCHEMA):
+        values = [row[position] for row in rows]
+        if field.name in _BOOLEAN_COLUMNS:
+            values = [None if value is None else bool(value) for value in values]
+        elif pa.types.is_floating(field.type):
+            values = [None if value is None else float(value) for value in values]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=EXPORT_SCHEMA)
+
+async def arrow_chunks(batches: AsyncIterable[List[tuple]]) -> AsyncGenerator[bytes, None]:
+    """Arrow IPC stream, one record batch per cursor batch (each with its own dictionaries)."""
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+
+    def take() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield take()
+    async for rows in batches:
+        writer.write_batch(_record_batch(rows))
+        yield take()
+    writer.close()
+    yield take()
+
+ENCODERS: Dict[str, Callable] = {
+    'ndjson': ndjson_chunks,
+    'csv': csv_chunks,
+    'arrow': arrow_chunks,
+}
@@ -1,12 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 import logging
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from api.routes import segments, readings, analytics
+from api.routes import segments, readings, analytics, network
+from api.database import init_async_pool, close_async_pool, get_async_pool, PoolTimeoutError
+from api.cache import init_cache, get_cache
+from api.spatial import get_segment_index
+from api.network import get_network
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,12 +20,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database connection pool at startup and close it at shutdown."""
+    await init_async_pool()
+    init_cache()
+    try:
+        await get_segment_index().refresh()
+    except Exception as err:
+        logger.warning(f"Segment index not built at startup ({err}), building on first use")
+    try:
+        await get_network().rebuild()
+    except Exception as err:
+        logger.warning(f"Road network not built at startup ({err}), building on first use")
+    yield
+    await close_async_pool()
+
 app = FastAPI(
     title="Paris Traffic API",
     description="REST API for Paris road traffic sensor data (January 2023)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Registered before CORS so CORS headers are added to cached responses too
+@app.middleware("http")
+async def result_cache(request: Request, call_next):
+    """Serve repeated analytics requests from the result cache"""
+    return await get_cache().handle(request, call_next)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,14 +59,42 @@ app.add_middleware(
 app.include_router(segments.router, prefix="/segments", tags=["Segments"])
 app.include_router(readings.router, prefix="/readings", tags=["Readings"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(network.router, prefix="/network", tags=["Network"])
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """All database connections busy: ask the client to retry"""
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"},
+                        headers={"Retry-After": "1"})
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Check if the API is running"""
     return {
         "status": "ok",
     }
 
+@app.get("/health/pool")
+async def pool_stats():
+    """Database connection pool stats (open, in use, waits, timeouts)"""
+    return (await get_async_pool()).stats()
+
+@app.get("/health/cache")
+async def cache_stats():
+    """Result cache stats (entries, hits, misses, evictions, data version)"""
+    return get_cache().stats()
+
+@app.get("/health/spatial")
+async def spatial_stats():
+    """Segment spatial index stats (segments, cell size, build time, data version)"""
+    return get_segment_index().stats()
+
+@app.get("/health/network")
+async def network_stats():
+    """Road network graph stats (nodes, edges, build time, speed refreshes)"""
+    return get_network().stats()
+
 if __name__ == '__main__':
     import uvicorn
     uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 # Road Segment Models
@@ -24,6 +24,12 @@ class RoadSegmentResponse(RoadSegmentBase):
     class Config:
         from_attributes = True
 
+class NearbySegmentResponse(RoadSegmentResponse):
+    distance_m: float
+
+class SegmentSearchResponse(RoadSegmentResponse):
+    match: str
+
 # Traffic Reading Models
 class TrafficReadingBase(BaseModel):
     segment_id: str
@@ -47,6 +53,19 @@ class TrafficReadingResponse(TrafficReadingBase):
     class Config:
         from_attributes = True
 
+# Batch Ingest Models
+class BatchRowResult(BaseModel):
+    index: int
+    accepted: bool
+    reason: Optional[str] = None
+    data_quality_flag: Optional[str] = None
+    quality_score: Optional[float] = None
+
+class BatchIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[BatchRowResult]
+
 # Analytics Models
 class PeakHourResponse(BaseModel):
     hour: int
@@ -71,6 +90,7 @@ class SpeedStatsResponse(BaseModel):
     min_speed: float
     max_speed: float
     sample_size: int
+    exact: bool = True
 
 class QualityReportResponse(BaseModel):
     data_quality_flag: str
@@ -85,7 +105,44 @@ class CongestionHotspotResponse(BaseModel):
     saturated_count: int
     total_incidents: int
 
+# Network Models
+class RouteStep(BaseModel):
+    segment_id: str
+    street_name: Optional[str] = None
+    from_node: str
+    to_node: str
+    length_m: float
+    speed_kmh: float
+    travel_time_s: float
+
+class RouteResponse(BaseModel):
+    from_node: str
+    to_node: str
+    speeds: str
+    travel_time_s: float
+    distance_m: float
+    steps: List[RouteStep]
+
+class ReachableNode(BaseModel):
+    node_id: str
+    node_name: Optional[str] = None
+    travel_time_s: float
+
+class ReachableResponse(BaseModel):
+    node: str
+    minutes: float
+    speeds: str
+    nodes: List[ReachableNode]
+
 # Pagination Model
 class PaginationParams(BaseModel):
     skip: int = Field(default=0, ge=0)
-    limit: int = Field(default=100, ge=1, le=1000)
\ No newline at end of file
+    limit: int = Field(default=100, ge=1, le=1000)
+
+class SegmentPage(BaseModel):
+    items: List[RoadSegmentResponse]
+    next_cursor: Optional[str] = None
+
+class ReadingPage(BaseModel):
+    items: List[TrafficReadingResponse]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,428 @@
+from datetime import date
+from heapq import heappop, heappush
+from typing import Dict, List, Optional, Tuple
+import ast
+import asyncio
+import json
+import math
+import time
+import sys
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.database import execute_query_async
+from api.spatial import haversine_m
+import data_version
+
+# Directed road graph for /network/route and /network/reachable.
+#
+# Every segment is an edge from its upstream node to its downstream node.
+# The graph is stored CSR-style: edges sorted by source node, indptr[n] to
+# indptr[n + 1] being the edges leaving node n, with per-edge arrays for
+# target, segment and length (metres, along geometry_json). Queries run
+# Dijkstra over plain lists of those arrays, which is faster than numpy for
+# the one-edge-at-a-time access of a heap search.
+#
+# Edge travel time is length / speed, speeds coming from hourly_stats:
+# - current: the segment's most recent hour with a speed
+# - historical (a departure time `at`): the segment's mean speed at that
+#   hour of day over every loaded day
+# falling back to the segment's mean over all hours, then to the network
+# median. Weights are fixed for the whole trip (departure hour).
+#
+# When the data version moves, speeds are refreshed incrementally: only
+# hourly_stats rows written by later versions than the last check are read
+# (rows carry the version their transaction committed as, and versions
+# follow commit order, see rollup.py), and the profile is recomputed for
+# the hours they touch.
+# The graph is rebuilt from scratch only when its segments signature
+# (segments, their nodes, street names and geometry) changes. Hours whose
+# last reading was deleted keep their old speed until the next rebuild.
+
+# Speed floor, so blocked segments (0 km/h) stay finite
+MIN_SPEED_KMH = 1.0
+
+# Used when no segment has a speed at all (Paris average rush hour speed)
+DEFAULT_SPEED_KMH = 19.0
+
+# Seconds between data version checks
+VERSION_TTL = 1.0
+
+SEGMENTS_QUERY = """
+SELECT segment_id, street_name, upstream_node_id, upstream_node_name,
+       downstream_node_id, downstream_node_name, geometry_json
+FROM road_segments
+WHERE upstream_node_id IS NOT NULL AND downstream_node_id IS NOT NULL
+"""
+
+TOPOLOGY_QUERY = """
+SELECT COUNT(*) as segments,
+       COALESCE(SUM(CRC32(CONCAT_WS('|', segment_id, upstream_node_id, downstream_node_id,
+                                     street_name, geometry_json))), 0) as signature
+FROM road_segments
+WHERE upstream_node_id IS NOT NULL AND downstream_node_id IS NOT NULL
+"""
+
+PROFILE_QUERY = """
+SELECT segment_id, hour, SUM(speed_sum) as speed_sum, SUM(speed_count) as speed_count
+FROM hourly_stats
+WHERE speed_count > 0 {hours}
+GROUP BY segment_id, hour
+"""
+
+# Current speeds come from the last two loaded days (a segment without a speed
+# there falls back to its mean)
+LATEST_QUERY = """
+SELECT segment_id, date, hour, speed_sum, speed_count
+FROM hourly_stats
+WHERE speed_count > 0
+AND date >= (SELECT MAX(date) FROM hourly_stats) - INTERVAL 1 DAY
+"""
+
+UPDATED_QUERY = """
+SELECT segment_id, date, hour, speed_sum, speed_count
+FROM hourly_stats
+WHERE version > %s AND speed_count > 0
+"""
+
+def _coordinates(geometry) -> List[List[Tuple[float, float]]]:
+    """Lines of (lon, lat) points from a GeoJSON Feature or geometry."""
+    if isinstance(geometry, dict) and 'geometry' in geometry:
+        geometry = geometry['geometry']
+    if not isinstance(geometry, dict):
+        return []
+    coordinates = geometry.get('coordinates') or []
+    if geometry.get('type') == 'LineString':
+        return [coordinates]
+    if geometry.get('type') == 'MultiLineString':
+        return coordinates
+    return []
+
+def line_length_m(geometry_json: Optional[str]) -> Optional[float]:
+    """
+    Length in metres of a segment's geometry_json (the str() of the source
+    geo_shape, or JSON). None if it is missing or not a line.
+    """
+    if not geometry_json:
+        return None
+    try:
+        geometry = ast.literal_eval(geometry_json)
+    except (ValueError, SyntaxError):
+        try:
+            geometry = json.loads(geometry_json)
+        except ValueError:
+            return None
+
+    length = 0.0
+    for line in _coordinates(geometry):
+        if len(line) < 2:
+            continue
+        points = np.array(line, dtype=float)
+        lons, lats = points[:, 0], points[:, 1]
+        length += float(haversine_m(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum())
+    return length if length > 0 else None
+
+class RoadNetwork:
+    """
+    CSR road graph with hour-of-day and current speeds per edge.
+
+    Usage:
+        network = RoadNetwork(segment_rows)
+        network.add_profile(profile_rows)    # PROFILE_QUERY rows
+        network.add_latest(latest_rows)      # LATEST_QUERY / UPDATED_QUERY rows
+        network.route('9000', '9042', hour=8)
+        network.reachable('9000', seconds=600)
+    """
+
+    def __init__(self, rows: List[Dict]):
+        node_ids: Dict[str, int] = {}
+        node_names: List[Optional[str]] = []
+
+        def node(node_id: str, name: Optional[str]) -> int:
+            if node_id not in node_ids:
+                node_ids[node_id] = len(node_names)
+                node_names.append(name)
+            return node_ids[node_id]
+
+        sources, targets = [], []
+        for row in rows:
+            sources.append(node(str(row['upstream_node_id']), row.get('upstream_node_name')))
+            targets.append(node(str(row['downstream_node_id']), row.get('downstream_node_name')))
+
+        self.node_ids = node_ids
+        self.nodes = list(node_ids)
+        self.node_names = node_names
+
+        # Edges sorted by source node
+        order = np.argsort(np.array(sources, dtype=np.int64), kind='stable')
+        counts = np.bincount(np.array(sources, dtype=np.int64), minlength=len(self.nodes))
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.sources = np.array(sources, dtype=np.int64)[order]
+        self.targets = np.array(targets, dtype=np.int64)[order]
+
+        edge_rows = [rows[i] for i in order]
+        self.segment_ids = [str(row['segment_id']) for row in edge_rows]
+        self.street_names = [row.get('street_name') for row in edge_rows]
+        self.edge_of_segment = {segment_id: edge for edge, segment_id in enumerate(self.segment_ids)}
+
+        lengths = np.array([line_length_m(row.get('geometry_json')) or np.nan
+                            for row in edge_rows], dtype=float)
+        known = lengths[~np.isnan(lengths)]
+        self.default_length_m = float(np.median(known)) if len(known) else 100.0
+        self.length_m = np.where(np.isnan(lengths), self.default_length_m, lengths)
+
+        n_edges = len(self.segment_ids)
+        self.speed_sum = np.zeros((24, n_edges))
+        self.speed_count = np.zeros((24, n_edges))
+        self.latest_kmh = np.full(n_edges, np.nan)
+        self.latest_hour: List[Optional[Tuple[date, int]]] = [None] * n_edges
+
+        self._indptr = self.indptr.tolist()
+        self._targets = self.targets.tolist()
+        self._weights: Dict[Optional[int], List[float]] = {}
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.segment_ids)
+
+    def add_profile(self, rows: List[Dict], hours: Optional[List[int]] = None):
+        """
+        Set hour-of-day speed totals from PROFILE_QUERY rows. With hours,
+        those hours are cleared first (rows then cover exactly them).
+        """
+        if hours is not None:
+            self.speed_sum[hours, :] = 0
+            self.speed_count[hours, :] = 0
+        for row in rows:
+            edge = self.edge_of_segment.get(str(row['segment_id']))
+            if edge is None:
+                continue
+            self.speed_sum[row['hour'], edge] = float(row['speed_sum'])
+            self.speed_count[row['hour'], edge] = float(row['speed_count'])
+        self._weights.clear()
+
+    def add_latest(self, rows: List[Dict]) -> int:
+        """
+        Take each segment's speed from the rows (date, hour, speed_sum,
+        speed_count) that are at least as recent as what it has.
+
+        Returns:
+            Number of edges whose current speed changed
+        """
+        changed = 0
+        for row in rows:
+            edge = self.edge_of_segment.get(str(row['segment_id']))
+            if edge is None:
+                continue
+            stamp = (row['date'], row['hour'])
+            if self.latest_hour[edge] is not None and stamp < self.latest_hour[edge]:
+                continue
+            self.latest_hour[edge] = stamp
+            self.latest_kmh[edge] = float(row['speed_sum']) / row['speed_count']
+            changed += 1
+        if changed:
+            self._weights.clear()
+        return changed
+
+    def speeds_kmh(self, hour: Optional[int] = None) -> np.ndarray:
+        """Edge speeds for an hour of day (None: current), with fallbacks filled in."""
+        totals = self.speed_count.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.speed_sum.sum(axis=0) / totals
+            if hour is None:
+                speeds = self.latest_kmh.copy()
+            else:
+                speeds = self.speed_sum[hour] / self.speed_count[hour]
+
+        known = mean[~np.isnan(mean)]
+        network = float(np.median(known)) if len(known) else DEFAULT_SPEED_KMH
+        speeds = np.where(np.isnan(speeds), mean, speeds)
+        speeds = np.where(np.isnan(speeds), network, speeds)
+        return np.maximum(speeds, MIN_SPEED_KMH)
+
+    def weights(self, hour: Optional[int] = None) -> List[float]:
+        """Edge travel times in seconds (cached until speeds change)."""
+        if hour not in self._weights:
+            seconds = self.length_m / (self.speeds_kmh(hour) / 3.6)
+            self._weights[hour] = seconds.tolist()
+        return self._weights[hour]
+
+    def _search(self, source: int, weights: List[float], target: Optional[int] = None,
+                limit: float = math.inf) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """Dijkstra from source; stops at target or past limit seconds."""
+        indptr, targets = self._indptr, self._targets
+        best = {source: 0.0}
+        via: Dict[int, int] = {}
+        done = set()
+        heap = [(0.0, source)]
+
+        while heap:
+            cost, node = heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node == target:
+                break
+            for edge in range(indptr[node], indptr[node + 1]):
+                total = cost + weights[edge]
+                neighbour = targets[edge]
+                if total <= limit and total < best.get(neighbour, math.inf):
+                    best[neighbour] = total
+                    via[neighbour] = edge
+                    heappush(heap, (total, neighbour))
+
+        return {node: best[node] for node in done}, via
+
+    def route(self, from_node: str, to_node: str,
+              hour: Optional[int] = None) -> Optional[Tuple[float, List[int]]]:
+        """
+        Fastest path between two nodes.
+
+        Returns:
+            (travel time in seconds, edges in order), or None if unreachable
+
+        Raises:
+            KeyError if a node is not in the network
+        """
+        source, target = self.node_ids[from_node], self.node_ids[to_node]
+        costs, via = self._search(source, self.weights(hour), target=target)
+        if target not in costs:
+            return None
+
+        edges = []
+        node = target
+        while node != source:
+            edge = via[node]
+            edges.append(edge)
+            node = int(self.sources[edge])
+        return costs[target], edges[::-1]
+
+    def reachable(self, from_node: str, seconds: float,
+                  hour: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Nodes reachable within seconds, nearest first.
+
+        Returns:
+            (node index, travel time in seconds) pairs, the start node included
+
+        Raises:
+            KeyError if the node is not in the network
+        """
+        costs, _ = self._search(self.node_ids[from_node], self.weights(hour), limit=seconds)
+        return sorted(costs.items(), key=lambda item: (item[1], item[0]))
+
+class NetworkCache:
+    """
+    The process-wide RoadNetwork: built at startup, speeds refreshed
+    incrementally when the data version moves, rebuilt when the segments
+    signature changes (after invalidate(), the signature is always checked).
+    """
+
+    def __init__(self, version_ttl: float = VERSION_TTL):
+        self.version_ttl = version_ttl
+        self.network: Optional[RoadNetwork] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        self.incremental_refreshes = 0
+        self._signature: Optional[Tuple[int, int]] = None
+        # Data version whose hourly_stats rows the speeds include
+        self._watermark: Optional[int] = None
+        self._version: Optional[int] = None
+        self._version_checked = float('-inf')
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Check the segments signature on the next request (after a segment write)."""
+        self._version_checked = float('-inf')
+        self._version = None
+
+    async def _topology(self) -> Tuple[int, int]:
+        rows = await execute_query_async(TOPOLOGY_QUERY)
+        return int(rows[0]['segments']), int(rows[0]['signature'])
+
+    async def rebuild(self) -> RoadNetwork:
+        """Build the graph and its speeds from road_segments and hourly_stats."""
+        started = time.perf_counter()
+        version_rows = await execute_query_async(data_version.VERSION_QUERY)
+        self._signature = await self._topology()
+
+        network = RoadNetwork(await execute_query_async(SEGMENTS_QUERY))
+        network.add_profile(await execute_query_async(PROFILE_QUERY.format(hours='')))
+        network.add_latest(await execute_query_async(LATEST_QUERY))
+
+        self.network = network
+        self._version = self._watermark = version_rows[0]['version'] if version_rows else None
+        self._version_checked = time.monotonic()
+        self.built_at = self.refreshed_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(f"Road network built: {len(network.nodes)} nodes, {network.edge_count} edges "
+                    f"in {self.build_seconds * 1000:.1f} ms")
+        return network
+
+    async def refresh_speeds(self, version: int):
+        """
+        Apply the hourly_stats rows written after the last build or refresh,
+        up to at least version (the committed data version).
+        """
+        updated = await execute_query_async(UPDATED_QUERY, (self._watermark,))
+
+        hours = sorted({int(row['hour']) for row in updated})
+        if hours:
+            placeholders = ', '.join(['%s'] * len(hours))
+            profile = await execute_query_async(
+                PROFILE_QUERY.format(hours=f"AND hour IN ({placeholders})"), tuple(hours))
+            self.network.add_profile(profile, hours)
+        changed = self.network.add_latest(updated)
+
+        self._watermark = version
+        self.refreshed_at = time.time()
+        self.incremental_refreshes += 1
+        logger.info(f"Road network speeds refreshed: {len(updated)} updated hours, "
+                    f"{len(hours)} hours of day, {changed} current speeds")
+
+    async def get(self) -> RoadNetwork:
+        """The network, refreshed first if the data version changed."""
+        if self.network is not None and time.monotonic() - self._version_checked < self.version_ttl:
+            return self.network
+
+        async with self._lock:
+            if self.network is not None and time.monotonic() - self._version_checked < self.version_ttl:
+                return self.network
+            if self.network is None:
+                return await self.rebuild()
+
+            rows = await execute_query_async(data_version.VERSION_QUERY)
+            version = rows[0]['version'] if rows else None
+            if version is None or version != self._version:
+                if await self._topology() != self._signature:
+                    return await self.rebuild()
+                if version is not None and version != self._watermark:
+                    if self._watermark is None:
+                        return await self.rebuild()
+                    await self.refresh_speeds(version)
+                self._version = version
+            self._version_checked = time.monotonic()
+            return self.network
+
+    def stats(self) -> Dict:
+        network = self.network
+        return {
+            'nodes': len(network.nodes) if network is not None else 0,
+            'edges': network.edge_count if network is not None else 0,
+            'data_version': self._version,
+            'built_at': self.built_at,
+            'build_ms': round(self.build_seconds * 1000, 1) if self.build_seconds else None,
+            'speeds_refreshed_at': self.refreshed_at,
+            'incremental_refreshes': self.incremental_refreshes,
+        }
+
+_network = NetworkCache()
+
+def get_network() -> NetworkCache:
+    return _network
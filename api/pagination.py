@@ -0,0 +1,45 @@
+from fastapi import HTTPException
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import base64
+import binascii
+import json
+
+# Keyset pagination: a page ends with an opaque cursor encoding the sort key
+# of its last row, and the next page starts strictly after that key. The
+# query is a range scan from the cursor on an index in sort order, so every
+# page costs the same however deep it is (unlike LIMIT/OFFSET, which reads
+# and discards every skipped row).
+
+def encode_cursor(position: Dict) -> str:
+    """Opaque cursor for a sort key (JSON, URL-safe base64)."""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, fields: Sequence[str]) -> Dict:
+    """
+    Sort key from a cursor made by encode_cursor.
+
+    Raises:
+        HTTPException 400 if the cursor is malformed or lacks one of fields
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or any(field not in position for field in fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+def paginate(rows: List[Dict], limit: int,
+             position_of: Callable[[Dict], Dict]) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Split limit + 1 fetched rows into a page and the cursor of the next one.
+
+    Returns:
+        (rows of this page, next_cursor or None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(position_of(page[-1]))
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
 import numpy as np
 import logging
 import sys
@@ -7,7 +8,7 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from api.database import execute_query
+from api.database import execute_query_async, stream_query_async
 from api.models import (
     PeakHourResponse,
     BusiestSegmentResponse,
@@ -15,103 +16,225 @@ from api.models import (
     QualityReportResponse,
     CongestionHotspotResponse
 )
+import speed_sketch
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Hourly aggregates are read from the hourly_stats rollup (maintained by the
+# loader, see rollup.py), which covers every reading with a quality_score,
+# i.e. the readings `quality_score >= 0` keeps. A threshold above 0 filters
+# individual readings, so those requests fall back to traffic_readings.
+ROLLUP_MIN_QUALITY = 0.0
+
+# Rows per batch when streaming speeds for exact statistics
+SPEED_STREAM_BATCH = 50000
+
+# Every route takes an optional time window, start inclusive and end
+# exclusive. On traffic_readings it is a range on timestamp, so MySQL only
+# reads the monthly partitions it overlaps (see partitions.py); on the
+# rollups it keeps the hours (hourly_stats) or days (speed_sketches) that
+# start inside it.
+
+ROLLUP_BY_HOUR = """
+SELECT
+    hour,
+    ROUND(SUM(flow_sum) / SUM(flow_count), 2) as avg_flow,
+    ROUND(SUM(speed_sum) / SUM(speed_count), 2) as avg_speed,
+    SUM(total_readings) as reading_count
+FROM hourly_stats
+{where}
+GROUP BY hour
+ORDER BY hour
+"""
+
+READINGS_BY_HOUR = """
+SELECT
+    HOUR(timestamp) as hour,
+    ROUND(AVG(traffic_flow), 2) as avg_flow,
+    ROUND(AVG(avg_speed), 2) as avg_speed,
+    COUNT(*) as reading_count
+FROM traffic_readings
+{where}
+GROUP BY HOUR(timestamp)
+ORDER BY hour
+"""
+
+def _check_window(start: Optional[datetime], end: Optional[datetime]):
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+def _where(conditions: List[str]) -> str:
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+def _reading_window(start: Optional[datetime], end: Optional[datetime],
+                    column: str = 'timestamp') -> Tuple[List[str], list]:
+    """Conditions keeping readings with start <= timestamp < end."""
+    conditions = []
+    params = []
+    if start:
+        conditions.append(f"{column} >= %s")
+        params.append(start.replace(tzinfo=None))
+    if end:
+        conditions.append(f"{column} < %s")
+        params.append(end.replace(tzinfo=None))
+    return conditions, params
+
+def _ceil_hour(ts: datetime) -> datetime:
+    hour = ts.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    return hour if hour == ts.replace(tzinfo=None) else hour + timedelta(hours=1)
+
+def _rollup_window(start: Optional[datetime], end: Optional[datetime],
+                   prefix: str = '') -> Tuple[List[str], list]:
+    """Conditions keeping the hourly_stats hours that start in [start, end)."""
+    conditions = []
+    params = []
+    if start:
+        first = _ceil_hour(start)
+        conditions.append(f"{prefix}date >= %s AND ({prefix}date > %s OR {prefix}hour >= %s)")
+        params.extend([first.date(), first.date(), first.hour])
+    if end:
+        stop = _ceil_hour(end)
+        conditions.append(f"{prefix}date <= %s AND ({prefix}date < %s OR {prefix}hour < %s)")
+        params.extend([stop.date(), stop.date(), stop.hour])
+    return conditions, params
+
+def _is_midnight(ts: Optional[datetime]) -> bool:
+    return ts is None or ts.replace(tzinfo=None) == datetime.combine(ts.date(), datetime.min.time())
+
 @router.get("/peak-hours", response_model=List[PeakHourResponse])
-def get_peak_hours(
+async def get_peak_hours(
     segment_id: Optional[str] = Query(default=None),
-    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0)
+    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
     Get traffic flow and speed by hour of day.
     Useful for identifying peak congestion periods.
     """
-    if segment_id:
-        query = """
-        SELECT
-            HOUR(timestamp) as hour,
-            ROUND(AVG(traffic_flow), 2) as avg_flow,
-            ROUND(AVG(avg_speed), 2) as avg_speed,
-            COUNT(*) as reading_count
-        FROM traffic_readings
-        WHERE segment_id = %s
-        AND quality_score >= %s
-        GROUP BY HOUR(timestamp)
-        ORDER BY hour
-        """
-        results = execute_query(query, (segment_id, min_quality_score))
+    _check_window(start, end)
+
+    if min_quality_score <= ROLLUP_MIN_QUALITY:
+        conditions, params = _rollup_window(start, end)
+        query = ROLLUP_BY_HOUR
     else:
-        query = """
-        SELECT
-            HOUR(timestamp) as hour,
-            ROUND(AVG(traffic_flow), 2) as avg_flow,
-            ROUND(AVG(avg_speed), 2) as avg_speed,
-            COUNT(*) as reading_count
-        FROM traffic_readings
-        WHERE quality_score >= %s
-        GROUP BY HOUR(timestamp)
-        ORDER BY hour
-        """
-        results = execute_query(query, (min_quality_score,))
+        conditions, params = _reading_window(start, end)
+        conditions.append("quality_score >= %s")
+        params.append(min_quality_score)
+        query = READINGS_BY_HOUR
+
+    if segment_id:
+        conditions.insert(0, "segment_id = %s")
+        params.insert(0, segment_id)
+
+    results = await execute_query_async(query.format(where=_where(conditions)), tuple(params))
 
     logger.info(f"GET /analytics/peak-hours returned {len(results)} hours")
     return results
 
 @router.get("/busiest-segments", response_model=List[BusiestSegmentResponse])
-def get_busiest_segments(
+async def get_busiest_segments(
     limit: int = Query(default=10, ge=1, le=100),
-    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0)
+    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
     Get road segments ranked by average traffic flow.
     """
-    query = """
-    SELECT
-        r.segment_id,
-        s.street_name,
-        ROUND(AVG(r.traffic_flow), 2) as avg_flow,
-        ROUND(AVG(r.avg_speed), 2) as avg_speed,
-        COUNT(*) as reading_count
-    FROM traffic_readings r
-    JOIN road_segments s ON r.segment_id = s.segment_id
-    WHERE r.traffic_flow IS NOT NULL
-    AND r.quality_score >= %s
-    GROUP BY r.segment_id, s.street_name
-    ORDER BY avg_flow DESC
-    LIMIT %s
-    """
-    results = execute_query(query, (min_quality_score, limit))
+    _check_window(start, end)
+
+    if min_quality_score <= ROLLUP_MIN_QUALITY:
+        conditions, params = _rollup_window(start, end, prefix='h.')
+        query = f"""
+        SELECT
+            h.segment_id,
+            s.street_name,
+            ROUND(SUM(h.flow_sum) / SUM(h.flow_count), 2) as avg_flow,
+            ROUND(SUM(h.flow_speed_sum) / SUM(h.flow_speed_count), 2) as avg_speed,
+            SUM(h.flow_count) as reading_count
+        FROM hourly_stats h
+        JOIN road_segments s ON h.segment_id = s.segment_id
+        {_where(conditions)}
+        GROUP BY h.segment_id, s.street_name
+        HAVING reading_count > 0
+        ORDER BY avg_flow DESC
+        LIMIT %s
+        """
+        results = await execute_query_async(query, (*params, limit))
+    else:
+        conditions, params = _reading_window(start, end, column='r.timestamp')
+        conditions[:0] = ["r.traffic_flow IS NOT NULL", "r.quality_score >= %s"]
+        params.insert(0, min_quality_score)
+        query = f"""
+        SELECT
+            r.segment_id,
+            s.street_name,
+            ROUND(AVG(r.traffic_flow), 2) as avg_flow,
+            ROUND(AVG(r.avg_speed), 2) as avg_speed,
+            COUNT(*) as reading_count
+        FROM traffic_readings r
+        JOIN road_segments s ON r.segment_id = s.segment_id
+        {_where(conditions)}
+        GROUP BY r.segment_id, s.street_name
+        ORDER BY avg_flow DESC
+        LIMIT %s
+        """
+        results = await execute_query_async(query, (*params, limit))
+
     logger.info(f"GET /analytics/busiest-segments returned {len(results)} segments")
     return results
 
 @router.get("/speed-stats", response_model=SpeedStatsResponse)
-def get_speed_stats(
+async def get_speed_stats(
     segment_id: Optional[str] = Query(default=None),
-    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0)
+    min_quality_score: float = Query(default=0.0, ge=0.0, le=1.0),
+    exact: bool = Query(default=False,
+                        description="Compute from every reading instead of the speed sketches"),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
     Calculate speed statistics using NumPy.
     Returns mean, median, std deviation, and percentiles.
+
+    Across all segments the statistics come from the per-day speed sketches
+    (see speed_sketch.py): sample size, mean, std deviation, min and max are
+    exact, percentiles are within 0.5 km/h. Per segment, with exact=true, or
+    with a window that does not start and end at midnight, speeds are
+    streamed from a server-side cursor in batches.
     """
+    _check_window(start, end)
+
+    if not segment_id and not exact and _is_midnight(start) and _is_midnight(end):
+        conditions = ["quality_score >= %s"]
+        params = [min_quality_score]
+        if start:
+            conditions.append("date >= %s")
+            params.append(start.date())
+        if end:
+            conditions.append("date < %s")
+            params.append(end.date())
+        query = speed_sketch.MERGED_SKETCH_QUERY.format(where=" AND ".join(conditions))
+        rows = await execute_query_async(query, tuple(params))
+        stats = speed_sketch.summarize(rows)
+        logger.info(f"GET /analytics/speed-stats merged sketches of {stats['sample_size']} readings")
+        return SpeedStatsResponse(segment_id=None, exact=False, **stats)
+
+    conditions, params = _reading_window(start, end)
+    conditions[:0] = ["avg_speed IS NOT NULL", "quality_score >= %s"]
+    params.insert(0, min_quality_score)
     if segment_id:
-        query = """
-        SELECT avg_speed FROM traffic_readings
-        WHERE avg_speed IS NOT NULL
-        AND segment_id = %s
-        AND quality_score >= %s
-        """
-        results = execute_query(query, (segment_id, min_quality_score))
-    else:
-        query = """
-        SELECT avg_speed FROM traffic_readings
-        WHERE avg_speed IS NOT NULL
-        AND quality_score >= %s
-        """
-        results = execute_query(query, (min_quality_score,))
+        conditions.insert(1, "segment_id = %s")
+        params.insert(0, segment_id)
+    query = f"SELECT avg_speed FROM traffic_readings {_where(conditions)}"
 
-    if not results:
+    batches = []
+    async for rows in stream_query_async(query, tuple(params), batch_size=SPEED_STREAM_BATCH):
+        batches.append(np.array([row[0] for row in rows], dtype=float))
+
+    if not batches:
         return SpeedStatsResponse(
             segment_id=segment_id,
             mean_speed=0, median_speed=0, std_dev=0,
@@ -119,7 +242,7 @@ def get_speed_stats(
             min_speed=0, max_speed=0, sample_size=0
         )
 
-    speeds = np.array([row['avg_speed'] for row in results], dtype=float)
+    speeds = np.concatenate(batches)
 
     logger.info(f"GET /analytics/speed-stats calculated stats for {len(speeds)} readings")
 
@@ -136,33 +259,46 @@ def get_speed_stats(
     )
 
 @router.get("/quality-report", response_model=List[QualityReportResponse])
-def get_quality_report():
+async def get_quality_report(
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
+):
     """
     Get a breakdown of data quality across all readings.
     Shows distribution of quality flags and average scores.
     """
-    query = """
+    _check_window(start, end)
+    conditions, params = _reading_window(start, end)
+    where = _where(conditions)
+
+    query = f"""
     SELECT
         data_quality_flag,
         COUNT(*) as count,
-        ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM traffic_readings), 2) as percentage,
+        ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM traffic_readings {where}), 2) as percentage,
         ROUND(AVG(quality_score), 2) as avg_quality_score
     FROM traffic_readings
+    {where}
     GROUP BY data_quality_flag
     ORDER BY count DESC
     """
-    results = execute_query(query)
+    results = await execute_query_async(query, (*params, *params))
     logger.info(f"GET /analytics/quality-report returned {len(results)} flags")
     return results
 
 @router.get("/congestion-hotspots", response_model=List[CongestionHotspotResponse])
-def get_congestion_hotspots(
-    limit: int = Query(default=10, ge=1, le=100)
+async def get_congestion_hotspots(
+    limit: int = Query(default=10, ge=1, le=100),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
     Get road segments with most blocked or saturated traffic states.
     """
-    query = """
+    _check_window(start, end)
+    conditions, params = _reading_window(start, end, column='r.timestamp')
+
+    query = f"""
     SELECT
         r.segment_id,
         s.street_name,
@@ -171,40 +307,35 @@ def get_congestion_hotspots(
         SUM(CASE WHEN r.traffic_state IN ('Bloqué', 'Saturé') THEN 1 ELSE 0 END) as total_incidents
     FROM traffic_readings r
     JOIN road_segments s ON r.segment_id = s.segment_id
+    {_where(conditions)}
     GROUP BY r.segment_id, s.street_name
     HAVING total_incidents > 0
     ORDER BY total_incidents DESC
     LIMIT %s
     """
-    results = execute_query(query, (limit,))
+    results = await execute_query_async(query, (*params, limit))
     logger.info(f"GET /analytics/congestion-hotspots returned {len(results)} segments")
     return results
 
 @router.get("/traffic-by-hour", response_model=List[PeakHourResponse])
-def get_traffic_by_hour(
-    segment_id: str = Query(..., description="Road segment ID (required)")
+async def get_traffic_by_hour(
+    segment_id: str = Query(..., description="Road segment ID (required)"),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
     Get hourly traffic breakdown for a specific road segment.
     """
+    _check_window(start, end)
+
     check_query = "SELECT segment_id FROM road_segments WHERE segment_id = %s"
-    existing = execute_query(check_query, (segment_id,))
+    existing = await execute_query_async(check_query, (segment_id,))
 
     if not existing:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail=f"Segment {segment_id} not found")
 
-    query = """
-    SELECT
-        HOUR(timestamp) as hour,
-        ROUND(AVG(traffic_flow), 2) as avg_flow,
-        ROUND(AVG(avg_speed), 2) as avg_speed,
-        COUNT(*) as reading_count
-    FROM traffic_readings
-    WHERE segment_id = %s
-    GROUP BY HOUR(timestamp)
-    ORDER BY hour
-    """
-    results = execute_query(query, (segment_id,))
+    conditions, params = _rollup_window(start, end)
+    query = ROLLUP_BY_HOUR.format(where=_where(["segment_id = %s", *conditions]))
+    results = await execute_query_async(query, (segment_id, *params))
     logger.info(f"GET /analytics/traffic-by-hour for segment {segment_id}")
     return results
\ No newline at end of file
@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from datetime import datetime
+import logging
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api.models import RouteResponse, ReachableResponse
+from api.network import get_network
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def _speeds(at: Optional[datetime]) -> str:
+    return f"hour {at.hour:02d} profile" if at else "current"
+
+@router.get("/route", response_model=RouteResponse)
+async def get_route(
+    from_node: str = Query(...),
+    to_node: str = Query(...),
+    at: Optional[datetime] = Query(default=None, description="Departure time (default: current speeds)")
+):
+    """
+    Fastest path between two nodes of the road network.
+    
+    - **from_node** / **to_node**: Node IDs (upstream/downstream_node_id of segments)
+    - **at**: Departure time; uses the mean speeds of that hour of day over
+      the loaded days. Without it, each segment's most recent speed is used.
+    """
+    network = await get_network().get()
+    hour = at.hour if at else None
+    try:
+        found = network.route(from_node, to_node, hour)
+    except KeyError as err:
+        raise HTTPException(status_code=404, detail=f"Node {err.args[0]} not in the network")
+
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No path from {from_node} to {to_node}")
+
+    travel_time, edges = found
+    speeds = network.speeds_kmh(hour)
+    weights = network.weights(hour)
+    steps = [{
+        'segment_id': network.segment_ids[edge],
+        'street_name': network.street_names[edge],
+        'from_node': network.nodes[network.sources[edge]],
+        'to_node': network.nodes[network.targets[edge]],
+        'length_m': round(float(network.length_m[edge]), 1),
+        'speed_kmh': round(float(speeds[edge]), 2),
+        'travel_time_s': round(weights[edge], 1),
+    } for edge in edges]
+
+    logger.info(f"GET /network/route {from_node} -> {to_node}: {len(steps)} segments")
+    return {
+        'from_node': from_node,
+        'to_node': to_node,
+        'speeds': _speeds(at),
+        'travel_time_s': round(travel_time, 1),
+        'distance_m': round(float(network.length_m[edges].sum()) if edges else 0.0, 1),
+        'steps': steps,
+    }
+
+@router.get("/reachable", response_model=ReachableResponse)
+async def get_reachable(
+    node: str = Query(...),
+    minutes: float = Query(default=10, gt=0, le=240),
+    at: Optional[datetime] = Query(default=None, description="Departure time (default: current speeds)")
+):
+    """
+    Nodes reachable from a node within a travel time, nearest first.
+    
+    - **node**: Start node ID
+    - **minutes**: Travel time budget (max 240)
+    - **at**: Departure time (hour-of-day speeds), default current speeds
+    """
+    network = await get_network().get()
+    try:
+        reached = network.reachable(node, minutes * 60, at.hour if at else None)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Node {node} not in the network")
+
+    logger.info(f"GET /network/reachable {node} in {minutes} min: {len(reached)} nodes")
+    return {
+        'node': node,
+        'minutes': minutes,
+        'speeds': _speeds(at),
+        'nodes': [{
+            'node_id': network.nodes[index],
+            'node_name': network.node_names[index],
+            'travel_time_s': round(seconds, 1),
+        } for index, seconds in reached],
+    }
@@ -1,32 +1,67 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import pandas as pd
+import json
 import logging
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from api.database import execute_query, execute_write
-from api.models import TrafficReadingResponse, TrafficReadingCreate
+from api.database import execute_query_async, execute_transaction_async, stream_query_async
+from api.models import (TrafficReadingResponse, TrafficReadingCreate, ReadingPage,
+                        BatchIngestResponse)
+from api.pagination import decode_cursor, paginate
+from api.export import EXPORT_COLUMNS, ENCODERS, MEDIA_TYPES
+from transform import clean_metrics, assign_quality_flags
+import rollup
+import speed_sketch
+import data_version
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/", response_model=List[TrafficReadingResponse])
-def get_readings(
-    skip: int = Query(default=0, ge=0),
+# Largest batch accepted by POST /readings/batch
+MAX_BATCH_ROWS = 10000
+
+# Keys per duplicate lookup query
+KEY_LOOKUP_BATCH = 1000
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Rows fetched from the server-side cursor per exported chunk
+EXPORT_BATCH = 10000
+
+@router.get("/", response_model=ReadingPage)
+async def get_readings(
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    skip: int = Query(default=0, ge=0, deprecated=True),
     limit: int = Query(default=100, ge=1, le=1000),
     segment_id: Optional[str] = Query(default=None),
     quality_flag: Optional[str] = Query(default=None),
-    min_quality_score: Optional[float] = Query(default=None, ge=0.0, le=1.0)
+    min_quality_score: Optional[float] = Query(default=None, ge=0.0, le=1.0),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)")
 ):
     """
-    Get traffic readings with optional filtering.
+    Get traffic readings with optional filtering, ordered by timestamp.
     
+    - **cursor**: Continue after the previous page (its next_cursor)
+    - **skip**: Number of records to skip (slow on deep pages, use cursor)
     - **segment_id**: Filter by road segment
     - **quality_flag**: Filter by data quality flag (e.g. OK, MISSING_FLOW)
     - **min_quality_score**: Filter by minimum quality score (0.0-1.0)
+    - **start** / **end**: Time range, start inclusive, end exclusive (only
+      the monthly partitions it overlaps are read)
     """
+    if cursor and skip:
+        raise HTTPException(status_code=400, detail="Use either cursor or skip, not both")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
     conditions = []
     params = []
 
@@ -40,28 +75,108 @@ def get_readings(
     if min_quality_score is not None:
         conditions.append("quality_score >= %s")
         params.append(min_quality_score)
+    if start:
+        conditions.append("timestamp >= %s")
+        params.append(start.replace(tzinfo=None))
+    if end:
+        conditions.append("timestamp < %s")
+        params.append(end.replace(tzinfo=None))
 
-    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    if cursor:
+        position = decode_cursor(cursor, ['timestamp', 'reading_id'])
+        try:
+            after = datetime.fromisoformat(position['timestamp'])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # (timestamp, reading_id) > cursor, with a plain range on timestamp
+        # for idx_timestamp / idx_segment_time (which end in reading_id)
+        conditions.append("timestamp >= %s AND (timestamp > %s OR reading_id > %s)")
+        params.extend([after, after, position['reading_id']])
 
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
     query = f"""
     SELECT * FROM traffic_readings
     {where_clause}
-    ORDER BY timestamp
-    LIMIT %s OFFSET %s
+    ORDER BY timestamp, reading_id
+    LIMIT %s{" OFFSET %s" if skip else ""}
+    """
+
+    params.append(limit + 1)
+    if skip:
+        params.append(skip)
+
+    results = await execute_query_async(query, tuple(params))
+    items, next_cursor = paginate(results, limit, lambda row: {
+        'timestamp': row['timestamp'].isoformat(),
+        'reading_id': row['reading_id'],
+    })
+    logger.info(f"GET /readings returned {len(items)} records")
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/export", response_class=StreamingResponse, responses={200: {"content": {
+    media_type: {} for media_type in MEDIA_TYPES.values()}}})
+async def export_readings(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv|arrow)$"),
+    segment_id: Optional[str] = Query(default=None),
+    start: Optional[datetime] = Query(default=None, description="First timestamp (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="Last timestamp (exclusive)"),
+    min_quality_score: Optional[float] = Query(default=None, ge=0.0, le=1.0)
+):
+    """
+    Stream every matching reading, ordered by timestamp, as NDJSON, CSV or
+    an Arrow IPC stream.
+
+    Rows come from a server-side cursor EXPORT_BATCH at a time and are sent
+    as they are encoded (chunked transfer), so memory use does not grow
+    with the size of the export.
+
+    - **format**: ndjson (default), csv or arrow
+    - **segment_id**: Only this road segment
+    - **start** / **end**: Time range, start inclusive, end exclusive
+    - **min_quality_score**: Filter by minimum quality score (0.0-1.0)
     """
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    conditions = []
+    params = []
 
-    params.extend([limit, skip])
+    if segment_id:
+        conditions.append("segment_id = %s")
+        params.append(segment_id)
+    if start:
+        conditions.append("timestamp >= %s")
+        params.append(start.replace(tzinfo=None))
+    if end:
+        conditions.append("timestamp < %s")
+        params.append(end.replace(tzinfo=None))
+    if min_quality_score is not None:
+        conditions.append("quality_score >= %s")
+        params.append(min_quality_score)
+
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    query = f"""
+    SELECT {', '.join(EXPORT_COLUMNS)} FROM traffic_readings
+    {where_clause}
+    ORDER BY timestamp, reading_id
+    """
 
-    results = execute_query(query, tuple(params))
-    logger.info(f"GET /readings returned {len(results)} records")
-    return results
+    batches = stream_query_async(query, tuple(params), batch_size=EXPORT_BATCH)
+    logger.info(f"GET /readings/export streaming {format} "
+                f"(segment={segment_id}, start={start}, end={end})")
+    return StreamingResponse(
+        ENCODERS[format](batches),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="readings.{format}"'}
+    )
 
 @router.get("/{reading_id}", response_model=TrafficReadingResponse)
-def get_reading(reading_id: int):
+async def get_reading(reading_id: int):
     """Get a single traffic reading by ID"""
     query = "SELECT * FROM traffic_readings WHERE reading_id = %s"
-    results = execute_query(query, (reading_id,))
+    results = await execute_query_async(query, (reading_id,))
 
     if not results:
         raise HTTPException(status_code=404, detail=f"Reading {reading_id} not found")
@@ -69,11 +184,54 @@ def get_reading(reading_id: int):
     logger.info(f"GET /readings/{reading_id} returned 1 record")
     return results[0]
 
+INSERT_SCORED_QUERY = """
+INSERT INTO traffic_readings
+(segment_id, timestamp, traffic_flow, avg_speed, traffic_state, sensor_status,
+ is_flow_imputed, is_speed_corrected, data_quality_flag, quality_score)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _clean_and_score(readings: Dict[int, TrafficReadingCreate]) -> Tuple[pd.DataFrame, Dict[int, str]]:
+    """
+    Clean and score readings with the ETL's own rules (clean_metrics and
+    assign_quality_flags in transform.py).
+
+    Returns:
+        (accepted rows indexed like readings, with data_quality_flag and
+        quality_score; rejection reason per rejected index)
+    """
+    df = pd.DataFrame.from_dict(
+        {index: reading.model_dump() for index, reading in readings.items()}, orient='index')
+    df = df.rename(columns={'traffic_flow': 'q', 'avg_speed': 'k',
+                            'traffic_state': 'etat_trafic', 'sensor_status': 'etat_barre'})
+    df['q'] = pd.to_numeric(df['q'], errors='coerce').astype(float)
+    df['k'] = pd.to_numeric(df['k'], errors='coerce').astype(float)
+
+    rejected = clean_metrics(df)
+    accepted = df[rejected.isna()].copy()
+    accepted['data_quality_flag'], accepted['quality_score'] = assign_quality_flags(accepted)
+    return accepted, rejected.dropna().to_dict()
+
+def _scored_values(accepted: pd.DataFrame, readings: Dict[int, TrafficReadingCreate]) -> List[tuple]:
+    """INSERT_SCORED_QUERY parameters for each accepted row."""
+    return [
+        (row.segment_id, readings[row.Index].timestamp,
+         None if pd.isna(row.q) else int(row.q),
+         None if pd.isna(row.k) else float(row.k),
+         row.etat_trafic, row.etat_barre, False, bool(row.is_speed_corrected),
+         row.data_quality_flag, float(row.quality_score))
+        for row in accepted.itertuples()
+    ]
+
 @router.post("/", response_model=dict, status_code=201)
-def create_reading(reading: TrafficReadingCreate):
-    """Create a new traffic reading"""
+async def create_reading(reading: TrafficReadingCreate):
+    """
+    Create a new traffic reading, cleaned and scored like the ETL and
+    /readings/batch (and refresh its hour in hourly_stats and its day's
+    speed sketch)
+    """
     check_query = "SELECT segment_id FROM road_segments WHERE segment_id = %s"
-    segment_exists = execute_query(check_query, (reading.segment_id,))
+    segment_exists = await execute_query_async(check_query, (reading.segment_id,))
 
     if not segment_exists:
         raise HTTPException(
@@ -81,35 +239,192 @@ def create_reading(reading: TrafficReadingCreate):
             detail=f"Segment {reading.segment_id} not found"
         )
 
-    query = """
-    INSERT INTO traffic_readings
-    (segment_id, timestamp, traffic_flow, avg_speed, traffic_state, sensor_status)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    """
+    # Stored as naive wall time, like the ETL
+    readings = {0: reading.model_copy(update={'timestamp': reading.timestamp.replace(tzinfo=None)})}
+    accepted, rejected = _clean_and_score(readings)
+    if rejected:
+        raise HTTPException(status_code=400, detail=f"Reading rejected: {rejected[0]}")
+
+    timestamp = readings[0].timestamp
+    flag, score = accepted['data_quality_flag'].iloc[0], float(accepted['quality_score'].iloc[0])
     try:
-        execute_write(query, (
-            reading.segment_id,
-            reading.timestamp,
-            reading.traffic_flow,
-            reading.avg_speed,
-            reading.traffic_state,
-            reading.sensor_status
-        ))
+        await execute_transaction_async([
+            (INSERT_SCORED_QUERY, _scored_values(accepted, readings)[0]),
+            (data_version.BUMP_QUERY, None),
+            *rollup.refresh_statements([timestamp], [reading.segment_id]),
+            *speed_sketch.refresh_statements([timestamp.date()])
+        ])
         logger.info(f"POST /readings created reading for segment {reading.segment_id}")
-        return {"message": "Reading created successfully"}
+        return {"message": "Reading created successfully",
+                "data_quality_flag": flag, "quality_score": score}
     except Exception as err:
         raise HTTPException(status_code=400, detail=str(err))
 
+def _parse_batch(body: bytes, content_type: str) -> List[Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Split a batch body (JSON array or NDJSON) into records.
+
+    Returns:
+        (record, error) per row; an NDJSON line that is not valid JSON is
+        a row error, a malformed JSON array fails the whole request
+    """
+    if content_type in NDJSON_TYPES or (content_type != 'application/json'
+                                        and not body.lstrip().startswith(b'[')):
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append((json.loads(line), None))
+            except ValueError as err:
+                rows.append((None, f"invalid JSON: {err}"))
+        return rows
+
+    try:
+        records = json.loads(body)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {err}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of readings")
+    return [(record, None) for record in records]
+
+def _validation_reason(err: ValidationError) -> str:
+    first = err.errors()[0]
+    field = '.'.join(str(part) for part in first['loc'])
+    return f"{field}: {first['msg']}" if field else first['msg']
+
+async def _existing_keys(keys: List[Tuple[str, datetime]]) -> set:
+    """(segment_id, timestamp) pairs already in traffic_readings."""
+    found = set()
+    for start in range(0, len(keys), KEY_LOOKUP_BATCH):
+        batch = keys[start:start + KEY_LOOKUP_BATCH]
+        placeholders = ', '.join(['(%s, %s)'] * len(batch))
+        query = f"""
+        SELECT segment_id, timestamp FROM traffic_readings
+        WHERE (segment_id, timestamp) IN ({placeholders})
+        """
+        rows = await execute_query_async(query, tuple(v for key in batch for v in key))
+        found.update((row['segment_id'], row['timestamp']) for row in rows)
+    return found
+
+@router.post(
+    "/batch",
+    response_model=BatchIngestResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array",
+                                        "items": TrafficReadingCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}}
+)
+async def create_readings_batch(request: Request):
+    """
+    Create many traffic readings at once (up to MAX_BATCH_ROWS).
+
+    The body is a JSON array of readings, or one reading per line (NDJSON,
+    Content-Type application/x-ndjson). Each row is validated, checked
+    against known segments and existing readings, then cleaned and scored
+    with the ETL's own rules (decimal speed fix, outliers, quality flags).
+    Accepted rows are written in one transaction with their hourly_stats and
+    speed sketch refresh; the response says which rows were rejected and why.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    parsed = _parse_batch(await request.body(), content_type)
+    if len(parsed) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {MAX_BATCH_ROWS} readings per batch")
+
+    reasons: List[Optional[str]] = [error for _, error in parsed]
+    readings: Dict[int, TrafficReadingCreate] = {}
+    for index, (record, error) in enumerate(parsed):
+        if error:
+            continue
+        try:
+            reading = TrafficReadingCreate.model_validate(record)
+        except ValidationError as err:
+            reasons[index] = _validation_reason(err)
+            continue
+        # Stored as naive wall time, like the ETL
+        readings[index] = reading.model_copy(
+            update={'timestamp': reading.timestamp.replace(tzinfo=None)})
+
+    # Unknown segments: one lookup for every distinct ID in the batch
+    segment_ids = sorted({reading.segment_id for reading in readings.values()})
+    known = set()
+    if segment_ids:
+        placeholders = ', '.join(['%s'] * len(segment_ids))
+        rows = await execute_query_async(
+            f"SELECT segment_id FROM road_segments WHERE segment_id IN ({placeholders})",
+            tuple(segment_ids))
+        known = {row['segment_id'] for row in rows}
+
+    seen = set()
+    for index, reading in list(readings.items()):
+        key = (reading.segment_id, reading.timestamp)
+        if reading.segment_id not in known:
+            reasons[index] = f"unknown segment {reading.segment_id}"
+        elif key in seen:
+            reasons[index] = "duplicate of an earlier row in this batch"
+        else:
+            seen.add(key)
+            continue
+        del readings[index]
+
+    existing = await _existing_keys(sorted(seen))
+    for index, reading in list(readings.items()):
+        if (reading.segment_id, reading.timestamp) in existing:
+            reasons[index] = "reading already exists for this segment and timestamp"
+            del readings[index]
+
+    flags: Dict[int, Tuple[str, float]] = {}
+    accepted = pd.DataFrame()
+    if readings:
+        accepted, rejected = _clean_and_score(readings)
+        for index, reason in rejected.items():
+            reasons[index] = reason
+        flags = dict(zip(accepted.index, zip(accepted['data_quality_flag'].tolist(),
+                                             accepted['quality_score'].tolist())))
+
+    if not accepted.empty:
+        timestamps = [readings[index].timestamp for index in accepted.index]
+        try:
+            await execute_transaction_async([
+                (INSERT_SCORED_QUERY, _scored_values(accepted, readings)),
+                (data_version.BUMP_QUERY, None),
+                *rollup.refresh_statements(timestamps, accepted['segment_id'].tolist()),
+                *speed_sketch.refresh_statements({ts.date() for ts in timestamps})
+            ])
+        except Exception as err:
+            raise HTTPException(status_code=409,
+                                detail=f"Batch not written, nothing was inserted: {err}")
+
+    results = []
+    for index, reason in enumerate(reasons):
+        flag, score = flags.get(index, (None, None))
+        results.append({'index': index, 'accepted': index in flags, 'reason': reason,
+                        'data_quality_flag': flag, 'quality_score': score})
+
+    logger.info(f"POST /readings/batch accepted {len(flags)} of {len(results)} readings")
+    return {"accepted": len(flags), "rejected": len(results) - len(flags), "results": results}
+
 @router.delete("/{reading_id}", response_model=dict)
-def delete_reading(reading_id: int):
-    """Delete a traffic reading"""
-    check_query = "SELECT reading_id FROM traffic_readings WHERE reading_id = %s"
-    existing = execute_query(check_query, (reading_id,))
+async def delete_reading(reading_id: int):
+    """Delete a traffic reading (and refresh the rollups that include it)"""
+    check_query = """
+    SELECT segment_id, timestamp, avg_speed, quality_score FROM traffic_readings
+    WHERE reading_id = %s
+    """
+    existing = await execute_query_async(check_query, (reading_id,))
 
     if not existing:
         raise HTTPException(status_code=404, detail=f"Reading {reading_id} not found")
 
-    query = "DELETE FROM traffic_readings WHERE reading_id = %s"
-    execute_write(query, (reading_id,))
+    reading = existing[0]
+    statements = [("DELETE FROM traffic_readings WHERE reading_id = %s", (reading_id,)),
+                  (data_version.BUMP_QUERY, None),
+                  *rollup.refresh_statements([reading['timestamp']], [reading['segment_id']])]
+    if reading['avg_speed'] is not None and reading['quality_score'] is not None:
+        statements.extend(speed_sketch.refresh_statements([reading['timestamp'].date()]))
+
+    await execute_transaction_async(statements)
     logger.info(f"DELETE /readings/{reading_id} deleted")
     return {"message": f"Reading {reading_id} deleted successfully"}
\ No newline at end of file
@@ -6,47 +6,137 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from api.database import execute_query, execute_write
-from api.models import RoadSegmentResponse, RoadSegmentCreate
+from api.database import execute_query_async, execute_transaction_async
+from api.models import (RoadSegmentResponse, RoadSegmentCreate, SegmentPage,
+                        NearbySegmentResponse, SegmentSearchResponse)
+from api.pagination import decode_cursor, paginate
+from api.spatial import get_segment_index
+from api.network import get_network
+import speed_sketch
+import data_version
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/", response_model=List[RoadSegmentResponse])
-def get_segments(
-    skip: int = Query(default=0, ge=0),
+@router.get("/", response_model=SegmentPage)
+async def get_segments(
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    skip: int = Query(default=0, ge=0, deprecated=True),
     limit: int = Query(default=100, ge=1, le=1000),
     street_name: Optional[str] = Query(default=None)
 ):
     """
-    Get all road segments with optional filtering and pagination.
+    Get all road segments with optional filtering and pagination, ordered by segment_id.
     
-    - **skip**: Number of records to skip
+    - **cursor**: Continue after the previous page (its next_cursor)
+    - **skip**: Number of records to skip (slow on deep pages, use cursor)
     - **limit**: Maximum records to return (max 1000)
-    - **street_name**: Filter by street name (partial match)
+    - **street_name**: Filter by street name (partial match, full scan; /segments/search is indexed)
     """
+    if cursor and skip:
+        raise HTTPException(status_code=400, detail="Use either cursor or skip, not both")
+
+    conditions = []
+    params = []
+
     if street_name:
-        query = """
-        SELECT * FROM road_segments
-        WHERE street_name LIKE %s
-        LIMIT %s OFFSET %s
-        """
-        results = execute_query(query, (f"%{street_name}%", limit, skip))
-    else:
-        query = """
-        SELECT * FROM road_segments
-        LIMIT %s OFFSET %s
-        """
-        results = execute_query(query, (limit, skip))
-
-    logger.info(f"GET /segments returned {len(results)} records")
-    return results
+        conditions.append("street_name LIKE %s")
+        params.append(f"%{street_name}%")
+    if cursor:
+        position = decode_cursor(cursor, ['segment_id'])
+        conditions.append("segment_id > %s")
+        params.append(position['segment_id'])
+
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    query = f"""
+    SELECT * FROM road_segments
+    {where_clause}
+    ORDER BY segment_id
+    LIMIT %s{" OFFSET %s" if skip else ""}
+    """
+
+    params.append(limit + 1)
+    if skip:
+        params.append(skip)
+
+    results = await execute_query_async(query, tuple(params))
+    items, next_cursor = paginate(results, limit,
+                                  lambda row: {'segment_id': row['segment_id']})
+    logger.info(f"GET /segments returned {len(items)} records")
+    return {"items": items, "next_cursor": next_cursor}
+
+# Declared before /{segment_id}, which would otherwise match them
+@router.get("/search", response_model=List[SegmentSearchResponse])
+async def search_segments(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=20, ge=1, le=1000)
+):
+    """
+    Search road segments by street name, accent- and case-insensitive
+    (served from the in-memory street-name index).
+    
+    Every word of q must appear in the street name. Results are ranked
+    by match: exact, prefix, word prefixes, then any substring.
+    
+    - **q**: Search text (e.g. "hotel de vil", "Quai_Hôtel")
+    - **limit**: Maximum segments to return (max 1000)
+    """
+    names = await get_segment_index().get_names()
+    matches = names.search(q, limit)
+    logger.info(f"GET /segments/search returned {len(matches)} segments")
+    return [{**names.rows[position], 'match': match} for position, match in matches]
+
+@router.get("/nearby", response_model=List[NearbySegmentResponse])
+async def get_nearby_segments(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius: float = Query(default=500, gt=0, le=20000, description="Radius in metres"),
+    limit: int = Query(default=100, ge=1, le=1000)
+):
+    """
+    Get the road segments within radius metres of a point, nearest first
+    (served from the in-memory segment index).
+    
+    - **lat** / **lon**: Point (WGS84)
+    - **radius**: Search radius in metres (max 20 km)
+    - **limit**: Maximum segments to return (max 1000)
+    """
+    index = await get_segment_index().get()
+    matches = index.nearby(lat, lon, radius, limit)
+    logger.info(f"GET /segments/nearby returned {len(matches)} segments")
+    return [{**index.rows[position], 'distance_m': round(distance, 1)}
+            for position, distance in matches]
+
+@router.get("/bbox", response_model=List[RoadSegmentResponse])
+async def get_segments_in_bbox(
+    min_lat: float = Query(ge=-90, le=90),
+    min_lon: float = Query(ge=-180, le=180),
+    max_lat: float = Query(ge=-90, le=90),
+    max_lon: float = Query(ge=-180, le=180),
+    limit: int = Query(default=1000, ge=1, le=10000)
+):
+    """
+    Get the road segments inside a bounding box, ordered by segment_id
+    (served from the in-memory segment index).
+    
+    - **min_lat** / **min_lon**: South-west corner
+    - **max_lat** / **max_lon**: North-east corner
+    - **limit**: Maximum segments to return (max 10000)
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+
+    index = await get_segment_index().get()
+    matches = index.bbox(min_lat, min_lon, max_lat, max_lon, limit)
+    logger.info(f"GET /segments/bbox returned {len(matches)} segments")
+    return [index.rows[position] for position in matches]
 
 @router.get("/{segment_id}", response_model=RoadSegmentResponse)
-def get_segment(segment_id: str):
+async def get_segment(segment_id: str):
     """Get a single road segment by ID"""
     query = "SELECT * FROM road_segments WHERE segment_id = %s"
-    results = execute_query(query, (segment_id,))
+    results = await execute_query_async(query, (segment_id,))
 
     if not results:
         raise HTTPException(status_code=404, detail=f"Segment {segment_id} not found")
@@ -55,7 +145,7 @@ def get_segment(segment_id: str):
     return results[0]
 
 @router.post("/", response_model=dict, status_code=201)
-def create_segment(segment: RoadSegmentCreate):
+async def create_segment(segment: RoadSegmentCreate):
     """Create a new road segment"""
     query = """
     INSERT INTO road_segments
@@ -65,26 +155,31 @@ def create_segment(segment: RoadSegmentCreate):
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
     """
     try:
-        execute_write(query, (
-            segment.segment_id,
-            segment.street_name,
-            segment.latitude,
-            segment.longitude,
-            segment.upstream_node_id,
-            segment.upstream_node_name,
-            segment.downstream_node_id,
-            segment.downstream_node_name
-        ))
+        await execute_transaction_async([
+            (query, (
+                segment.segment_id,
+                segment.street_name,
+                segment.latitude,
+                segment.longitude,
+                segment.upstream_node_id,
+                segment.upstream_node_name,
+                segment.downstream_node_id,
+                segment.downstream_node_name
+            )),
+            (data_version.BUMP_QUERY, None)
+        ])
+        get_segment_index().invalidate()
+        get_network().invalidate()
         logger.info(f"POST /segments created segment {segment.segment_id}")
         return {"message": f"Segment {segment.segment_id} created successfully"}
     except Exception as err:
         raise HTTPException(status_code=400, detail=str(err))
 
 @router.put("/{segment_id}", response_model=dict)
-def update_segment(segment_id: str, segment: RoadSegmentCreate):
+async def update_segment(segment_id: str, segment: RoadSegmentCreate):
     """Update an existing road segment"""
     check_query = "SELECT segment_id FROM road_segments WHERE segment_id = %s"
-    existing = execute_query(check_query, (segment_id,))
+    existing = await execute_query_async(check_query, (segment_id,))
 
     if not existing:
         raise HTTPException(status_code=404, detail=f"Segment {segment_id} not found")
@@ -94,25 +189,50 @@ def update_segment(segment_id: str, segment: RoadSegmentCreate):
     SET street_name = %s, latitude = %s, longitude = %s
     WHERE segment_id = %s
     """
-    execute_write(query, (
-        segment.street_name,
-        segment.latitude,
-        segment.longitude,
-        segment_id
-    ))
+    await execute_transaction_async([
+        (query, (
+            segment.street_name,
+            segment.latitude,
+            segment.longitude,
+            segment_id
+        )),
+        (data_version.BUMP_QUERY, None)
+    ])
+    get_segment_index().invalidate()
+    get_network().invalidate()
     logger.info(f"PUT /segments/{segment_id} updated")
     return {"message": f"Segment {segment_id} updated successfully"}
 
 @router.delete("/{segment_id}", response_model=dict)
-def delete_segment(segment_id: str):
-    """Delete a road segment and all its readings"""
+async def delete_segment(segment_id: str):
+    """
+    Delete a road segment and all its readings. The readings are deleted
+    explicitly (traffic_readings is partitioned, so it has no foreign key),
+    its hourly_stats rows go with it (ON DELETE CASCADE), and the speed
+    sketches of every day it has readings for are rebuilt in the same
+    transaction.
+    """
     check_query = "SELECT segment_id FROM road_segments WHERE segment_id = %s"
-    existing = execute_query(check_query, (segment_id,))
+    existing = await execute_query_async(check_query, (segment_id,))
 
     if not existing:
         raise HTTPException(status_code=404, detail=f"Segment {segment_id} not found")
 
-    query = "DELETE FROM road_segments WHERE segment_id = %s"
-    execute_write(query, (segment_id,))
+    days_query = """
+    SELECT DISTINCT DATE(timestamp) as day FROM traffic_readings
+    WHERE segment_id = %s
+    AND avg_speed IS NOT NULL
+    AND quality_score IS NOT NULL
+    """
+    days = await execute_query_async(days_query, (segment_id,))
+
+    await execute_transaction_async([
+        ("DELETE FROM traffic_readings WHERE segment_id = %s", (segment_id,)),
+        ("DELETE FROM road_segments WHERE segment_id = %s", (segment_id,)),
+        *speed_sketch.refresh_statements([row['day'] for row in days]),
+        (data_version.BUMP_QUERY, None)
+    ])
+    get_segment_index().invalidate()
+    get_network().invalidate()
     logger.info(f"DELETE /segments/{segment_id} deleted")
     return {"message": f"Segment {segment_id} deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+import re
+import unicodedata
+
+# In-memory street-name search for /segments/search.
+#
+# Names are normalized (accents stripped, lower case, '_' and punctuation
+# as spaces), so 'Quai_Hôtel_de_Ville', 'quai hotel' and 'HOTEL DE' all
+# meet. Every word of the query must match the name: words of 3+
+# characters anywhere in it (found through a trigram index, smallest
+# posting list first, then confirmed), shorter words as the start of one
+# of its words (found by bisecting a sorted word list), as a one or two
+# letter substring matches almost every name.
+#
+# Matches are ranked: whole name, name prefix, word prefixes, then any
+# substring; shorter names first. Each rank is a set of name ids, and ids
+# are assigned in (length, name) order, so sorting a rank's ids orders it.
+
+MATCH_EXACT = 'exact'
+MATCH_PREFIX = 'prefix'
+MATCH_WORD = 'word'
+MATCH_SUBSTRING = 'substring'
+
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+
+# Sorts after every character a normalized name can hold
+_PREFIX_END = '\x7f'
+
+def normalize(text: str) -> str:
+    """Lower case ASCII words separated by single spaces ('Quai_Hôtel' -> 'quai hotel')."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', stripped.lower()).strip()
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _prefixed(pairs: List[Tuple[str, int]], prefix: str) -> Set[int]:
+    """Ids paired with a string starting with prefix (pairs sorted by string)."""
+    start = bisect_left(pairs, (prefix,))
+    end = bisect_left(pairs, (prefix + _PREFIX_END,), start)
+    return {name_id for _, name_id in pairs[start:end]}
+
+class StreetNameIndex:
+    """
+    Trigram and word-prefix index over the street names of segment rows.
+
+    Usage:
+        names = StreetNameIndex(rows)    # rows with segment_id, street_name
+        names.search('hotel de vil')     # [(position in rows, match), ...]
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+
+        by_name: Dict[str, List[int]] = {}
+        for position, row in enumerate(rows):
+            name = normalize(row.get('street_name') or '')
+            if name:
+                by_name.setdefault(name, []).append(position)
+
+        self.names: List[str] = sorted(by_name, key=lambda name: (len(name), name))
+        self._ids = {name: name_id for name_id, name in enumerate(self.names)}
+        self._segments: List[List[int]] = [
+            sorted(by_name[name], key=lambda position: rows[position]['segment_id'])
+            for name in self.names
+        ]
+
+        self._sorted_names = sorted((name, name_id) for name_id, name in enumerate(self.names))
+        self._words = sorted({(word, name_id) for name_id, name in enumerate(self.names)
+                              for word in name.split()})
+        self._postings: Dict[str, Set[int]] = {}
+        for name_id, name in enumerate(self.names):
+            for gram in trigrams(name):
+                self._postings.setdefault(gram, set()).add(name_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _containing(self, tokens: List[str]) -> Set[int]:
+        """Names containing every token (tokens of 3+ characters)."""
+        grams = set().union(*(trigrams(token) for token in tokens))
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return {name_id for name_id in candidates
+                if all(token in self.names[name_id] for token in tokens)}
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[Tuple[int, str]]:
+        """
+        Segments whose street name matches every word of text, best match first.
+
+        Returns:
+            (position in rows, match kind) pairs
+        """
+        query = normalize(text)
+        if not query:
+            return []
+        tokens = query.split()
+
+        word_sets = [_prefixed(self._words, token) for token in tokens]
+        word = set.intersection(*word_sets)
+
+        long_tokens = [token for token in tokens if len(token) >= 3]
+        if long_tokens:
+            short_sets = [ids for token, ids in zip(tokens, word_sets) if len(token) < 3]
+            matches = self._containing(long_tokens).intersection(*short_sets)
+        else:
+            matches = word
+
+        exact = {self._ids[query]} if query in self._ids else set()
+        prefix = _prefixed(self._sorted_names, query) & matches
+        ranks = [
+            (MATCH_EXACT, exact),
+            (MATCH_PREFIX, prefix - exact),
+            (MATCH_WORD, word - prefix - exact),
+            (MATCH_SUBSTRING, matches - word - prefix - exact),
+        ]
+
+        results = []
+        for match, name_ids in ranks:
+            for name_id in sorted(name_ids):
+                for position in self._segments[name_id]:
+                    results.append((position, match))
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
@@ -0,0 +1,265 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import math
+import time
+import sys
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.database import execute_query_async
+from api.search import StreetNameIndex
+import data_version
+
+# In-process spatial index for /segments/nearby and /segments/bbox.
+#
+# Segment coordinates are projected to metres (equirectangular around the
+# mean latitude, which is exact enough across a city) and bucketed in a
+# uniform grid of CELL_METERS cells. Cells are stored sorted by
+# (column, row), so each grid column a query covers is one contiguous slice
+# found with bisect. Candidates from those cells get an exact
+# haversine distance (nearby) or lat/lon test (bbox).
+#
+# The index holds the road_segments rows (a few thousand, without
+# geometry_json), so queries never touch MySQL. It is rebuilt, together with
+# the street-name index of /segments/search (api/search.py), right after
+# segment writes through the API and when the segments signature changes.
+# The signature is only read when the data version moves (checked at most
+# every VERSION_TTL seconds), which loads and reading writes do far more
+# often than segments change.
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Grid cell size: about the default nearby radius, so a query reads ~9 cells
+CELL_METERS = 250.0
+
+# Seconds between data version checks
+VERSION_TTL = 1.0
+
+# Slack on projected query extents, covering the projection error
+PROJECTION_MARGIN = 1.01
+
+SEGMENT_COLUMNS = """segment_id, street_name, latitude, longitude,
+upstream_node_id, upstream_node_name, downstream_node_id, downstream_node_name,
+sensor_install_date, sensor_end_date"""
+
+SEGMENTS_QUERY = f"SELECT {SEGMENT_COLUMNS}, created_at FROM road_segments"
+
+SIGNATURE_QUERY = f"""
+SELECT COUNT(*) as segments,
+       COALESCE(SUM(CRC32(CONCAT_WS('|', {SEGMENT_COLUMNS}))), 0) as signature
+FROM road_segments
+"""
+
+def haversine_m(lat, lon, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances in metres from one point to arrays of points
+    (or, with arrays for lat and lon too, between paired points).
+    """
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class SegmentIndex:
+    """
+    Uniform grid over segment coordinates.
+
+    Queries touch a handful of cells holding tens of segments, so they run
+    in plain Python (bisect, math) rather than numpy, whose per-call
+    overhead would dominate on arrays that small.
+
+    Rows without coordinates are left out.
+
+    Usage:
+        index = SegmentIndex(rows)    # rows with segment_id, latitude, longitude
+        index.nearby(48.8566, 2.3522, radius_m=500)
+        index.bbox(48.85, 2.34, 48.86, 2.36)
+    """
+
+    def __init__(self, rows: List[Dict], cell_meters: float = CELL_METERS):
+        self.cell = cell_meters
+        rows = [row for row in rows
+                if row.get('latitude') is not None and row.get('longitude') is not None]
+        self.rows = rows
+        lat = np.array([float(row['latitude']) for row in rows], dtype=float)
+        lon = np.array([float(row['longitude']) for row in rows], dtype=float)
+
+        self._ref_cos = math.cos(math.radians(lat.mean())) if rows else 1.0
+        x, y = self._project(lat, lon)
+        col = np.floor(x / self.cell).astype(np.int64)
+        row_ = np.floor(y / self.cell).astype(np.int64)
+
+        # Cell key = (column, row) packed in one int, rows offset to be >= 0
+        self._row_offset = int(row_.min()) if rows else 0
+        self._row_span = int(row_.max()) - self._row_offset + 1 if rows else 1
+        keys = col * self._row_span + (row_ - self._row_offset)
+        order = np.argsort(keys, kind='stable')
+
+        # Segments in cell order, as Python lists for the query loops
+        self._keys = keys[order].tolist()
+        self._order = order.tolist()
+        self._lat = lat[order].tolist()
+        self._lon = lon[order].tolist()
+        self._lat_rad = np.radians(lat[order]).tolist()
+        self._lon_rad = np.radians(lon[order]).tolist()
+        self._cos_lat = np.cos(np.radians(lat[order])).tolist()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _project(self, lat, lon):
+        x = EARTH_RADIUS_M * np.radians(lon) * self._ref_cos
+        y = EARTH_RADIUS_M * np.radians(lat)
+        return x, y
+
+    def _cell_ranges(self, x0: float, y0: float, x1: float, y1: float) -> List[range]:
+        """Ranges of sorted positions for the cells overlapping [x0, x1] x [y0, y1]."""
+        row_lo = max(math.floor(y0 / self.cell) - self._row_offset, 0)
+        row_hi = min(math.floor(y1 / self.cell) - self._row_offset, self._row_span - 1)
+        if not self.rows or row_lo > row_hi:
+            return []
+
+        # Each grid column is one contiguous run of keys
+        ranges = []
+        for column in range(math.floor(x0 / self.cell), math.floor(x1 / self.cell) + 1):
+            base = column * self._row_span
+            start = bisect_left(self._keys, base + row_lo)
+            end = bisect_left(self._keys, base + row_hi + 1, start)
+            if end > start:
+                ranges.append(range(start, end))
+        return ranges
+
+    def nearby(self, lat: float, lon: float, radius_m: float,
+               limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Segments within radius_m of a point, nearest first.
+
+        Returns:
+            (position in rows, distance in metres) pairs
+        """
+        x = EARTH_RADIUS_M * math.radians(lon) * self._ref_cos
+        y = EARTH_RADIUS_M * math.radians(lat)
+        reach = radius_m * PROJECTION_MARGIN
+
+        lat1, lon1 = math.radians(lat), math.radians(lon)
+        cos1 = math.cos(lat1)
+        # Compare haversine terms instead of distances: a <= limit_a
+        limit_a = math.sin(min(radius_m / (2 * EARTH_RADIUS_M), math.pi / 2)) ** 2
+
+        lat_rad, lon_rad, cos_lat = self._lat_rad, self._lon_rad, self._cos_lat
+        hits = []
+        for positions in self._cell_ranges(x - reach, y - reach, x + reach, y + reach):
+            for i in positions:
+                a = (math.sin((lat_rad[i] - lat1) / 2) ** 2
+                     + cos1 * cos_lat[i] * math.sin((lon_rad[i] - lon1) / 2) ** 2)
+                if a <= limit_a:
+                    hits.append((a, self._order[i]))
+
+        hits.sort()
+        return [(position, 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0))))
+                for a, position in hits[:limit]]
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+             limit: Optional[int] = None) -> List[int]:
+        """Positions in rows of the segments inside a bounding box, by segment_id."""
+        x0, y0 = self._project(min_lat, min_lon)
+        x1, y1 = self._project(max_lat, max_lon)
+
+        lats, lons = self._lat, self._lon
+        matches = [self._order[i]
+                   for positions in self._cell_ranges(float(x0), float(y0), float(x1), float(y1))
+                   for i in positions
+                   if min_lat <= lats[i] <= max_lat and min_lon <= lons[i] <= max_lon]
+        matches.sort(key=lambda position: self.rows[position]['segment_id'])
+        return matches[:limit]
+
+class SegmentIndexCache:
+    """
+    The process-wide SegmentIndex and StreetNameIndex, rebuilt from
+    road_segments when the segments signature changes (or after
+    invalidate()).
+    """
+
+    def __init__(self, version_ttl: float = VERSION_TTL):
+        self.version_ttl = version_ttl
+        self.index: Optional[SegmentIndex] = None
+        self.names: Optional[StreetNameIndex] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self._version: Optional[int] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._version_checked = float('-inf')
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Rebuild on the next request (after a segment write)."""
+        self._version_checked = float('-inf')
+        self._version = None
+        self._signature = None
+
+    async def _segments_signature(self) -> Tuple[int, int]:
+        rows = await execute_query_async(SIGNATURE_QUERY)
+        return int(rows[0]['segments']), int(rows[0]['signature'])
+
+    async def refresh(self, signature: Optional[Tuple[int, int]] = None) -> SegmentIndex:
+        """Rebuild the indexes from road_segments (signature: already read for this build)."""
+        started = time.perf_counter()
+        version_rows = await execute_query_async(data_version.VERSION_QUERY)
+        self._signature = signature or await self._segments_signature()
+        rows = await execute_query_async(SEGMENTS_QUERY)
+        self.index = SegmentIndex(rows)
+        self.names = StreetNameIndex(rows)
+        self._version = version_rows[0]['version'] if version_rows else None
+        self._version_checked = time.monotonic()
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(f"Segment index built: {len(self.index)} located segments, "
+                    f"{len(self.names)} street names in {self.build_seconds * 1000:.1f} ms")
+        return self.index
+
+    async def get(self) -> SegmentIndex:
+        """The index, rebuilt first if the segments changed."""
+        if self.index is not None and time.monotonic() - self._version_checked < self.version_ttl:
+            return self.index
+
+        async with self._lock:
+            if self.index is not None and time.monotonic() - self._version_checked < self.version_ttl:
+                return self.index
+            rows = await execute_query_async(data_version.VERSION_QUERY)
+            version = rows[0]['version'] if rows else None
+            if self.index is None or self._signature is None:
+                return await self.refresh()
+            if version is None or version != self._version:
+                signature = await self._segments_signature()
+                if signature != self._signature:
+                    return await self.refresh(signature)
+                self._version = version
+            self._version_checked = time.monotonic()
+            return self.index
+
+    async def get_names(self) -> StreetNameIndex:
+        """The street-name index, rebuilt first if the segments changed."""
+        await self.get()
+        return self.names
+
+    def stats(self) -> Dict:
+        return {
+            'segments': len(self.index) if self.index is not None else 0,
+            'street_names': len(self.names) if self.names is not None else 0,
+            'cell_meters': self.index.cell if self.index is not None else CELL_METERS,
+            'data_version': self._version,
+            'built_at': self.built_at,
+            'build_ms': round(self.build_seconds * 1000, 1) if self.build_seconds else None,
+        }
+
+_segment_index = SegmentIndexCache()
+
+def get_segment_index() -> SegmentIndexCache:
+    return _segment_index
@@ -0,0 +1,199 @@
+"""
+Load test: sync vs. async API routes at 50, 200 and 1000 concurrent clients.
+
+Serves the same two queries both ways from one uvicorn worker:
+    /sync/...   def routes on the threaded ConnectionPool (execute_query)
+    /async/...  async def routes on the aiomysql pool (execute_query_async)
+
+Each client loops for --seconds, sending one slow /speed-stats request
+(full scan of traffic_readings) for every --slow-every requests and cheap
+/segments/{id} lookups otherwise. The interesting number is the p99 of the
+cheap lookups while slow queries are in flight.
+
+Needs the MySQL in config.py with data loaded. Both pools get the same
+size so only the route style differs.
+
+Usage:
+    python benchmarks/bench_api_concurrency.py
+    python benchmarks/bench_api_concurrency.py --clients 50 200 --seconds 20
+    # against a server already running this module's app:
+    #   uvicorn benchmarks.bench_api_concurrency:app --port 8001
+    python benchmarks/bench_api_concurrency.py --base-url http://localhost:8001
+"""
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from contextlib import asynccontextmanager
+
+import numpy as np
+import httpx
+from fastapi import FastAPI, HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import (execute_query, execute_query_async, init_pool, close_pool,
+                          init_async_pool, close_async_pool)
+
+CLIENTS = [50, 200, 1000]
+POOL_SIZE = int(os.environ.get('BENCH_POOL_SIZE', 20))
+
+SEGMENT_QUERY = "SELECT * FROM road_segments WHERE segment_id = %s"
+SPEED_QUERY = """
+SELECT avg_speed FROM traffic_readings
+WHERE avg_speed IS NOT NULL
+AND quality_score >= %s
+"""
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_pool(size=POOL_SIZE, max_overflow=0, timeout=60.0)
+    await init_async_pool(size=POOL_SIZE, max_overflow=0, timeout=60.0)
+    yield
+    close_pool()
+    await close_async_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _speed_summary(results: list) -> dict:
+    speeds = np.array([row['avg_speed'] for row in results], dtype=float)
+    return {'mean_speed': float(np.mean(speeds)) if len(speeds) else 0.0,
+            'sample_size': len(speeds)}
+
+
+@app.get("/sync/segments/{segment_id}")
+def sync_segment(segment_id: str):
+    results = execute_query(SEGMENT_QUERY, (segment_id,))
+    if not results:
+        raise HTTPException(status_code=404)
+    return results[0]
+
+
+@app.get("/sync/speed-stats")
+def sync_speed_stats():
+    return _speed_summary(execute_query(SPEED_QUERY, (0.0,)))
+
+
+@app.get("/async/segments/{segment_id}")
+async def async_segment(segment_id: str):
+    results = await execute_query_async(SEGMENT_QUERY, (segment_id,))
+    if not results:
+        raise HTTPException(status_code=404)
+    return results[0]
+
+
+@app.get("/async/speed-stats")
+async def async_speed_stats():
+    return _speed_summary(await execute_query_async(SPEED_QUERY, (0.0,)))
+
+
+@app.get("/segment-ids")
+async def segment_ids():
+    rows = await execute_query_async("SELECT segment_id FROM road_segments LIMIT 1000")
+    return [row['segment_id'] for row in rows]
+
+
+async def run_level(base_url: str, mode: str, clients: int, seconds: float,
+                    slow_every: int, segment_ids: list) -> dict:
+    """Run `clients` concurrent request loops for `seconds` against one mode."""
+    fast, slow = [], []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        async def worker(worker_id: int):
+            nonlocal errors
+            rng = random.Random(worker_id)
+            sent = worker_id
+            while time.perf_counter() < deadline:
+                is_slow = sent % slow_every == 0
+                sent += 1
+                path = (f"/{mode}/speed-stats" if is_slow
+                        else f"/{mode}/segments/{rng.choice(segment_ids)}")
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                (slow if is_slow else fast).append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    def ms(values, q):
+        return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+    return {
+        'requests_per_s': (len(fast) + len(slow)) / elapsed,
+        'fast_p50_ms': ms(fast, 50),
+        'fast_p99_ms': ms(fast, 99),
+        'slow_p50_ms': ms(slow, 50),
+        'errors': errors,
+    }
+
+
+def start_server(port: int) -> subprocess.Popen:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'benchmarks.bench_api_concurrency:app',
+         '--port', str(port), '--log-level', 'warning', '--backlog', '4096'],
+        cwd=root
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/segment-ids", timeout=1.0)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async API load test')
+    parser.add_argument('--clients', type=int, nargs='+', default=CLIENTS)
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--slow-every', type=int, default=10,
+                        help='Send one slow speed-stats request per N requests')
+    parser.add_argument('--base-url', type=str, default=None,
+                        help='Use a running server (this module\'s app) instead of starting one')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        segment_ids = httpx.get(f"{base_url}/segment-ids", timeout=30.0).json()
+        if not segment_ids:
+            raise SystemExit("road_segments is empty; load some data first")
+
+        print(f"{'mode':>6} {'clients':>8} {'req/s':>8} {'fast p50':>9} {'fast p99':>9} "
+              f"{'slow p50':>9} {'errors':>7}")
+        for clients in args.clients:
+            for mode in ['sync', 'async']:
+                result = asyncio.run(run_level(base_url, mode, clients, args.seconds,
+                                               args.slow_every, segment_ids))
+                print(f"{mode:>6} {clients:>8} {result['requests_per_s']:>8.0f} "
+                      f"{result['fast_p50_ms']:>7.0f}ms {result['fast_p99_ms']:>7.0f}ms "
+                      f"{result['slow_p50_ms']:>7.0f}ms {result['errors']:>7}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
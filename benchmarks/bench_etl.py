@@ -0,0 +1,298 @@
+"""
+End-to-end ETL benchmark: extract, transform and load timed separately,
+with the results written as JSON so runs can be compared.
+
+The input is a synthetic file (see synthetic.py) generated for the run, or
+an existing JSON file or Arrow shard (--input). Chunks go through the same
+extract -> transform -> load sequence as pipeline.py; each stage's time is
+summed over the chunks. Load targets:
+    infile  the loader's client-side work without a server: segment registry
+            and LOAD DATA file encoding (a stand-in for MySQL, the default)
+    mysql   MySQLLoader against the database in config.py (rollup and
+            sketch maintenance included); segment IDs are prefixed with
+            BENCH_ and those rows are deleted before and after the run
+    none    extract and transform only
+
+Usage:
+    python benchmarks/bench_etl.py --records 5000000
+    python benchmarks/bench_etl.py --input Data/data_january1.json --load mysql --bulk
+    python benchmarks/bench_etl.py --records 500000 --baseline benchmarks/results/etl_before.json
+    python benchmarks/bench_etl.py --compare benchmarks/results/etl_a.json benchmarks/results/etl_b.json
+"""
+import sys
+import os
+import json
+import time
+import platform
+import resource
+import argparse
+import logging
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import extract_traffic_data
+from transform import transform_traffic_data
+from load import MySQLLoader, SEGMENT_COLUMNS, READING_COLUMNS, CONFLICT_POLICIES, _write_infile
+from segment_registry import SegmentRegistry
+from benchmarks.synthetic import write_records_file
+from benchmarks.bench_load import PREFIX, cleanup
+
+logging.disable(logging.INFO)
+
+STAGES = ['extract', 'transform', 'load']
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class InfileSink:
+    """Loader stand-in: stages segments and writes the LOAD DATA files MySQL would read."""
+
+    def __init__(self):
+        self.segments = SegmentRegistry()
+        self.infile_bytes = 0
+
+    def load(self, transformed: Dict):
+        segments_df, _ = self.segments.stage(transformed['segments'])
+        for df, columns in ((segments_df, SEGMENT_COLUMNS),
+                            (transformed['readings'], READING_COLUMNS)):
+            path = _write_infile(df, columns)
+            self.infile_bytes += os.path.getsize(path)
+            os.remove(path)
+        self.segments.commit()
+
+    def close(self):
+        pass
+
+
+class MySQLSink:
+    """MySQLLoader over the database in config.py, on BENCH_ segment IDs."""
+
+    def __init__(self, bulk: bool, conflict: str, commit_every: int):
+        self.loader = MySQLLoader(bulk=bulk, conflict=conflict, commit_every=commit_every)
+        self.loader.open()
+        self.segments = self.loader.segments
+
+    def load(self, transformed: Dict):
+        self.loader.load(transformed)
+
+    def close(self):
+        self.loader.commit()
+        self.loader.close()
+
+
+def _prefixed(chunk):
+    """The chunk with BENCH_ segment IDs (JSON records or a shard DataFrame)."""
+    if isinstance(chunk, list):
+        return [{**record, 'iu_ac': PREFIX + str(record['iu_ac'])} for record in chunk]
+    chunk = chunk.copy()
+    chunk['iu_ac'] = PREFIX + chunk['iu_ac'].astype(str)
+    return chunk
+
+
+def run_etl(path: str, chunk_size: int, sink=None, prefix: bool = False) -> Dict:
+    """
+    Run every chunk of path through extract, transform and sink.load, timing
+    each stage. Without a sink, segments are still registered (untimed) so
+    transform sees the same known segments as in a real run.
+    """
+    registry = sink.segments if sink is not None else SegmentRegistry()
+    seconds = dict.fromkeys(STAGES, 0.0)
+    records = readings = segments = 0
+    flags = Counter()
+
+    chunks = iter(extract_traffic_data(path, chunk_size=chunk_size))
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        seconds['extract'] += time.perf_counter() - started
+        if chunk is None:
+            break
+        if prefix:
+            chunk = _prefixed(chunk)
+
+        started = time.perf_counter()
+        transformed = transform_traffic_data(chunk, registry.known)
+        seconds['transform'] += time.perf_counter() - started
+
+        if sink is None:
+            registry.stage(transformed['segments'])
+            registry.commit()
+        else:
+            started = time.perf_counter()
+            sink.load(transformed)
+            seconds['load'] += time.perf_counter() - started
+
+        records += len(chunk)
+        readings += len(transformed['readings'])
+        segments += len(transformed['segments'])
+        flags.update(transformed['readings']['data_quality_flag'].value_counts().to_dict())
+
+    if sink is not None:
+        started = time.perf_counter()
+        sink.close()
+        seconds['load'] += time.perf_counter() - started
+
+    return {'seconds': seconds, 'records': records, 'readings': readings,
+            'segments': segments, 'quality_flags': dict(flags.most_common())}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _label(result: Dict) -> str:
+    return f"{result.get('git_commit') or '?'} {result['started_at'][:16]}"
+
+
+def print_comparison(results: List[Dict]):
+    """Stage times of each run, with the change against the first one."""
+    base = results[0]
+    print(f"{'':>12}" + ''.join(f"{_label(result):>30}" for result in results))
+    print(f"{'records':>12}" + ''.join(f"{result['records']:>30,}" for result in results))
+    print(f"{'load':>12}" + ''.join(f"{result['config']['load']:>30}" for result in results))
+    for stage in STAGES + ['total']:
+        cells = []
+        for result in results:
+            seconds = result['total_seconds'] if stage == 'total' else result['stages'][stage]['seconds']
+            base_seconds = base['total_seconds'] if stage == 'total' else base['stages'][stage]['seconds']
+            change = f" ({(seconds / base_seconds - 1) * 100:+.0f}%)" if result is not base and base_seconds else ''
+            cells.append(f"{seconds:>.2f}s{change}")
+        print(f"{stage:>12}" + ''.join(f"{cell:>30}" for cell in cells))
+    print(f"{'records/s':>12}" + ''.join(f"{result['records_per_second']:>30,.0f}" for result in results))
+    print(f"{'peak MB':>12}" + ''.join(f"{result['peak_rss_mb']:>30,.0f}" for result in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end ETL benchmark with JSON results')
+    parser.add_argument('--records', type=int, default=500_000, help='Synthetic records to generate')
+    parser.add_argument('--segments', type=int, default=1784, help='Distinct synthetic segments')
+    parser.add_argument('--duplicates', type=float, default=0.0,
+                        help='Share of synthetic records repeating a key (needs --on-conflict)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--input', type=str, help='Benchmark this JSON file or shard instead')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--load', choices=['infile', 'mysql', 'none'], default='infile',
+                        help='Load target (default: infile, no server needed)')
+    parser.add_argument('--bulk', action='store_true', help='mysql: LOAD DATA LOCAL INFILE')
+    parser.add_argument('--on-conflict', choices=CONFLICT_POLICIES, default='error',
+                        help='mysql: policy for readings already loaded')
+    parser.add_argument('--commit-every', type=int, default=10, help='mysql: chunks per commit')
+    parser.add_argument('--output', type=str,
+                        help='Results file (default: benchmarks/results/etl_<time>.json)')
+    parser.add_argument('--baseline', type=str, help='Compare this run with an earlier results file')
+    parser.add_argument('--compare', type=str, nargs='+', metavar='RESULTS',
+                        help='Only compare earlier results files')
+    args = parser.parse_args()
+
+    if args.compare:
+        results = []
+        for path in args.compare:
+            with open(path) as f:
+                results.append(json.load(f))
+        print_comparison(results)
+        return
+
+    started_at = datetime.now(timezone.utc)
+    generate_seconds = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if path is None:
+            path = os.path.join(tmp, 'synthetic.json')
+            print(f"Writing {args.records:,} synthetic records...")
+            started = time.perf_counter()
+            write_records_file(path, args.records, n_segments=args.segments,
+                               seed=args.seed, duplicates=args.duplicates)
+            generate_seconds = time.perf_counter() - started
+
+        if args.load == 'mysql':
+            cleanup()
+            sink = MySQLSink(args.bulk, args.on_conflict, args.commit_every)
+        elif args.load == 'infile':
+            sink = InfileSink()
+        else:
+            sink = None
+
+        print(f"Running extract -> transform -> load ({args.load}) on {path}...")
+        run = run_etl(path, args.chunk_size, sink, prefix=args.load == 'mysql')
+        if args.load == 'mysql':
+            cleanup()
+        input_bytes = os.path.getsize(path)
+
+    total = sum(run['seconds'].values())
+    result = {
+        'benchmark': 'etl',
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'input': args.input,
+            'records': None if args.input else args.records,
+            'segments': None if args.input else args.segments,
+            'duplicates': None if args.input else args.duplicates,
+            'seed': None if args.input else args.seed,
+            'chunk_size': args.chunk_size,
+            'load': args.load,
+            'bulk': args.bulk,
+            'on_conflict': args.on_conflict,
+            'commit_every': args.commit_every,
+        },
+        'input_bytes': input_bytes,
+        'generate_seconds': round(generate_seconds, 3) if generate_seconds is not None else None,
+        'records': run['records'],
+        'readings': run['readings'],
+        'segments': run['segments'],
+        'stages': {stage: {'seconds': round(seconds, 3),
+                           'records_per_second': round(run['records'] / seconds) if seconds else None}
+                   for stage, seconds in run['seconds'].items()},
+        'total_seconds': round(total, 3),
+        'records_per_second': round(run['records'] / total) if total else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'quality_flags': run['quality_flags'],
+    }
+    if isinstance(sink, InfileSink):
+        result['infile_bytes'] = sink.infile_bytes
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"etl_{started_at:%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+        f.write('\n')
+
+    print(f"\n{run['records']:,} records -> {run['readings']:,} readings, "
+          f"{run['segments']:,} segment rows")
+    print(f"{'stage':>10} {'seconds':>8} {'records/s':>11} {'share':>6}")
+    for stage in STAGES:
+        seconds = run['seconds'][stage]
+        rate = f"{run['records'] / seconds:,.0f}" if seconds else '-'
+        print(f"{stage:>10} {seconds:>8.2f} {rate:>11} {seconds / total * 100 if total else 0:>5.0f}%")
+    print(f"{'total':>10} {total:>8.2f} {run['records'] / total if total else 0:>11,.0f}")
+    print(f"Peak memory {result['peak_rss_mb']:,.0f} MB. Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        print_comparison([baseline, result])
+
+
+if __name__ == '__main__':
+    main()
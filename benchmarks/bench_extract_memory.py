@@ -0,0 +1,71 @@
+"""
+Benchmark peak memory of extract_traffic_data in streaming vs json.load mode.
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+
+Usage:
+    python benchmarks/bench_extract_memory.py --records 1000000
+"""
+import sys
+import os
+import json
+import time
+import resource
+import argparse
+import logging
+import subprocess
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import write_records_file
+
+
+def measure(path: str, chunk_size: int, stream: bool):
+    """Run one extraction and print elapsed seconds, records and peak RSS (MB)."""
+    from extract import extract_traffic_data
+    logging.disable(logging.INFO)
+
+    start = time.perf_counter()
+    records = 0
+    for chunk in extract_traffic_data(path, chunk_size=chunk_size, stream=stream):
+        records += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'elapsed': elapsed, 'records': records, 'peak_mb': peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract memory benchmark')
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--measure', choices=['stream', 'load'], default=None,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--file', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.file, args.chunk_size, args.measure == 'stream')
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.json')
+        print(f"Writing {args.records} synthetic records...")
+        write_records_file(path, args.records)
+        print(f"File size: {os.path.getsize(path) / 1024 / 1024:.0f} MB\n")
+
+        print(f"{'mode':>8} {'records':>10} {'seconds':>8} {'peak MB':>8}")
+        for mode in ['stream', 'load']:
+            output = subprocess.run(
+                [sys.executable, __file__, '--measure', mode, '--file', path,
+                 '--chunk-size', str(args.chunk_size)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>8} {result['records']:>10} {result['elapsed']:>8.1f} "
+                  f"{result['peak_mb']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
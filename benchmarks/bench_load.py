@@ -0,0 +1,85 @@
+"""
+Benchmark load_to_mysql with executemany vs LOAD DATA LOCAL INFILE.
+
+Runs against the database in config.py. Benchmark rows use segment IDs
+prefixed with BENCH_ and are deleted before and after each run.
+The server needs local_infile=ON for the bulk mode.
+
+Usage:
+    python benchmarks/bench_load.py --rows 50000
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DB_CONFIG
+from transform import transform_traffic_data
+from load import load_to_mysql
+import speed_sketch
+import data_version
+from benchmarks.synthetic import make_records
+
+logging.disable(logging.INFO)
+
+PREFIX = 'BENCH_'
+
+
+def cleanup():
+    """Delete the benchmark rows and rebuild the speed sketches of their days."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT DATE(timestamp) FROM traffic_readings WHERE segment_id LIKE %s",
+                   (PREFIX + '%',))
+    days = [row[0] for row in cursor.fetchall()]
+    # traffic_readings is partitioned (no foreign key); hourly_stats rows
+    # go with their segments (ON DELETE CASCADE)
+    cursor.execute("DELETE FROM traffic_readings WHERE segment_id LIKE %s", (PREFIX + '%',))
+    cursor.execute("DELETE FROM road_segments WHERE segment_id LIKE %s", (PREFIX + '%',))
+    speed_sketch.refresh_days(cursor, days)
+    data_version.bump(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark')
+    parser.add_argument('--rows', type=int, default=50_000, help='Raw records to generate')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    chunks = []
+    for start in range(0, args.rows, args.chunk_size):
+        # Offset the start date per chunk so (segment_id, timestamp) never repeats
+        day = (datetime(2023, 1, 1) + timedelta(days=start // args.chunk_size)).strftime("%Y-%m-%d")
+        transformed = transform_traffic_data(
+            make_records(min(args.chunk_size, args.rows - start), seed=start, start_date=day)
+        )
+        for df in transformed.values():
+            df['segment_id'] = PREFIX + df['segment_id']
+        chunks.append(transformed)
+
+    readings = sum(len(chunk['readings']) for chunk in chunks)
+    print(f"{len(chunks)} chunks, {readings} readings\n")
+    print(f"{'mode':>12} {'seconds':>8} {'readings/s':>11}")
+
+    for mode, bulk in [('executemany', False), ('load data', True)]:
+        cleanup()
+        start = time.perf_counter()
+        for chunk in chunks:
+            load_to_mysql(chunk, bulk=bulk)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>12} {elapsed:>8.2f} {readings / elapsed:>11,.0f}")
+
+    cleanup()
+
+
+if __name__ == '__main__':
+    main()
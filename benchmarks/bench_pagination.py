@@ -0,0 +1,120 @@
+"""
+Benchmark /readings and /segments page latency by depth: LIMIT/OFFSET
+(skip) vs keyset cursors (next_cursor).
+
+For each depth, the cursor that a client walking the table would hold at
+that page is built from the row just before it (outside the timing), then
+the same page is requested both ways through the API app and checked to
+return the same rows. OFFSET latency grows with depth; cursor latency
+should stay flat.
+
+Needs the MySQL in config.py with data loaded. Depths past the end of the
+table are skipped.
+
+Usage:
+    python benchmarks/bench_pagination.py
+    python benchmarks/bench_pagination.py --limit 1000 --depths 1 100 1000 4000 --repeat 5
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+
+import numpy as np
+import mysql.connector
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DB_CONFIG
+from api.main import app
+from api.pagination import encode_cursor
+
+logging.disable(logging.INFO)
+
+DEPTHS = [1, 10, 100, 1000, 5000]
+
+# Per endpoint: table size, the row before a page, and its cursor
+ENDPOINTS = {
+    '/readings/': {
+        'count': "SELECT COUNT(*) FROM traffic_readings",
+        'row_before': """
+        SELECT timestamp, reading_id FROM traffic_readings
+        ORDER BY timestamp, reading_id
+        LIMIT 1 OFFSET %s
+        """,
+        'position': lambda row: {'timestamp': row[0].isoformat(), 'reading_id': row[1]},
+        'key': 'reading_id',
+    },
+    '/segments/': {
+        'count': "SELECT COUNT(*) FROM road_segments",
+        'row_before': """
+        SELECT segment_id FROM road_segments
+        ORDER BY segment_id
+        LIMIT 1 OFFSET %s
+        """,
+        'position': lambda row: {'segment_id': row[0]},
+        'key': 'segment_id',
+    },
+}
+
+
+def timed_page(client: TestClient, url: str, repeat: int):
+    """Median latency in ms and the rows of one page."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return float(np.median(latencies)) * 1000, response.json()['items']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OFFSET vs keyset pagination benchmark')
+    parser.add_argument('--limit', type=int, default=500, help='Rows per page')
+    parser.add_argument('--depths', type=int, nargs='+', default=DEPTHS,
+                        help='Page numbers to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='Requests per measurement')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+
+    with TestClient(app) as client:
+        for path, endpoint in ENDPOINTS.items():
+            cursor.execute(endpoint['count'])
+            total = cursor.fetchone()[0]
+            print(f"\n{path} ({total:,} rows, {args.limit} per page)")
+            print(f"{'page':>7} {'offset ms':>10} {'cursor ms':>10} {'speedup':>8}")
+
+            for depth in args.depths:
+                skip = (depth - 1) * args.limit
+                if skip >= total:
+                    continue
+
+                offset_ms, offset_rows = timed_page(
+                    client, f"{path}?limit={args.limit}&skip={skip}", args.repeat)
+
+                if skip:
+                    cursor.execute(endpoint['row_before'], (skip - 1,))
+                    token = encode_cursor(endpoint['position'](cursor.fetchone()))
+                    url = f"{path}?limit={args.limit}&cursor={token}"
+                else:
+                    url = f"{path}?limit={args.limit}"
+                cursor_ms, cursor_rows = timed_page(client, url, args.repeat)
+
+                key = endpoint['key']
+                if [row[key] for row in offset_rows] != [row[key] for row in cursor_rows]:
+                    raise SystemExit(f"{path} page {depth}: OFFSET and cursor pages differ")
+
+                print(f"{depth:>7} {offset_ms:>10.1f} {cursor_ms:>10.1f} "
+                      f"{offset_ms / cursor_ms:>7.1f}x")
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark the vectorized quality-flag engine against the old row-wise apply.
+
+Their parity is tested in tests/test_quality_flags.py.
+
+Usage:
+    python benchmarks/bench_quality_flags.py
+"""
+import sys
+import os
+import time
+import logging
+from typing import Optional, Tuple
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transform import assign_quality_flags
+from benchmarks.synthetic import make_records
+
+logging.disable(logging.INFO)
+
+SIZES = [5_000, 50_000, 500_000]
+
+
+def legacy_assign_quality_flag(row) -> Tuple[str, float]:
+    """Row-wise implementation used by transform.py before the rule table."""
+    if row.get('is_speed_corrected', False):
+        return 'CORRECTED_DECIMAL_ERROR', 0.7
+
+    if pd.notna(row['k']) and pd.notna(row['q']):
+        if row['k'] > 60 and row['etat_trafic'] in ['Bloqué', 'Saturé']:
+            return 'INCONSISTENT_SPEED_STATE', 0.5
+        if row['q'] > 2000 and row['k'] < 5:
+            return 'INCONSISTENT_EXTREME_FLOW_SPEED', 0.3
+        if row['q'] > 100 and row['k'] < 2:
+            return 'INCONSISTENT_STOPPED_WITH_FLOW', 0.4
+
+    if row['etat_barre'] == 'Invalide':
+        if pd.notna(row['q']) or pd.notna(row['k']):
+            return 'INVALID_SENSOR_HAS_DATA', 0.6
+        else:
+            return 'INVALID_SENSOR_NO_DATA', 0.1
+
+    if pd.isna(row['q']) and pd.notna(row['k']):
+        return 'MISSING_FLOW', 0.8
+    if pd.isna(row['k']) and pd.notna(row['q']):
+        return 'MISSING_SPEED', 0.8
+
+    return 'OK', 1.0
+
+
+def prepare_frame(n: int, seed: Optional[int] = None) -> pd.DataFrame:
+    """Build a frame in the state transform.py has right before Step 5 (seed defaults to n)."""
+    df = pd.DataFrame(make_records(n, seed=n if seed is None else seed))
+    df['is_speed_corrected'] = False
+    decimal_mask = (df['k'] > 0) & (df['k'] < 1)
+    df.loc[decimal_mask, 'k'] = df.loc[decimal_mask, 'k'] * 100
+    df.loc[decimal_mask, 'is_speed_corrected'] = True
+    # Keep rows missing both metrics so the INVALID_SENSOR_NO_DATA rule is exercised
+    return df
+
+
+def main():
+    print(f"{'rows':>8} {'row-wise rows/s':>16} {'vectorized rows/s':>18} {'speedup':>8}")
+
+    for n in SIZES:
+        df = prepare_frame(n)
+
+        start = time.perf_counter()
+        df.apply(legacy_assign_quality_flag, axis=1, result_type='expand')
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assign_quality_flags(df)
+        vector_time = time.perf_counter() - start
+
+        print(f"{n:>8} {n / legacy_time:>16,.0f} {n / vector_time:>18,.0f} "
+              f"{legacy_time / vector_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
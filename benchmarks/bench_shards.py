@@ -0,0 +1,72 @@
+"""
+Benchmark re-running extract + transform on an already extracted day:
+JSON day file vs. columnar Arrow shard.
+
+Writes a synthetic JSON file, converts it to a shard with ShardWriter (as
+extractor_by_date.py --format arrow does), checks that the first chunk
+transforms to the same segments and readings, and times extract + transform
+for each.
+
+Usage:
+    python benchmarks/bench_shards.py --records 500000
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+import tempfile
+
+import ijson
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import extract_traffic_data
+from transform import transform_traffic_data
+from shards import ShardWriter
+from benchmarks.synthetic import write_records_file
+
+logging.disable(logging.INFO)
+
+
+def run(path: str, chunk_size: int) -> float:
+    start = time.perf_counter()
+    for chunk in extract_traffic_data(path, chunk_size=chunk_size):
+        transform_traffic_data(chunk)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON vs Arrow shard re-run benchmark')
+    parser.add_argument('--records', type=int, default=500_000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'synthetic.json')
+        shard_path = os.path.join(tmp, 'synthetic.arrow')
+        print(f"Writing {args.records} synthetic records...")
+        write_records_file(json_path, args.records)
+
+        with open(json_path, 'rb') as f, ShardWriter(shard_path) as writer:
+            for record in ijson.items(f, 'item'):
+                writer.add(record)
+
+        # Parity check on the first chunk
+        expected = transform_traffic_data(next(extract_traffic_data(json_path, args.chunk_size)))
+        actual = transform_traffic_data(next(extract_traffic_data(shard_path, args.chunk_size)))
+        for table in expected:
+            pd.testing.assert_frame_equal(expected[table], actual[table])
+
+        print(f"\n{'format':>8} {'MB':>6} {'seconds':>8} {'records/s':>11} {'speedup':>8}")
+        baseline = run(json_path, args.chunk_size)
+        for label, path in [('json', json_path), ('arrow', shard_path)]:
+            elapsed = baseline if label == 'json' else run(path, args.chunk_size)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{label:>8} {size_mb:>6.0f} {elapsed:>8.1f} {args.records / elapsed:>11,.0f} "
+                  f"{baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
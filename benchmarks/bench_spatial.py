@@ -0,0 +1,87 @@
+"""
+Benchmark nearby-segment queries: grid index (api/spatial.py) vs a linear
+haversine scan over every segment, with a parity check on the results.
+
+Segments and query points are random points in Paris (no MySQL needed).
+
+Usage:
+    python benchmarks/bench_spatial.py
+    python benchmarks/bench_spatial.py --segments 3000 30000 --queries 10000 --radius 500
+"""
+import sys
+import os
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.spatial import SegmentIndex, haversine_m
+
+# Paris, inside the Boulevard Périphérique
+LAT_RANGE = (48.815, 48.902)
+LON_RANGE = (2.225, 2.470)
+
+
+def random_points(n: int, rng: random.Random):
+    return [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(n)]
+
+
+def linear_nearby(lats: np.ndarray, lons: np.ndarray, lat: float, lon: float,
+                  radius_m: float, limit: int):
+    distances = haversine_m(lat, lon, lats, lons)
+    inside = np.flatnonzero(distances <= radius_m)
+    order = np.lexsort((inside, distances[inside]))[:limit]
+    return inside[order].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid index vs linear scan for nearby segments')
+    parser.add_argument('--segments', type=int, nargs='+', default=[3000, 30000],
+                        help='Number of segments to index')
+    parser.add_argument('--queries', type=int, default=10000, help='Point queries per run')
+    parser.add_argument('--radius', type=float, default=500, help='Radius in metres')
+    parser.add_argument('--limit', type=int, default=100, help='Segments per query')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = random_points(args.queries, rng)
+
+    print(f"{args.queries:,} queries, radius {args.radius:.0f} m, limit {args.limit}")
+    print(f"{'segments':>9} {'build ms':>9} {'linear ms':>10} {'grid ms':>9} "
+          f"{'grid us/q':>10} {'speedup':>8} {'avg hits':>9}")
+
+    for n in args.segments:
+        rows = [{'segment_id': str(5000 + i), 'latitude': lat, 'longitude': lon}
+                for i, (lat, lon) in enumerate(random_points(n, rng))]
+
+        lats = np.array([row['latitude'] for row in rows])
+        lons = np.array([row['longitude'] for row in rows])
+
+        started = time.perf_counter()
+        index = SegmentIndex(rows)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        expected = [linear_nearby(lats, lons, lat, lon, args.radius, args.limit)
+                    for lat, lon in queries]
+        linear_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        results = [index.nearby(lat, lon, args.radius, args.limit) for lat, lon in queries]
+        grid_ms = (time.perf_counter() - started) * 1000
+
+        for (lat, lon), result, positions in zip(queries, results, expected):
+            if [position for position, _ in result] != positions:
+                raise SystemExit(f"{n} segments: grid and linear results differ at ({lat}, {lon})")
+
+        hits = sum(len(result) for result in results) / len(results)
+        print(f"{n:>9,} {build_ms:>9.1f} {linear_ms:>10.0f} {grid_ms:>9.0f} "
+              f"{grid_ms * 1000 / args.queries:>10.1f} {linear_ms / grid_ms:>7.1f}x {hits:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark transform throughput with 1, 2, 4 and 8 worker processes.
+
+Writes a synthetic input file (with its byte-offset index), then runs
+parallel_transform.transform_in_pool over it without loading to MySQL.
+The in-process row is the sequential extract + transform path for reference.
+
+Usage:
+    python benchmarks/bench_transform_workers.py --records 2000000
+"""
+import sys
+import os
+import time
+import argparse
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import extract_traffic_data
+from transform import transform_traffic_data
+from parallel_transform import transform_in_pool
+from benchmarks.synthetic import write_records_file
+
+logging.disable(logging.INFO)
+
+WORKERS = [1, 2, 4, 8]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transform worker scaling benchmark')
+    parser.add_argument('--records', type=int, default=2_000_000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.json')
+        print(f"Writing {args.records} synthetic records...")
+        write_records_file(path, args.records)
+
+        print(f"\n{'workers':>10} {'seconds':>8} {'records/s':>11} {'speedup':>8}")
+
+        start = time.perf_counter()
+        readings = 0
+        for chunk in extract_traffic_data(path, chunk_size=args.chunk_size):
+            readings += len(transform_traffic_data(chunk)['readings'])
+        baseline = time.perf_counter() - start
+        print(f"{'in-process':>10} {baseline:>8.1f} {args.records / baseline:>11,.0f} {1.0:>7.1f}x")
+
+        for workers in WORKERS:
+            start = time.perf_counter()
+            pooled_readings = 0
+            for _, _, transformed in transform_in_pool(path, args.chunk_size, workers):
+                pooled_readings += len(transformed['readings'])
+            elapsed = time.perf_counter() - start
+
+            assert pooled_readings == readings, "Pool produced a different number of readings"
+            print(f"{workers:>10} {elapsed:>8.1f} {args.records / elapsed:>11,.0f} "
+                  f"{baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
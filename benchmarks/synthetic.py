@@ -0,0 +1,206 @@
+"""
+Synthetic Kaggle-shaped traffic records (iu_ac, t_1h, q, k, etat_trafic,
+etat_barre, geo_point_2d, geo_shape, ...) for benchmarks, with the source's
+rates of missing metrics, decimal errors and invalid sensors.
+
+Usage:
+    python benchmarks/synthetic.py --records 5000000 --output Data/synthetic_5m.json
+    python benchmarks/synthetic.py --records 200000 --output /tmp/dup.json --duplicates 0.05
+"""
+import itertools
+import json
+import math
+import random
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source_index import IndexBuilder
+
+WRITE_BATCH = 10_000
+
+TRAFFIC_STATES = ['Fluide', 'Pré-saturé', 'Saturé', 'Bloqué', 'Inconnu']
+SENSOR_STATES = ['Ouvert', 'Barré', 'Invalide']
+STREET_NAMES = ['Quai_Hotel_de_Ville', 'Bd_Saint_Germain', 'Rue_de_Rivoli',
+                'Av_des_Champs_Elysees', 'Bd_Haussmann', 'Rue_Lafayette',
+                'Quai_de_la_Tournelle', 'Av_de_la_Republique', 'Bd_Voltaire',
+                'Rue_de_Vaugirard']
+
+# Distributions of the Kaggle source. The rates are calibrated so that
+# transform.py gives the January 1-2 figures in the README: 63.3% of records
+# kept; flags INVALID_SENSOR_HAS_DATA 63%, CORRECTED_DECIMAL_ERROR 16.5%,
+# OK 8%, INCONSISTENT_STOPPED_WITH_FLOW 7.6%, MISSING_FLOW 3%, MISSING_SPEED
+# 0.8%; raw speeds ~18% below 1 km/h, 70% at 1-10 km/h (all 'Fluide'), the
+# rest above, with a mean of ~4.9 km/h.
+
+# Missing q and k (rows missing both are dropped by transform)
+MISSING_BOTH = 0.367
+MISSING_FLOW_ONLY = 0.120
+MISSING_SPEED_ONLY = 0.025
+# Sensor states (Ouvert, Barré, Invalide): most records come from Invalide sensors
+SENSOR_WEIGHTS = [15, 2, 83]
+# Speeds stored /100 (0.18778 for 18.78 km/h), always 'Fluide'
+DECIMAL_ERROR_RATE = 0.17
+# Other speeds: lognormal, floored at 1 km/h
+SPEED_MEDIAN = 4.6
+SPEED_SIGMA = 0.72
+# Flow: lognormal, capped at arterial capacity
+FLOW_MEDIAN = 400.0
+FLOW_SIGMA = 0.7
+FLOW_MAX = 1900
+# Segments without geo_point_2d / geo_shape
+MISSING_GEO = 0.007
+# Traffic states at 10 km/h and above, or without a speed
+STATE_WEIGHTS = [70, 12, 8, 3, 7]
+
+_FLOW_FROM = MISSING_BOTH + MISSING_FLOW_ONLY
+_SENSOR_CUM = list(itertools.accumulate(SENSOR_WEIGHTS))
+_STATE_CUM = list(itertools.accumulate(STATE_WEIGHTS))
+
+
+def _speed(rng: random.Random) -> float:
+    """A raw k value: a decimal error below 1, otherwise at least 1 km/h."""
+    if rng.random() < DECIMAL_ERROR_RATE:
+        return round(rng.uniform(10, 60) / 100, 5)
+    return round(min(max(rng.lognormvariate(math.log(SPEED_MEDIAN), SPEED_SIGMA), 1.0), 130.0), 5)
+
+
+def make_records(n: int, seed: int = 0, n_segments: int = 1800,
+                 start_date: str = '2023-01-01', first_index: int = 0,
+                 duplicates: float = 0.0) -> List[Dict]:
+    """
+    Generate Kaggle-shaped raw traffic records for benchmarks, with the
+    source's rates of missing metrics, decimal errors and invalid sensors.
+
+    Args:
+        n: Number of records to generate
+        seed: Random seed (same seed gives the same records)
+        n_segments: Number of distinct road segments (iu_ac)
+        start_date: First day of the generated hourly timestamps
+        first_index: Position of the first record in a longer sequence
+            (segments cycle and hours advance with the position)
+        duplicates: Share of records that repeat the (iu_ac, t_1h) of the
+            record before them, as the source does (loading those needs a
+            conflict policy other than 'error')
+
+    Returns:
+        List of raw record dictionaries
+    """
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    records = []
+
+    for i in range(first_index, first_index + n):
+        position = i - 1 if records and rng.random() < duplicates else i
+        segment = position % n_segments
+        hour = position // n_segments
+        lat = 48.82 + (segment % 97) * 0.001
+        lon = 2.25 + (segment % 89) * 0.0025
+        timestamp = start + timedelta(hours=hour)
+
+        # roll bands: both missing, flow only missing, speed only missing, both present
+        roll = rng.random()
+        has_flow = roll >= _FLOW_FROM
+        has_speed = MISSING_BOTH <= roll < _FLOW_FROM or roll >= _FLOW_FROM + MISSING_SPEED_ONLY
+        q = None
+        if has_flow:
+            q = float(min(round(rng.lognormvariate(math.log(FLOW_MEDIAN), FLOW_SIGMA)), FLOW_MAX))
+        k = _speed(rng) if has_speed else None
+        if k is not None and k < 10:
+            state = 'Fluide'
+        else:
+            state = rng.choices(TRAFFIC_STATES, cum_weights=_STATE_CUM)[0]
+
+        located = (segment * 7919) % 1000 >= MISSING_GEO * 1000
+        records.append({
+            'iu_ac': str(5000 + segment),
+            'libelle': STREET_NAMES[segment % len(STREET_NAMES)],
+            't_1h': timestamp.strftime("%Y-%m-%dT%H:%M:%S+01:00"),
+            'q': q,
+            'k': k,
+            'etat_trafic': state,
+            'iu_nd_amont': str(9000 + segment),
+            'libelle_nd_amont': f"Node_{segment}_amont",
+            'iu_nd_aval': str(9000 + segment + 1),
+            'libelle_nd_aval': f"Node_{segment + 1}_aval",
+            'etat_barre': rng.choices(SENSOR_STATES, cum_weights=_SENSOR_CUM)[0],
+            'date_debut': '2005-01-01',
+            'date_fin': None if segment % 11 else '2030-01-01',
+            'geo_point_2d': {'lon': lon, 'lat': lat} if located else None,
+            'geo_shape': {
+                'type': 'Feature',
+                'geometry': {
+                    'coordinates': [[lon - 0.001, lat - 0.0005], [lon + 0.001, lat + 0.0005]],
+                    'type': 'LineString'
+                },
+                'properties': {}
+            } if located else None,
+        })
+
+    return records
+
+
+def write_records_file(path: str, n: int, n_segments: int = 1800,
+                       start_date: str = '2023-01-01', seed: int = 0,
+                       duplicates: float = 0.0):
+    """
+    Write n synthetic records as one JSON array, batch by batch so they are
+    never all in memory, together with the source_index sidecar.
+    """
+    index = IndexBuilder()
+    position = 1
+
+    with open(path, 'w') as f:
+        f.write('[')
+        written = 0
+        while written < n:
+            batch = make_records(min(WRITE_BATCH, n - written), seed=seed + written,
+                                 n_segments=n_segments, start_date=start_date,
+                                 first_index=written, duplicates=duplicates)
+            for record in batch:
+                if written:
+                    f.write(',')
+                    position += 1
+                text = json.dumps(record)
+                f.write(text)
+                index.add(position, position + len(text), record['t_1h'])
+                position += len(text)
+                written += 1
+        f.write(']')
+
+    index.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic Kaggle-shaped JSON input file (with its byte-offset index)')
+    parser.add_argument('--records', type=int, default=1_000_000, help='Records to generate')
+    parser.add_argument('--output', type=str, required=True, help='JSON file to write')
+    parser.add_argument('--segments', type=int, default=1784,
+                        help='Distinct road segments (the source has 1,784)')
+    parser.add_argument('--start-date', type=str, default='2023-01-01',
+                        help='First day of the hourly timestamps, YYYY-MM-DD')
+    parser.add_argument('--duplicates', type=float, default=0.0,
+                        help='Share of records repeating the previous (iu_ac, t_1h); '
+                             'load them with --on-conflict skip/better/always')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    write_records_file(args.output, args.records, n_segments=args.segments,
+                       start_date=args.start_date, seed=args.seed, duplicates=args.duplicates)
+    elapsed = time.perf_counter() - started
+
+    hours = -(-args.records // args.segments)
+    print(f"Wrote {args.records:,} records ({os.path.getsize(args.output) / 1e6:,.0f} MB, "
+          f"{args.segments:,} segments x {hours:,} hours from {args.start_date}) "
+          f"to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,20 @@ DB_CONFIG = {
     'user': 'root',
     'password': 'YOUR_PASSWORD_HERE',
     'database': 'paris_traffic'
+}
+
+# Optional API connection pool settings (defaults in api/database.py)
+POOL_CONFIG = {
+    'size': 5,
+    'max_overflow': 10,
+    'timeout': 10.0,
+    'ping_after': 5.0
+}
+
+# Optional API result cache settings (defaults in api/cache.py)
+CACHE_CONFIG = {
+    'max_entries': 512,
+    'max_bytes': 64 * 1024 * 1024,
+    'max_age': 0,
+    'version_ttl': 1.0
 }
\ No newline at end of file
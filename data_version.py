@@ -0,0 +1,17 @@
+# A single counter, bumped by every transaction that changes segments,
+# readings or the rollups derived from them: loader commits, rollup.py
+# backfills and API writes. Cached analytics results (api/cache.py) are
+# only served for the version they were computed at.
+#
+# The bump's row lock is held until COMMIT, so it comes as late as possible:
+# just before the hourly_stats refresh, whose rows record the version they
+# commit as (rollup.py), or last when a transaction writes no hourly_stats.
+# Writers queue on that lock, so versions are assigned in commit order.
+
+BUMP_QUERY = "UPDATE data_version SET version = version + 1 WHERE id = 1"
+VERSION_QUERY = "SELECT version FROM data_version WHERE id = 1"
+
+def bump(cursor):
+    """Bump the data version (call just before the changing transaction commits,
+    and before its hourly_stats refresh)."""
+    cursor.execute(BUMP_QUERY)
@@ -1,42 +1,113 @@
+import ijson
 import json
-from typing import Generator, List, Dict
+from typing import Generator, List, Dict, Union
 import logging
 
+import pandas as pd
+
+from shards import is_shard, iter_shard_chunks, shard_count, shard_rows
+from source_index import load_index, iter_rows
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_traffic_data(filepath: str, chunk_size: int = 1000) -> Generator[List[Dict], None, None]:
+def extract_traffic_data(filepath: str, chunk_size: int = 1000,
+                         stream: bool = True) -> Generator[Union[List[Dict], pd.DataFrame], None, None]:
     """
-    Read extracted JSON file in chunks for ETL processing.
-    
+    Read extracted JSON file (or columnar .arrow shard) in chunks for ETL processing.
+
     Args:
-        filepath: Path to extracted JSON file
+        filepath: Path to extracted JSON file or shard
         chunk_size: Number of records per chunk
-        
+        stream: Parse the top-level array one item at a time so peak memory
+            depends on chunk_size, not file size. Set to False to load the
+            whole file with json.load. Shards are always memory-mapped.
+
     Yields:
-        List of dictionaries containing traffic records
+        List of dictionaries containing traffic records, or a DataFrame
+        per chunk for shards
     """
     logger.info(f"Reading data from: {filepath}")
-    
+
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        total_records = len(data)
-        logger.info(f"Total records: {total_records}")
-        
-        for i in range(0, total_records, chunk_size):
-            chunk = data[i:i + chunk_size]
-            yield chunk
-            logger.info(f"Extracted chunk: {i+1}-{min(i+chunk_size, total_records)} / {total_records}")
-            
+        if is_shard(filepath):
+            yield from _shard_chunks(filepath, chunk_size)
+        elif stream:
+            yield from _stream_chunks(filepath, chunk_size)
+        else:
+            yield from _load_chunks(filepath, chunk_size)
+
     except FileNotFoundError:
         logger.error(f"File not found: {filepath}")
         raise
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON: {e}")
         raise
+    except ijson.JSONError as e:
+        logger.error(f"Invalid JSON: {e}")
+        raise
+
+def _stream_chunks(filepath: str, chunk_size: int) -> Generator[List[Dict], None, None]:
+    """Yield chunks while parsing the file incrementally with ijson."""
+    with open(filepath, 'rb') as f:
+        # use_float gives plain floats instead of Decimal, like json.load
+        records = ijson.items(f, 'item', use_float=True)
+
+        chunk = []
+        total_records = 0
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                total_records += len(chunk)
+                yield chunk
+                logger.info(f"Extracted chunk: {total_records-len(chunk)+1}-{total_records}")
+                chunk = []
+
+        if chunk:
+            total_records += len(chunk)
+            yield chunk
+            logger.info(f"Extracted chunk: {total_records-len(chunk)+1}-{total_records}")
+
+        logger.info(f"Total records: {total_records}")
+
+def _shard_chunks(filepath: str, chunk_size: int) -> Generator[pd.DataFrame, None, None]:
+    """Yield DataFrame chunks from a memory-mapped shard."""
+    total_records = 0
+    for chunk in iter_shard_chunks(filepath, chunk_size):
+        total_records += len(chunk)
+        yield chunk
+        logger.info(f"Extracted chunk: {total_records-len(chunk)+1}-{total_records}")
+
+    logger.info(f"Total records: {total_records}")
+
+def _load_chunks(filepath: str, chunk_size: int) -> Generator[List[Dict], None, None]:
+    """Yield chunks after loading the whole file into memory."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    total_records = len(data)
+    logger.info(f"Total records: {total_records}")
+
+    for i in range(0, total_records, chunk_size):
+        chunk = data[i:i + chunk_size]
+        yield chunk
+        logger.info(f"Extracted chunk: {i+1}-{min(i+chunk_size, total_records)} / {total_records}")
+
+def count_records(filepath: str) -> int:
+    """Number of records in an extracted file (JSON files are indexed on first use)."""
+    if is_shard(filepath):
+        return shard_count(filepath)
+    return load_index(filepath)['count']
+
+def read_records(filepath: str, first_row: int, count: int) -> Union[List[Dict], pd.DataFrame]:
+    """
+    Read records [first_row, first_row + count) without parsing the ones
+    before them (byte-offset index for JSON, memory map for shards).
+    """
+    if is_shard(filepath):
+        return shard_rows(filepath, first_row, count)
+    return list(iter_rows(filepath, first_row, count, use_float=True))
 
 if __name__ == '__main__':
     for chunk in extract_traffic_data('data_january1.json', chunk_size=5000):
-        print(f"Chunk size: {len(chunk)}")
\ No newline at end of file
+        print(f"Chunk size: {len(chunk)}")
@@ -3,6 +3,10 @@ import json
 from decimal import Decimal
 import os
 import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from source_index import load_index, period_span, iter_records, IndexBuilder
+from shards import ShardWriter, SHARD_SUFFIX
 
 INPUT_FILE = "Data/local_merged_data_01_04.json"
 
@@ -12,56 +16,137 @@ def decimal_default(obj):
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
 
-def run_extraction(target_date: str, limit: int = None):
+def date_range(start_date: str, end_date: str) -> List[str]:
+    #Return every date from start_date to end_date (inclusive) as YYYY-MM-DD.
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range((end - start).days + 1)]
+
+
+def _source_records(target_dates: List[str], use_index: bool):
+    #Yield source records, seeking straight to the target dates when the
+    #byte-offset index is enabled. The index is (re)built on first use.
+    if not use_index:
+        with open(INPUT_FILE, 'rb') as f:
+            yield from ijson.items(f, 'item')
+        return
+
+    span = period_span(load_index(INPUT_FILE), target_dates)
+    if span is None:
+        print("No records for these dates in the index")
+        return
+
+    yield from iter_records(INPUT_FILE, *span)
+
+
+def run_extraction(target_date: str, limit: int = None, use_index: bool = True,
+                   output_format: str = 'json'):
     #Extract records for a specific date from large JSON file.
 
-    output_file = f"Data/data_{target_date}.json"
-    
+    output_files = run_partition([target_date], limit, use_index, output_format)
+    if output_files is None:
+        return None
+    return output_files[target_date]
+
+
+def run_partition(target_dates: List[str], limit: int = None,
+                  use_index: bool = True, output_format: str = 'json') -> Optional[Dict[str, str]]:
+    #Extract several dates in a single pass over the large JSON file.
+    #Each date is written to its own Data/data_<date>.json, and limit applies per date.
+    #With output_format='arrow' each date becomes a columnar Data/data_<date>.arrow shard.
+    #If reading the source fails, the partial day files are removed and the error is
+    #raised, so a truncated day is never loaded (and marked complete in the ledger).
+
     if not os.path.exists(INPUT_FILE):
         print(f"Error: Could not find {INPUT_FILE}")
         return None
 
-    print(f"Extracting data for date: {target_date}")
+    arrow = output_format == 'arrow'
+    suffix = SHARD_SUFFIX if arrow else '.json'
+    output_files = {date: f"Data/data_{date}{suffix}" for date in target_dates}
+    counts = {date: 0 for date in target_dates}
+    out_handles = {}
+    # Byte position in each output and its sidecar index, built while writing
+    positions = {date: 1 for date in target_dates}
+    indexes = {date: IndexBuilder() for date in target_dates}
+
+    print(f"Extracting data for {len(target_dates)} date(s): {', '.join(target_dates)}")
     if limit:
-        print(f"Limit: {limit} records")
-    
-    count = 0
+        print(f"Limit: {limit} records per date")
+
     total_processed = 0
+    complete = False
+
+    try:
+        for date, path in output_files.items():
+            if arrow:
+                out_handles[date] = ShardWriter(path)
+            else:
+                out_handles[date] = open(path, 'w')
+                out_handles[date].write('[')
 
-    with open(INPUT_FILE, 'rb') as f:
-        parser = ijson.items(f, 'item')
-        
-        with open(output_file, 'w') as out_f:
-            out_f.write('[')
-            first = True
-            
-            try:
-                for record in parser:
-                    total_processed += 1
-                    timestamp = record.get('t_1h', '')
-                    
-                    if timestamp and timestamp.startswith(target_date):
-                        if not first:
+        # Dates that still accept records; a date leaves once it hits the limit
+        open_dates = set(target_dates)
+
+        parser = _source_records(target_dates, use_index)
+
+        try:
+            for record in parser:
+                total_processed += 1
+                timestamp = record.get('t_1h', '')
+                date = timestamp[:10] if timestamp else None
+
+                if date in open_dates:
+                    out_f = out_handles[date]
+                    if arrow:
+                        out_f.add(record)
+                    else:
+                        if counts[date]:
                             out_f.write(',')
-                        
-                        json.dump(record, out_f, default=decimal_default)
-                        first = False
-                        count += 1
-                        
-                        if count % 5000 == 0:
-                            print(f"Found {count} matches...")
-                        
-                        if limit and count >= limit:
-                            print(f"Reached limit of {limit}. Stopping.")
+                            positions[date] += 1
+
+                        # ASCII-only JSON, so string length is the byte length
+                        text = json.dumps(record, default=decimal_default)
+                        out_f.write(text)
+                        indexes[date].add(positions[date], positions[date] + len(text), timestamp)
+                        positions[date] += len(text)
+                    counts[date] += 1
+
+                    if counts[date] % 5000 == 0:
+                        print(f"Found {counts[date]} matches for {date}...")
+
+                    if limit and counts[date] >= limit:
+                        print(f"Reached limit of {limit} for {date}.")
+                        open_dates.discard(date)
+                        if not open_dates:
+                            print("All dates reached their limit. Stopping.")
                             break
-                            
-            except Exception as e:
-                print(f"Error: {e}")
-                
-            out_f.write(']')
 
-    print(f"Saved {count} records to {output_file}")
-    return output_file
+        except Exception as e:
+            print(f"Error: {e}")
+            raise
+
+        complete = True
+
+    finally:
+        for date, out_f in out_handles.items():
+            if arrow:
+                out_f.close()
+            else:
+                out_f.write(']')
+                out_f.close()
+                if complete:
+                    indexes[date].save(output_files[date])
+            if not complete:
+                os.remove(output_files[date])
+                print(f"Removed incomplete {output_files[date]}")
+
+    print(f"Scanned {total_processed} records")
+    for date in target_dates:
+        print(f"Saved {counts[date]} records to {output_files[date]}")
+    return output_files
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Extract Paris traffic data for a specific date')
@@ -78,5 +163,34 @@ if __name__ == "__main__":
         help='Max records to extract (default: all records for that date)'
     )
     
+    parser.add_argument(
+        '--start-date',
+        type=str,
+        default=None,
+        help='Start of date range to extract in one pass (YYYY-MM-DD)'
+    )
+    parser.add_argument(
+        '--end-date',
+        type=str,
+        default=None,
+        help='End of date range to extract in one pass (YYYY-MM-DD)'
+    )
+    parser.add_argument(
+        '--no-index',
+        action='store_true',
+        help='Scan the whole source instead of seeking with the byte-offset index'
+    )
+    parser.add_argument(
+        '--format',
+        choices=['json', 'arrow'],
+        default='json',
+        help='Write day files as JSON (default) or columnar Arrow shards (.arrow)'
+    )
+    
     args = parser.parse_args()
-    run_extraction(args.date, args.limit)
\ No newline at end of file
+    if args.start_date and args.end_date:
+        run_partition(date_range(args.start_date, args.end_date), args.limit,
+                      use_index=not args.no_index, output_format=args.format)
+    else:
+        run_extraction(args.date, args.limit, use_index=not args.no_index,
+                       output_format=args.format)
\ No newline at end of file
@@ -1,6 +1,6 @@
-import ijson
 import json
 from decimal import Decimal
+from source_index import read_row, load_index
 
 # --- CONFIGURATION ---
 FILE_TO_READ = "data_january1.json"
@@ -14,18 +14,16 @@ def decimal_default(obj):
 def inspect():
     print(f"Searching for row {ROW_NUMBER} in {FILE_TO_READ}...")
     
-    with open(FILE_TO_READ, 'rb') as f:
-        # We use enumerate to count as we go
-        parser = ijson.items(f, 'item')
-        
-        for index, record in enumerate(parser, 1):
-            if index == ROW_NUMBER:
-                print(f"\n--- FOUND ROW {ROW_NUMBER} ---\n")
-                # indent=4 makes it pretty and easy to read in the terminal
-                print(json.dumps(record, indent=4, default=decimal_default))
-                return
-        
-        print(f"Finished. The file only has {index} rows.")
+    # Seeks to the nearest indexed offset instead of parsing every row before it
+    record = read_row(FILE_TO_READ, ROW_NUMBER)
+    
+    if record is None:
+        print(f"Finished. The file only has {load_index(FILE_TO_READ)['count']} rows.")
+        return
+    
+    print(f"\n--- FOUND ROW {ROW_NUMBER} ---\n")
+    # indent=4 makes it pretty and easy to read in the terminal
+    print(json.dumps(record, indent=4, default=decimal_default))
 
 if __name__ == "__main__":
     inspect()
\ No newline at end of file
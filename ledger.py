@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+# Ledger rows are written through the loader's cursor, in the same
+# transaction as the chunk's readings, so a chunk is in the ledger if and
+# only if its rows were committed.
+
+def source_key(input_file: str) -> str:
+    """Ledger key for an input file (its file name, e.g. data_2023-01-02.json)."""
+    return os.path.basename(input_file)
+
+def source_date(input_file: str) -> Optional[str]:
+    """Date in an extracted file's name (data_YYYY-MM-DD.json), if any."""
+    match = re.search(r'\d{4}-\d{2}-\d{2}', os.path.basename(input_file))
+    return match.group() if match else None
+
+def chunk_checksum(readings_df: pd.DataFrame) -> str:
+    """SHA-1 over the row hashes of a chunk's transformed readings."""
+    row_hashes = pd.util.hash_pandas_object(readings_df, index=False)
+    return hashlib.sha1(row_hashes.to_numpy().tobytes()).hexdigest()
+
+def record_chunk(cursor, input_file: str, chunk_offset: int, row_count: int,
+                 readings_df: pd.DataFrame):
+    """Record a loaded chunk (call before the transaction commits)."""
+    cursor.execute("""
+    INSERT INTO etl_load_ledger
+    (source_file, chunk_offset, source_date, row_count, readings_count, checksum)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        row_count = VALUES(row_count),
+        readings_count = VALUES(readings_count),
+        checksum = VALUES(checksum),
+        loaded_at = CURRENT_TIMESTAMP
+    """, (source_key(input_file), chunk_offset, source_date(input_file),
+          row_count, len(readings_df), chunk_checksum(readings_df)))
+
+def record_file_complete(cursor, input_file: str, total_records: int):
+    """Record that every chunk of input_file has been loaded."""
+    cursor.execute("""
+    INSERT INTO etl_file_ledger (source_file, source_date, total_records)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        total_records = VALUES(total_records),
+        completed_at = CURRENT_TIMESTAMP
+    """, (source_key(input_file), source_date(input_file), total_records))
+
+def committed_offsets(cursor, input_file: str, chunk_size: int) -> Set[int]:
+    """
+    Offsets of the committed chunks of input_file.
+
+    Raises:
+        ValueError if the ledger was written with a different chunk size,
+        since its chunks would not line up with the ones about to be loaded
+    """
+    cursor.execute("""
+    SELECT chunk_offset, row_count FROM etl_load_ledger
+    WHERE source_file = %s
+    """, (source_key(input_file),))
+    rows = cursor.fetchall()
+
+    offsets = set()
+    for chunk_offset, row_count in rows:
+        if chunk_offset % chunk_size or row_count > chunk_size:
+            raise ValueError(
+                f"{source_key(input_file)} was loaded with a different chunk size; "
+                f"resume with the original --chunk-size"
+            )
+        offsets.add(chunk_offset)
+    return offsets
+
+def completed_files(cursor) -> Set[str]:
+    """Ledger keys of every fully loaded file."""
+    cursor.execute("SELECT source_file FROM etl_file_ledger")
+    return {row[0] for row in cursor.fetchall()}
+
+def status_report(cursor) -> List[Dict]:
+    """Per-file summary of what has been committed."""
+    cursor.execute("""
+    SELECT
+        l.source_file,
+        l.source_date,
+        COUNT(*) AS chunks,
+        SUM(l.row_count) AS records,
+        SUM(l.readings_count) AS readings,
+        MAX(l.loaded_at) AS last_loaded,
+        f.total_records,
+        f.completed_at
+    FROM etl_load_ledger l
+    LEFT JOIN etl_file_ledger f ON f.source_file = l.source_file
+    GROUP BY l.source_file, l.source_date, f.total_records, f.completed_at
+    ORDER BY l.source_date, l.source_file
+    """)
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -2,66 +2,533 @@ import mysql.connector
 import pandas as pd
 import numpy as np
 from config import DB_CONFIG
-from typing import Dict
+from typing import Dict, List, Optional, Set
+import ledger
+import data_version
+import rollup
+import partitions
+import speed_sketch
+from segment_registry import SegmentRegistry
+import tempfile
+import time
+import os
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_to_mysql(transformed_data: Dict[str, pd.DataFrame]):
+SEGMENT_COLUMNS = ['segment_id', 'street_name', 'latitude', 'longitude',
+                   'upstream_node_id', 'upstream_node_name',
+                   'downstream_node_id', 'downstream_node_name',
+                   'sensor_install_date', 'sensor_end_date', 'geometry_json']
+
+READING_COLUMNS = ['segment_id', 'timestamp', 'traffic_flow', 'avg_speed',
+                   'traffic_state', 'sensor_status', 'is_flow_imputed', 'is_speed_corrected',
+                   'data_quality_flag', 'quality_score']
+
+# Text formats for numeric columns in LOAD DATA files, matching the column types
+# in SQL/schema.sql (INT, DECIMAL(6,2), DECIMAL(3,2), DECIMAL(10,7))
+INFILE_FORMATS = {
+    'traffic_flow': '%.0f',
+    'avg_speed': '%.2f',
+    'quality_score': '%.2f',
+    'latitude': '%.7f',
+    'longitude': '%.7f',
+}
+
+# Errors raised when LOAD DATA LOCAL is disabled on the client or server
+LOCAL_INFILE_DISABLED_ERRORS = {1148, 2068, 3948}
+
+# What to do with a reading whose (segment_id, timestamp) is already loaded:
+#   error  - fail the chunk (plain INSERT)
+#   skip   - keep the existing row
+#   better - overwrite only if the new row has a higher quality_score
+#   always - overwrite with the new row
+CONFLICT_POLICIES = ['error', 'skip', 'better', 'always']
+READING_KEY = ['segment_id', 'timestamp']
+
+# Keys per SELECT when looking up which readings already exist
+EXISTING_LOOKUP_BATCH = 1000
+
+def _to_infile_text(series: pd.Series, float_format: str = None) -> pd.Series:
     """
-    Load transformed data into MySQL database.
-    
-    Args:
-        transformed_data: Dictionary with 'segments' and 'readings' DataFrames
+    Convert a column to LOAD DATA text: NULL as \\N, booleans as 1/0,
+    datetimes as 'YYYY-MM-DD HH:MM:SS' and strings with tab, newline and
+    backslash escaped.
     """
-    logger.info("Loading data to MySQL")
-    
+    nulls = series.isna()
+
+    if pd.api.types.is_bool_dtype(series):
+        text = pd.Series(np.where(series, '1', '0'), index=series.index)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        text = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+    elif float_format and pd.api.types.is_numeric_dtype(series):
+        text = pd.Series(np.char.mod(float_format, series.to_numpy(dtype=float)),
+                         index=series.index)
+    else:
+        text = (series.astype(str)
+                .str.replace('\\', '\\\\', regex=False)
+                .str.replace('\t', '\\t', regex=False)
+                .str.replace('\n', '\\n', regex=False))
+
+    return text.where(~nulls, '\\N')
+
+def _write_infile(df: pd.DataFrame, columns: List[str]) -> str:
+    """
+    Write df to a temporary tab-delimited LOAD DATA file.
+
+    Returns:
+        Path of the file (the caller removes it)
+    """
+    text_columns = [_to_infile_text(df[col], INFILE_FORMATS.get(col)) for col in columns]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8',
+                                     newline='', delete=False) as tmp:
+        if len(df):
+            lines = text_columns[0].str.cat(text_columns[1:], sep='\t')
+            tmp.write('\n'.join(lines))
+            tmp.write('\n')
+        return tmp.name
+
+def _bulk_load(cursor, table: str, df: pd.DataFrame, columns: List[str],
+               modifier: str = '') -> int:
+    """
+    Write df to a temporary tab-delimited file and load it with LOAD DATA LOCAL INFILE.
+
+    Returns:
+        Number of rows inserted
+    """
+    path = _write_infile(df, columns)
+
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        segments_df = transformed_data['segments']
-        
-        segments_df = segments_df.replace({np.nan: None})
-        
-        insert_segment_query = """
-        INSERT IGNORE INTO road_segments 
-        (segment_id, street_name, latitude, longitude, 
-         upstream_node_id, upstream_node_name,
-         downstream_node_id, downstream_node_name,
-         sensor_install_date, sensor_end_date, geometry_json)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s {modifier} INTO TABLE {table}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+        LINES TERMINATED BY '\\n'
+        ({', '.join(columns)})
+        """, (path,))
+        return cursor.rowcount
+    finally:
+        os.remove(path)
+
+def _insert_segments(cursor, segments_df: pd.DataFrame) -> int:
+    if segments_df.empty:
+        return 0
+    segments_df = segments_df.replace({np.nan: None})
+
+    insert_segment_query = """
+    INSERT IGNORE INTO road_segments
+    (segment_id, street_name, latitude, longitude,
+     upstream_node_id, upstream_node_name,
+     downstream_node_id, downstream_node_name,
+     sensor_install_date, sensor_end_date, geometry_json)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    segment_data = [tuple(row) for row in segments_df.values]
+    cursor.executemany(insert_segment_query, segment_data)
+    return cursor.rowcount
+
+def _update_segments(cursor, segments_df: pd.DataFrame) -> int:
+    """Rewrite the metadata of segments that changed since they were loaded."""
+    if segments_df.empty:
+        return 0
+    segments_df = segments_df.replace({np.nan: None})
+
+    update_segment_query = """
+    UPDATE road_segments
+    SET street_name = %s, latitude = %s, longitude = %s,
+        upstream_node_id = %s, upstream_node_name = %s,
+        downstream_node_id = %s, downstream_node_name = %s,
+        sensor_install_date = %s, sensor_end_date = %s, geometry_json = %s
+    WHERE segment_id = %s
+    """
+
+    columns = SEGMENT_COLUMNS[1:] + SEGMENT_COLUMNS[:1]
+    segment_data = [tuple(row) for row in segments_df[columns].values]
+    cursor.executemany(update_segment_query, segment_data)
+    return len(segment_data)
+
+def _insert_readings(cursor, readings_df: pd.DataFrame, ignore: bool = False) -> int:
+    if readings_df.empty:
+        return 0
+    readings_df = readings_df.replace({np.nan: None})
+
+    insert_reading_query = f"""
+    INSERT {'IGNORE ' if ignore else ''}INTO traffic_readings
+    (segment_id, timestamp, traffic_flow, avg_speed,
+     traffic_state, sensor_status, is_flow_imputed, is_speed_corrected,
+     data_quality_flag, quality_score)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    reading_data = [tuple(row) for row in readings_df.values]
+    cursor.executemany(insert_reading_query, reading_data)
+    return cursor.rowcount
+
+def _upsert_readings(cursor, readings_df: pd.DataFrame, policy: str) -> int:
+    """
+    Overwrite existing readings. With policy 'better' a row is only
+    overwritten if the new quality_score is higher (checked again in SQL in
+    case another writer changed the row since it was looked up).
+    """
+    readings_df = readings_df.replace({np.nan: None})
+
+    # quality_score must be assigned last: later assignments see the new value
+    update_columns = [col for col in READING_COLUMNS if col not in READING_KEY]
+    if policy == 'better':
+        is_better = "(quality_score IS NULL OR VALUES(quality_score) > quality_score)"
+        assignments = [f"{col} = IF({is_better}, VALUES({col}), {col})" for col in update_columns]
+    else:
+        assignments = [f"{col} = VALUES({col})" for col in update_columns]
+
+    upsert_reading_query = f"""
+    INSERT INTO traffic_readings
+    (segment_id, timestamp, traffic_flow, avg_speed,
+     traffic_state, sensor_status, is_flow_imputed, is_speed_corrected,
+     data_quality_flag, quality_score)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        {', '.join(assignments)}
+    """
+
+    reading_data = [tuple(row) for row in readings_df.values]
+    cursor.executemany(upsert_reading_query, reading_data)
+    return cursor.rowcount
+
+def _dedupe_readings(readings_df: pd.DataFrame, policy: str) -> pd.DataFrame:
+    """
+    Keep one reading per (segment_id, timestamp) within a chunk: the first
+    for 'skip', the highest quality_score for 'better', the last for 'always'.
+    """
+    if policy == 'better':
+        best_first = readings_df.sort_values('quality_score', ascending=False,
+                                             kind='stable', na_position='last')
+        return best_first.drop_duplicates(READING_KEY, keep='first').sort_index()
+    return readings_df.drop_duplicates(READING_KEY, keep='last' if policy == 'always' else 'first')
+
+def _wall_time(timestamps: pd.Series) -> pd.Series:
+    """Naive local timestamps, as stored in (and returned by) DATETIME columns."""
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        return timestamps.dt.tz_localize(None)
+    return timestamps
+
+def _existing_scores(cursor, readings_df: pd.DataFrame) -> pd.Series:
+    """
+    Look up which readings are already loaded.
+
+    Returns:
+        Series aligned with readings_df: the stored quality_score (NaN if it
+        is NULL) for existing readings, missing from the index for new ones
+    """
+    keys = pd.DataFrame({'segment_id': readings_df['segment_id'],
+                         'timestamp': _wall_time(readings_df['timestamp'])})
+    found = []
+
+    for start in range(0, len(keys), EXISTING_LOOKUP_BATCH):
+        batch = keys.iloc[start:start + EXISTING_LOOKUP_BATCH]
+        placeholders = ', '.join(['(%s, %s)'] * len(batch))
+        params = [value for segment_id, ts in zip(batch['segment_id'], batch['timestamp'])
+                  for value in (segment_id, ts.to_pydatetime())]
+        cursor.execute(f"""
+        SELECT segment_id, timestamp, quality_score FROM traffic_readings
+        WHERE (segment_id, timestamp) IN ({placeholders})
+        """, params)
+        found.extend(cursor.fetchall())
+
+    existing = pd.DataFrame(found, columns=['segment_id', 'timestamp', 'stored_score'])
+    existing['timestamp'] = pd.to_datetime(existing['timestamp'])
+    existing['stored_score'] = pd.to_numeric(existing['stored_score'], errors='coerce')
+
+    matched = keys.reset_index().merge(existing, on=READING_KEY, how='inner')
+    return matched.set_index('index')['stored_score']
+
+class MySQLLoader:
+    """
+    Load transformed chunks into MySQL over one connection for a whole run.
+
+    The connection, cursor and INSERT statements are reused for every chunk.
+    Chunks are committed in batches: after commit_every chunks, or once
+    commit_seconds have passed since the last commit, whichever comes first.
+    If a chunk fails, everything since the last commit is rolled back.
+
+    Segments already in road_segments are tracked in a SegmentRegistry
+    (self.segments), so only new segments are inserted and only segments
+    with changed metadata are updated.
+
+    Just before each commit, the data version is bumped, then the
+    hourly_stats rows of the hours and segments the pending chunks touched
+    are recomputed (see rollup.py) and speed sketches are rebuilt once per
+    touched day (see speed_sketch.py).
+
+    If traffic_readings is partitioned, a chunk with readings in a month
+    that has no partition yet first commits the pending chunks, then creates
+    the partition (see partitions.py; partition DDL commits implicitly).
+
+    Usage:
+        with MySQLLoader(commit_every=10) as loader:
+            for transformed in chunks:
+                loader.load(transformed)
+    """
+
+    def __init__(self, bulk: bool = False, commit_every: int = 1,
+                 commit_seconds: Optional[float] = None, conflict: str = 'error',
+                 maintain_rollup: bool = True):
         """
-        
-        segment_data = [tuple(row) for row in segments_df.values]
-        cursor.executemany(insert_segment_query, segment_data)
-        logger.info(f"Inserted {cursor.rowcount} segments")
-        
-        readings_df = transformed_data['readings']
-        
-        readings_df = readings_df.replace({np.nan: None})
-        
-        insert_reading_query = """
-        INSERT INTO traffic_readings
-        (segment_id, timestamp, traffic_flow, avg_speed,
-         traffic_state, sensor_status, is_flow_imputed, is_speed_corrected, 
-         data_quality_flag, quality_score)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        Args:
+            bulk: Load with LOAD DATA LOCAL INFILE instead of executemany.
+                Falls back to executemany if local infile is disabled.
+                Note that with LOCAL, duplicate readings are skipped with a
+                warning instead of failing the chunk.
+            commit_every: Commit after this many chunks
+            commit_seconds: Also commit once this many seconds have passed
+                since the last commit (None to disable)
+            conflict: What to do with readings that are already loaded, one
+                of CONFLICT_POLICIES. Except for 'error', duplicates within
+                a chunk are dropped and existing readings are looked up
+                first, so only new rows and real overwrites reach MySQL.
+            maintain_rollup: Keep hourly_stats and speed_sketches up to date
+                as chunks load. Without it, rebuild them afterwards with rollup.py.
         """
-        
-        reading_data = [tuple(row) for row in readings_df.values]
-        cursor.executemany(insert_reading_query, reading_data)
-        logger.info(f"Inserted {cursor.rowcount} readings")
-        
-        conn.commit()
-        logger.info("Data loaded successfully")
-        
-    except mysql.connector.Error as err:
-        logger.error(f"MySQL Error: {err}")
-        conn.rollback()
-        raise
-        
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        if conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {conflict} "
+                             f"(expected one of {', '.join(CONFLICT_POLICIES)})")
+        self.bulk = bulk
+        self.conflict = conflict
+        self.maintain_rollup = maintain_rollup
+        self.commit_every = max(1, commit_every)
+        self.commit_seconds = commit_seconds
+        self.conn = None
+        self.cursor = None
+        self.segments = SegmentRegistry()
+        self.partition_months = None
+        self.rollup_hours = set()
+        self.rollup_segments = set()
+        self.sketch_days = set()
+        self.pending_chunks = 0
+        self.pending_readings = 0
+        self.committed_chunks = 0
+        self.last_commit = time.monotonic()
+
+    def open(self):
+        if self.bulk:
+            self.conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+        else:
+            self.conn = mysql.connector.connect(**DB_CONFIG)
+        self.cursor = self.conn.cursor()
+        self.segments.warm(self.cursor)
+        self.partition_months = partitions.existing_months(self.cursor)
+        self.last_commit = time.monotonic()
+        logger.info(f"{len(self.segments)} segments already loaded")
+        logger.info(f"Connected to MySQL (commit every {self.commit_every} chunk(s)"
+                    + (f" or {self.commit_seconds}s)" if self.commit_seconds else ")"))
+
+    def close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+        if self.conn is not None:
+            self.conn.close()
+        self.cursor = None
+        self.conn = None
+
+    def __enter__(self) -> 'MySQLLoader':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            elif self.pending_chunks:
+                self.rollback()
+        finally:
+            self.close()
+
+    def load(self, transformed_data: Dict[str, pd.DataFrame],
+             source_file: Optional[str] = None, chunk_offset: int = 0,
+             row_count: int = 0) -> Dict[str, int]:
+        """
+        Load one transformed chunk and commit if the batch policy says so.
+
+        Args:
+            transformed_data: Dictionary with 'segments' and 'readings' DataFrames
+            source_file: Input file the chunk came from. If given, the chunk is
+                recorded in etl_load_ledger in the same transaction as its rows.
+            chunk_offset: Position of the chunk's first record in source_file
+            row_count: Number of raw records in the chunk
+
+        Returns:
+            Number of readings inserted, skipped and updated in this chunk
+        """
+        readings_df = transformed_data['readings']
+
+        if self.partition_months is not None and len(readings_df):
+            self._ensure_partitions(readings_df)
+
+        try:
+            segments_df, changed_segments_df = self.segments.stage(transformed_data['segments'])
+
+            new_df, update_df = readings_df, readings_df.iloc[0:0]
+            if self.conflict != 'error':
+                unique_df = _dedupe_readings(readings_df, self.conflict)
+                stored_scores = _existing_scores(self.cursor, unique_df)
+                new_df = unique_df.drop(index=stored_scores.index)
+                if self.conflict == 'always':
+                    update_df = unique_df.loc[stored_scores.index]
+                elif self.conflict == 'better':
+                    existing_df = unique_df.loc[stored_scores.index]
+                    is_better = (stored_scores.isna()
+                                 | (existing_df['quality_score'] > stored_scores))
+                    update_df = existing_df[is_better]
+            ignore = self.conflict != 'error'
+
+            if self.bulk:
+                try:
+                    inserted = _bulk_load(self.cursor, 'road_segments', segments_df,
+                                          SEGMENT_COLUMNS, modifier='IGNORE')
+                    logger.info(f"Inserted {inserted} segments")
+                    inserted = _bulk_load(self.cursor, 'traffic_readings', new_df,
+                                          READING_COLUMNS, modifier='IGNORE' if ignore else '')
+                except mysql.connector.Error as err:
+                    if err.errno not in LOCAL_INFILE_DISABLED_ERRORS:
+                        raise
+                    logger.warning(f"LOAD DATA LOCAL INFILE unavailable ({err}), "
+                                   f"falling back to executemany")
+                    self.bulk = False
+
+            if not self.bulk:
+                inserted = _insert_segments(self.cursor, segments_df)
+                logger.info(f"Inserted {inserted} segments")
+                inserted = _insert_readings(self.cursor, new_df, ignore=ignore)
+
+            if len(changed_segments_df):
+                updated = _update_segments(self.cursor, changed_segments_df)
+                logger.info(f"Updated {updated} changed segments")
+
+            if len(update_df):
+                _upsert_readings(self.cursor, update_df, self.conflict)
+
+            if self.maintain_rollup and len(readings_df):
+                hours = [pd.Timestamp(h).to_pydatetime() for h in
+                         _wall_time(readings_df['timestamp']).dt.floor('h').unique()]
+                self.rollup_hours.update(hours)
+                self.rollup_segments.update(readings_df['segment_id'].unique().tolist())
+                self.sketch_days.update(hour.date() for hour in hours)
+
+            if source_file is not None:
+                ledger.record_chunk(self.cursor, source_file, chunk_offset,
+                                    row_count, readings_df)
+
+        except mysql.connector.Error as err:
+            logger.error(f"MySQL Error: {err} (failed chunk is discarded as well)")
+            self.rollback()
+            raise
+
+        counts = {
+            'inserted': inserted,
+            'skipped': len(readings_df) - inserted - len(update_df),
+            'updated': len(update_df),
+        }
+        logger.info(f"Readings: {counts['inserted']} inserted, {counts['skipped']} skipped, "
+                    f"{counts['updated']} updated")
+
+        self.pending_chunks += 1
+        self.pending_readings += len(readings_df)
+
+        if (self.pending_chunks >= self.commit_every
+                or (self.commit_seconds is not None
+                    and time.monotonic() - self.last_commit >= self.commit_seconds)):
+            self.commit()
+
+        return counts
+
+    def _ensure_partitions(self, readings_df: pd.DataFrame):
+        """Create the traffic_readings partitions of any new month in readings_df."""
+        days = _wall_time(readings_df['timestamp']).dt.normalize().unique()
+        missing = partitions.months_of(pd.Timestamp(day) for day in days) - self.partition_months
+        if not missing:
+            return
+        self.commit()
+        created = partitions.ensure_months(self.cursor, missing)
+        self.partition_months = partitions.existing_months(self.cursor)
+        logger.info(f"Created {created} traffic_readings partition(s) for "
+                    f"{', '.join(sorted(f'{month:%Y-%m}' for month in missing))}")
+
+    def commit(self):
+        if self.conn is None:
+            return
+        try:
+            if self.pending_chunks:
+                data_version.bump(self.cursor)
+            if self.rollup_hours:
+                written = rollup.refresh_hours(self.cursor, self.rollup_hours, self.rollup_segments)
+                logger.info(f"Refreshed {written} hourly_stats rows ({len(self.rollup_hours)} "
+                            f"hour(s), {len(self.rollup_segments)} segment(s))")
+                self.rollup_hours = set()
+                self.rollup_segments = set()
+            if self.sketch_days:
+                written = speed_sketch.refresh_days(self.cursor, self.sketch_days)
+                logger.info(f"Rebuilt {written} speed_sketches rows "
+                            f"({len(self.sketch_days)} day(s))")
+                self.sketch_days = set()
+        except mysql.connector.Error as err:
+            logger.error(f"MySQL Error: {err} (uncommitted chunks are discarded)")
+            self.rollback()
+            raise
+        self.conn.commit()
+        self.segments.commit()
+        if self.pending_chunks:
+            logger.info(f"Committed {self.pending_chunks} chunk(s), "
+                        f"{self.pending_readings} readings")
+        self.committed_chunks += self.pending_chunks
+        self.pending_chunks = 0
+        self.pending_readings = 0
+        self.last_commit = time.monotonic()
+
+    def committed_offsets(self, source_file: str, chunk_size: int) -> Set[int]:
+        """Offsets of the chunks of source_file already in the ledger."""
+        return ledger.committed_offsets(self.cursor, source_file, chunk_size)
+
+    def completed_files(self) -> Set[str]:
+        """Ledger keys (file names) of every fully loaded file."""
+        return ledger.completed_files(self.cursor)
+
+    def mark_complete(self, source_file: str, total_records: int):
+        """Commit any pending chunks and record source_file as fully loaded."""
+        ledger.record_file_complete(self.cursor, source_file, total_records)
+        self.commit()
+
+    def rollback(self):
+        """Discard everything since the last commit."""
+        logger.warning(f"Rolling back to last commit: discarding {self.pending_chunks} "
+                       f"uncommitted chunk(s) ({self.pending_readings} readings)")
+        try:
+            self.conn.rollback()
+        except mysql.connector.Error as err:
+            logger.error(f"Rollback failed: {err}")
+        self.segments.rollback()
+        self.rollup_hours = set()
+        self.rollup_segments = set()
+        self.sketch_days = set()
+        self.pending_chunks = 0
+        self.pending_readings = 0
+
+def load_to_mysql(transformed_data: Dict[str, pd.DataFrame], bulk: bool = False,
+                  conflict: str = 'error'):
+    """
+    Load transformed data into MySQL database over a one-off connection.
+
+    Pipelines loading many chunks should use MySQLLoader instead.
+
+    Args:
+        transformed_data: Dictionary with 'segments' and 'readings' DataFrames
+        bulk: Load with LOAD DATA LOCAL INFILE instead of executemany
+        conflict: Policy for readings that are already loaded (see MySQLLoader)
+    """
+    logger.info("Loading data to MySQL")
+
+    with MySQLLoader(bulk=bulk, conflict=conflict) as loader:
+        loader.load(transformed_data)
+
+    logger.info("Data loaded successfully")
@@ -0,0 +1,67 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import AbstractSet, Dict, Generator, Tuple
+import logging
+
+import pandas as pd
+
+from transform import transform_traffic_data
+from extract import count_records, read_records
+
+logger = logging.getLogger(__name__)
+
+def transform_rows(input_file: str, first_row: int, count: int) -> Tuple[int, Dict[str, pd.DataFrame]]:
+    """
+    Worker task: read rows [first_row, first_row + count) of input_file by
+    byte offset (or from the memory-mapped shard) and transform them.
+
+    Workers parse their own rows, so only the file name and row range are
+    sent to the worker and the raw records are never pickled. The result
+    (numeric columns plus a few string columns) is cheap to send back.
+
+    Returns:
+        Tuple of (raw record count, transformed data)
+    """
+    chunk = read_records(input_file, first_row, count)
+    return len(chunk), transform_traffic_data(chunk)
+
+def transform_in_pool(input_file: str, chunk_size: int, workers: int,
+                      skip_offsets: AbstractSet[int] = frozenset()
+                      ) -> Generator[Tuple[int, int, Dict[str, pd.DataFrame]], None, None]:
+    """
+    Transform input_file in a pool of worker processes.
+
+    Chunks are submitted in file order and yielded in the same order, with
+    at most 2 * workers chunks in flight so results cannot pile up when the
+    consumer (the loader) is slower than the pool.
+
+    Args:
+        input_file: Path to extracted JSON file (indexed on first use) or shard
+        chunk_size: Records per chunk
+        workers: Number of transform processes
+        skip_offsets: First rows of chunks to leave out (already loaded)
+
+    Yields:
+        Tuple of (first row, raw record count, transformed data) per chunk
+    """
+    total_records = count_records(input_file)
+    logger.info(f"Transforming {total_records} records with {workers} worker processes")
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for first_row in range(0, total_records, chunk_size):
+            if first_row in skip_offsets:
+                continue
+            pending.append((first_row, pool.submit(transform_rows, input_file,
+                                                   first_row, chunk_size)))
+            if len(pending) >= 2 * workers:
+                first, future = pending.popleft()
+                yield (first, *future.result())
+
+        while pending:
+            first, future = pending.popleft()
+            yield (first, *future.result())
+    finally:
+        # On failure or early close, drop queued chunks instead of finishing them
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,294 @@
+import argparse
+import logging
+import re
+import mysql.connector
+from config import DB_CONFIG
+import data_version
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+# traffic_readings is RANGE partitioned by month on timestamp
+# (SQL/migrations/006_partition_traffic_readings.sql): p_before holds
+# everything before the first month, pYYYYMM one month each, and p_future
+# everything after the last one. Queries with a time window only read the
+# partitions it overlaps.
+#
+# The loader creates the partitions of incoming months before loading them
+# (ensure_months) by splitting the partition that currently covers them,
+# usually the empty p_future. Retiring a month (drop_month, archive_month)
+# drops its partition instead of deleting its rows one by one.
+#
+# Partition changes are DDL: MySQL commits the open transaction before
+# running them.
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'traffic_readings'
+
+PARTITIONS_QUERY = """
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+ORDER BY PARTITION_ORDINAL_POSITION
+"""
+
+_MONTH_NAME = re.compile(r'^p(\d{4})(\d{2})$')
+
+def month_start(value) -> date:
+    """First day of the month of a date or datetime."""
+    return date(value.year, value.month, 1)
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def parse_month(text: str) -> date:
+    """'2023-01' -> date(2023, 1, 1)"""
+    return datetime.strptime(text, '%Y-%m').date()
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+def months_of(timestamps: Iterable[datetime]) -> Set[date]:
+    """Distinct months (first days) of the given timestamps."""
+    return {month_start(ts) for ts in timestamps}
+
+def _bound(description: Optional[str]) -> Optional[date]:
+    """Upper bound of a partition from its PARTITION_DESCRIPTION (None for MAXVALUE)."""
+    if description is None or description.strip() == 'MAXVALUE':
+        return None
+    return datetime.strptime(description.strip("'")[:10], '%Y-%m-%d').date()
+
+def list_partitions(cursor) -> List[Dict]:
+    """
+    Partitions of traffic_readings in order, with their [lower, upper)
+    bounds (None when unbounded) and estimated row counts.
+
+    Returns an empty list if the table is not partitioned.
+    """
+    cursor.execute(PARTITIONS_QUERY, (TABLE,))
+    partitions = []
+    lower = None
+    for name, description, rows in cursor.fetchall():
+        if name is None:
+            return []
+        upper = _bound(description)
+        partitions.append({'name': name, 'lower': lower, 'upper': upper, 'rows': rows})
+        lower = upper
+    return partitions
+
+def _named_months(partitions: List[Dict]) -> Set[date]:
+    months = set()
+    for partition in partitions:
+        match = _MONTH_NAME.match(partition['name'])
+        if match:
+            months.add(date(int(match.group(1)), int(match.group(2)), 1))
+    return months
+
+def existing_months(cursor) -> Optional[Set[date]]:
+    """Months with their own partition (None if traffic_readings is not partitioned)."""
+    partitions = list_partitions(cursor)
+    if not partitions:
+        return None
+    return _named_months(partitions)
+
+def _definition(name: str, upper: Optional[date]) -> str:
+    bound = 'MAXVALUE' if upper is None else f"'{upper:%Y-%m-%d} 00:00:00'"
+    return f"PARTITION {name} VALUES LESS THAN ({bound})"
+
+def _month_definitions(first: date, stop: date) -> List[str]:
+    """One partition per month from first up to (not including) stop."""
+    definitions = []
+    month = first
+    while month < stop:
+        definitions.append(_definition(partition_name(month), next_month(month)))
+        month = next_month(month)
+    return definitions
+
+def ensure_months(cursor, months: Iterable[date]) -> int:
+    """
+    Give every month in months its own partition.
+
+    Each partition covering missing months is reorganized into monthly
+    partitions: p_future into every month up to the last one needed (so
+    bounds stay contiguous) followed by a new p_future, p_before into a
+    shorter p_before followed by the months up to its old bound, and a
+    month partition that absorbed a dropped month back into one partition
+    per month. Reorganizing copies only the rows of the split partition,
+    normally none.
+
+    Returns:
+        Number of partitions created
+    """
+    partitions = list_partitions(cursor)
+    if not partitions:
+        return 0
+    missing = sorted({month_start(month) for month in months} - _named_months(partitions))
+
+    created = 0
+    for partition in partitions:
+        lower, upper = partition['lower'], partition['upper']
+        covered = [month for month in missing
+                   if (lower is None or month >= lower) and (upper is None or month < upper)]
+        if not covered:
+            continue
+        if lower is None and upper is None:
+            raise ValueError(f"Cannot split {partition['name']}: it is the only partition")
+
+        if upper is None:
+            definitions = (_month_definitions(lower, next_month(covered[-1]))
+                           + [_definition(partition['name'], None)])
+        elif lower is None:
+            definitions = ([_definition(partition['name'], covered[0])]
+                           + _month_definitions(covered[0], upper))
+        else:
+            definitions = _month_definitions(lower, upper)
+
+        cursor.execute(f"""
+        ALTER TABLE {TABLE} REORGANIZE PARTITION {partition['name']} INTO (
+            {', '.join(definitions)}
+        )
+        """)
+        added = len(definitions) - 1
+        created += added
+        logger.info(f"Split {partition['name']} into {added + 1} partitions")
+
+    return created
+
+def _month_partition(cursor, month: date) -> Dict:
+    name = partition_name(month)
+    for partition in list_partitions(cursor):
+        if partition['name'] == name:
+            return partition
+    raise ValueError(f"traffic_readings has no partition {name}")
+
+def _forget_rollups(cursor, partition: Dict):
+    """Delete the hourly_stats and speed_sketches rows of a retired partition's range."""
+    conditions = []
+    params = []
+    if partition['lower'] is not None:
+        conditions.append("date >= %s")
+        params.append(partition['lower'])
+    conditions.append("date < %s")
+    params.append(partition['upper'])
+    where = ' AND '.join(conditions)
+
+    cursor.execute(f"DELETE FROM hourly_stats WHERE {where}", params)
+    logger.info(f"Deleted {cursor.rowcount} hourly_stats rows")
+    cursor.execute(f"DELETE FROM speed_sketches WHERE {where}", params)
+    logger.info(f"Deleted {cursor.rowcount} speed_sketches rows")
+
+def drop_month(cursor, month: date, keep_rollups: bool = False):
+    """
+    Delete every reading of a month by dropping its partition.
+
+    Unless keep_rollups, the month's hourly_stats and speed_sketches rows
+    are deleted as well (in a transaction of their own, committed by the
+    caller), so the analytics stop reporting it.
+
+    Readings later inserted for the month land in the next partition until
+    ensure_months gives it a partition again.
+    """
+    partition = _month_partition(cursor, month)
+    cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {partition['name']}")
+    logger.info(f"Dropped partition {partition['name']} (~{partition['rows']} readings)")
+    if not keep_rollups:
+        _forget_rollups(cursor, partition)
+    data_version.bump(cursor)
+
+def archive_table(month: date) -> str:
+    return f"{TABLE}_archive_{month:%Y%m}"
+
+def archive_month(cursor, month: date, keep_rollups: bool = False) -> str:
+    """
+    Move every reading of a month to its own table, traffic_readings_archive_YYYYMM,
+    by exchanging its partition with that (new, empty) table, then drop the
+    emptied partition. keep_rollups as for drop_month.
+
+    Returns:
+        Name of the archive table
+    """
+    partition = _month_partition(cursor, month)
+    archive = archive_table(month)
+    cursor.execute(f"CREATE TABLE {archive} LIKE {TABLE}")
+    cursor.execute(f"ALTER TABLE {archive} REMOVE PARTITIONING")
+    cursor.execute(f"ALTER TABLE {TABLE} EXCHANGE PARTITION {partition['name']} "
+                   f"WITH TABLE {archive}")
+    cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {partition['name']}")
+    logger.info(f"Archived partition {partition['name']} "
+                f"(~{partition['rows']} readings) to {archive}")
+    if not keep_rollups:
+        _forget_rollups(cursor, partition)
+    data_version.bump(cursor)
+    return archive
+
+def _print_partitions(cursor):
+    partitions = list_partitions(cursor)
+    if not partitions:
+        print("traffic_readings is not partitioned (run SQL/migrations/006_partition_traffic_readings.sql)")
+        return
+    print(f"{'partition':<12} {'from':<12} {'until':<12} {'rows (est.)':>12}")
+    for partition in partitions:
+        print(f"{partition['name']:<12} {str(partition['lower'] or '-'):<12} "
+              f"{str(partition['upper'] or '-'):<12} {partition['rows']:>12,}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description='List, create, drop or archive the monthly partitions of traffic_readings')
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument(
+        '--list',
+        action='store_true',
+        help='List partitions with their bounds and estimated row counts'
+    )
+    action.add_argument(
+        '--ensure',
+        type=str,
+        nargs=2,
+        metavar=('FIRST', 'LAST'),
+        help='Create the partitions of every month from FIRST to LAST (YYYY-MM)'
+    )
+    action.add_argument(
+        '--drop',
+        type=str,
+        metavar='MONTH',
+        help='Delete the readings of MONTH (YYYY-MM) by dropping its partition'
+    )
+    action.add_argument(
+        '--archive',
+        type=str,
+        metavar='MONTH',
+        help='Move the readings of MONTH (YYYY-MM) to traffic_readings_archive_YYYYMM'
+    )
+    parser.add_argument(
+        '--keep-rollups',
+        action='store_true',
+        help='With --drop or --archive, keep the month in hourly_stats and speed_sketches'
+    )
+
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        if args.list:
+            _print_partitions(cursor)
+        elif args.ensure:
+            first, last = parse_month(args.ensure[0]), parse_month(args.ensure[1])
+            months = []
+            while first <= last:
+                months.append(first)
+                first = next_month(first)
+            logger.info(f"Created {ensure_months(cursor, months)} partition(s)")
+        elif args.drop:
+            drop_month(cursor, parse_month(args.drop), args.keep_rollups)
+        else:
+            archive_month(cursor, parse_month(args.archive), args.keep_rollups)
+        conn.commit()
+    except mysql.connector.Error as err:
+        logger.error(f"MySQL Error: {err}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
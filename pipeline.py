@@ -1,9 +1,13 @@
-from extract import extract_traffic_data
+from extract import extract_traffic_data, count_records, read_records
 from transform import transform_traffic_data
-from load import load_to_mysql
+from load import MySQLLoader, CONFLICT_POLICIES
+from stages import run_stages
+from parallel_transform import transform_in_pool
+import ledger
 import logging
 import argparse
-from datetime import datetime, timedelta
+from typing import AbstractSet, Any, Generator, Optional, Tuple
+from datetime import datetime
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,38 +15,141 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_pipeline(input_file: str, chunk_size: int = 5000):
+def _raw_chunks(input_file: str, chunk_size: int,
+                skip_offsets: AbstractSet[int] = frozenset()) -> Generator[Tuple[int, Any], None, None]:
+    """
+    Yield (offset, chunk) for every chunk of input_file not in skip_offsets.
+
+    When resuming, committed chunks are not parsed at all: reading starts
+    from the byte offset of the first missing chunk (see source_index).
+    """
+    if not skip_offsets:
+        offset = 0
+        for chunk in extract_traffic_data(input_file, chunk_size=chunk_size):
+            yield offset, chunk
+            offset += len(chunk)
+        return
+    
+    for offset in range(0, count_records(input_file), chunk_size):
+        if offset not in skip_offsets:
+            yield offset, read_records(input_file, offset, chunk_size)
+
+def run_pipeline(input_file: str, chunk_size: int = 5000,
+                 loader: Optional[MySQLLoader] = None, concurrent: bool = False,
+                 transform_workers: int = 1, resume: bool = False):
     """
     Run complete ETL pipeline on any extracted JSON file.
     
     Args:
         input_file: Path to extracted JSON file
         chunk_size: Records per chunk
+        loader: Open MySQLLoader to load through (shared across files in a
+            date range). A default one is opened for this file if None.
+        concurrent: Run extract, transform and load in overlapping threads
+            connected by bounded queues instead of one after the other
+        transform_workers: Transform chunks in this many worker processes
+            (results are still loaded in file order)
+        resume: Skip the chunks already recorded in the load ledger and
+            continue from the first incomplete one (use the same chunk_size
+            as the interrupted run)
+    
+    Every chunk is recorded in the load ledger (etl_load_ledger) in the same
+    transaction as its rows, and the file is marked complete at the end.
     """
+    if loader is None:
+        with MySQLLoader() as loader:
+            return run_pipeline(input_file, chunk_size, loader, concurrent,
+                                transform_workers, resume)
+    
     start_time = datetime.now()
     
     logger.info("Starting ETL pipeline")
     logger.info(f"Input: {input_file}, Chunk size: {chunk_size}")
     
+    skip_offsets = loader.committed_offsets(input_file, chunk_size) if resume else set()
+    if skip_offsets:
+        logger.info(f"Resuming: {len(skip_offsets)} chunk(s) already committed")
+    
     total_processed = 0
     
     try:
-        for chunk in extract_traffic_data(input_file, chunk_size=chunk_size):
-            transformed = transform_traffic_data(chunk)
-            load_to_mysql(transformed)
-            
-            total_processed += len(chunk)
-            logger.info(f"Progress: {total_processed} records")
+        if concurrent:
+            total_processed = _run_concurrent(input_file, chunk_size, loader,
+                                              transform_workers, skip_offsets)
+        elif transform_workers > 1:
+            for offset, count, transformed in transform_in_pool(input_file, chunk_size,
+                                                                transform_workers, skip_offsets):
+                loader.load(transformed, input_file, offset, count)
+                
+                total_processed += count
+                logger.info(f"Progress: {total_processed} records")
+        else:
+            for offset, chunk in _raw_chunks(input_file, chunk_size, skip_offsets):
+                transformed = transform_traffic_data(chunk, loader.segments.known)
+                loader.load(transformed, input_file, offset, len(chunk))
+                
+                total_processed += len(chunk)
+                logger.info(f"Progress: {total_processed} records")
+        
+        # Flush the last partial commit batch and mark the file as done
+        total_records = count_records(input_file) if skip_offsets else total_processed
+        loader.mark_complete(input_file, total_records)
         
         elapsed = datetime.now() - start_time
         logger.info("Pipeline complete")
-        logger.info(f"Total: {total_processed} records, Time: {elapsed}")
+        logger.info(f"Total: {total_processed} records loaded, Time: {elapsed}")
         
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
         raise
 
-def run_date_range(start_date: str, end_date: str, chunk_size: int = 5000):
+def _run_concurrent(input_file: str, chunk_size: int, loader: MySQLLoader,
+                    transform_workers: int = 1,
+                    skip_offsets: AbstractSet[int] = frozenset()) -> int:
+    """
+    Overlap extract, transform and load, each in its own thread.
+    With a transform pool, extract and transform happen in the worker
+    processes and the load thread consumes their results.
+    
+    Returns:
+        Number of raw records processed
+    """
+    total_processed = 0
+    
+    def transform_stage(item):
+        offset, chunk = item
+        return offset, len(chunk), transform_traffic_data(chunk, loader.segments.known)
+    
+    def load_stage(item):
+        nonlocal total_processed
+        offset, count, transformed = item
+        loader.load(transformed, input_file, offset, count)
+        total_processed += count
+        logger.info(f"Progress: {total_processed} records")
+    
+    if transform_workers > 1:
+        stats = run_stages(
+            transform_in_pool(input_file, chunk_size, transform_workers, skip_offsets),
+            [('load', load_stage)],
+            source_name='extract+transform pool'
+        )
+    else:
+        stats = run_stages(
+            _raw_chunks(input_file, chunk_size, skip_offsets),
+            [('transform', transform_stage), ('load', load_stage)]
+        )
+    
+    logger.info("Stage utilisation:")
+    for stage in stats:
+        logger.info(f"  {stage.name}: {stage.items} chunks, busy {stage.busy_seconds:.1f}s "
+                    f"of {stage.wall_seconds:.1f}s ({stage.utilisation*100:.0f}%)")
+    
+    return total_processed
+
+def run_date_range(start_date: str, end_date: str, chunk_size: int = 5000,
+                   loader: Optional[MySQLLoader] = None, concurrent: bool = False,
+                   transform_workers: int = 1, resume: bool = False,
+                   output_format: str = 'json'):
     """
     Extract and load data for a range of dates.
     
@@ -50,37 +157,81 @@ def run_date_range(start_date: str, end_date: str, chunk_size: int = 5000):
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
         chunk_size: Records per chunk
+        loader: Open MySQLLoader used for every day (a default one if None)
+        concurrent: Overlap extract, transform and load (see run_pipeline)
+        transform_workers: Transform worker processes (see run_pipeline)
+        resume: Skip days the ledger marks complete (they are not extracted
+            again) and resume partially loaded days (see run_pipeline)
+        output_format: Extract days to 'json' files or columnar 'arrow' shards
+    
+    Every day is extracted before any is loaded; if reading the source fails,
+    the error is raised before a day is loaded or marked complete, so
+    --resume extracts them all again.
     """
-    from extractor_by_date import run_extraction
+    if loader is None:
+        with MySQLLoader() as loader:
+            return run_date_range(start_date, end_date, chunk_size, loader,
+                                  concurrent, transform_workers, resume, output_format)
+    
+    from extractor_by_date import run_extraction, run_partition, date_range
+    from shards import SHARD_SUFFIX
     
-    start = datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.strptime(end_date, "%Y-%m-%d")
-    current = start
+    suffix = SHARD_SUFFIX if output_format == 'arrow' else '.json'
+    
+    dates = date_range(start_date, end_date)
     
     logger.info(f"Running pipeline for date range: {start_date} to {end_date}")
     
-    while current <= end:
-        date_str = current.strftime("%Y-%m-%d")
-        logger.info(f"Processing date: {date_str}")
-        
-        # Extract
-        output_file = run_extraction(date_str)
+    if resume:
+        completed = loader.completed_files()
+        done = [d for d in dates if ledger.source_key(f"data_{d}{suffix}") in completed]
+        if done:
+            logger.info(f"Resuming: skipping {len(done)} completed day(s)")
+        dates = [d for d in dates if d not in done]
+    
+    if len(dates) > 1:
+        # Extract every day in a single pass over the source file
+        output_files = run_partition(dates, output_format=output_format) or {}
+    elif dates:
+        output_file = run_extraction(dates[0], output_format=output_format)
+        output_files = {dates[0]: output_file} if output_file else {}
+    else:
+        output_files = {}
+    
+    for date_str in dates:
+        output_file = output_files.get(date_str)
         
         if output_file:
             # Load
-            run_pipeline(output_file, chunk_size)
-        
-        current += timedelta(days=1)
+            logger.info(f"Processing date: {date_str}")
+            run_pipeline(output_file, chunk_size, loader, concurrent, transform_workers,
+                         resume)
     
     logger.info("Date range pipeline complete")
 
+def print_status(loader: MySQLLoader):
+    """Print what the load ledger says has been committed, per source file."""
+    rows = ledger.status_report(loader.cursor)
+    if not rows:
+        print("Load ledger is empty")
+        return
+    
+    print(f"{'file':<32} {'date':<10} {'chunks':>7} {'records':>9} {'readings':>9} "
+          f"{'state':<12} last loaded")
+    for row in rows:
+        state = 'complete' if row['completed_at'] is not None else 'incomplete'
+        source_date = str(row['source_date'] or '-')
+        print(f"{row['source_file']:<32} {source_date:<10} {row['chunks']:>7} "
+              f"{int(row['records']):>9} {int(row['readings']):>9} {state:<12} "
+              f"{row['last_loaded']}")
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run Paris Traffic ETL Pipeline')
     parser.add_argument(
         '--file',
         type=str,
         default='Data/data_january1.json',
-        help='Path to input JSON file'
+        help='Path to input JSON file or .arrow shard'
     )
     parser.add_argument(
         '--date',
@@ -106,18 +257,86 @@ if __name__ == '__main__':
         default=5000,
         help='Records per chunk (default: 5000)'
     )
+    parser.add_argument(
+        '--bulk-load',
+        action='store_true',
+        help='Load with LOAD DATA LOCAL INFILE (needs local_infile=ON on the server)'
+    )
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=1,
+        help='Commit after this many chunks (default: 1)'
+    )
+    parser.add_argument(
+        '--commit-seconds',
+        type=float,
+        default=None,
+        help='Also commit once this many seconds have passed since the last commit'
+    )
+    parser.add_argument(
+        '--on-conflict',
+        choices=CONFLICT_POLICIES,
+        default='error',
+        help='Readings already in the database: error (default), skip, '
+             'better (overwrite if higher quality_score) or always (overwrite)'
+    )
+    parser.add_argument(
+        '--concurrent',
+        action='store_true',
+        help='Overlap extract, transform and load in separate threads'
+    )
+    parser.add_argument(
+        '--transform-workers',
+        type=int,
+        default=1,
+        help='Transform chunks in N worker processes (default: 1, in-process)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip chunks and days already committed according to the load ledger'
+    )
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help='Print the load ledger (what has been committed) and exit'
+    )
+    parser.add_argument(
+        '--format',
+        choices=['json', 'arrow'],
+        default='json',
+        help='Extract days to JSON (default) or columnar Arrow shards for --date/--start-date'
+    )
+    parser.add_argument(
+        '--no-rollup',
+        action='store_true',
+        help='Do not update hourly_stats and speed_sketches while loading '
+             '(rebuild them later with rollup.py)'
+    )
     
     args = parser.parse_args()
     
-    if args.start_date and args.end_date:
-        # Load entire date range
-        run_date_range(args.start_date, args.end_date, args.chunk_size)
-    elif args.date:
-        # Extract and load single date
-        from extractor_by_date import run_extraction
-        output_file = run_extraction(args.date)
-        if output_file:
-            run_pipeline(output_file, args.chunk_size)
-    else:
-        # Load already extracted file
-        run_pipeline(args.file, args.chunk_size)
\ No newline at end of file
+    with MySQLLoader(bulk=args.bulk_load,
+                     commit_every=args.commit_every,
+                     commit_seconds=args.commit_seconds,
+                     conflict=args.on_conflict,
+                     maintain_rollup=not args.no_rollup) as loader:
+        if args.status:
+            print_status(loader)
+        elif args.start_date and args.end_date:
+            # Load entire date range
+            run_date_range(args.start_date, args.end_date, args.chunk_size, loader,
+                           args.concurrent, args.transform_workers, args.resume,
+                           args.format)
+        elif args.date:
+            # Extract and load single date
+            from extractor_by_date import run_extraction
+            output_file = run_extraction(args.date, output_format=args.format)
+            if output_file:
+                run_pipeline(output_file, args.chunk_size, loader, args.concurrent,
+                             args.transform_workers, args.resume)
+        else:
+            # Load already extracted file
+            run_pipeline(args.file, args.chunk_size, loader, args.concurrent,
+                         args.transform_workers, args.resume)
\ No newline at end of file
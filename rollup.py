@@ -0,0 +1,204 @@
+import argparse
+import logging
+import mysql.connector
+from config import DB_CONFIG
+import speed_sketch
+import data_version
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# hourly_stats holds one row per (segment, date, hour) with the averages the
+# API reports plus the sums and counts behind them, so any group of hours,
+# days or segments can be re-aggregated exactly (SUM(sum) / SUM(count)).
+#
+# A refresh recomputes whole hours from traffic_readings instead of adding
+# deltas, so it is idempotent and stays correct whatever the loader did with
+# a reading (insert, skip, overwrite) or when the API deletes one. It is
+# limited to the segments that changed (the chunk's, or the one reading's),
+# so a chunk rescans only its own segments' hours, not every segment's. The
+# loader runs it through its own cursor, in the transaction that commits the
+# chunks.
+#
+# Every row written carries, in version, the data version its transaction
+# commits as: the transaction bumps the counter first, and the bump's row
+# lock orders writers, so versions follow commit order (see data_version.py).
+# The road network (api/network.py) reads the rows of the versions it has
+# not seen yet.
+#
+# Readings without a quality_score are left out (as in speed_sketches), so
+# the rollup answers exactly what `quality_score >= 0` on the readings does.
+
+logger = logging.getLogger(__name__)
+
+# Hours per DELETE / INSERT ... SELECT pair
+REFRESH_BATCH_HOURS = 168
+
+ROLLUP_SELECT = """
+INSERT INTO hourly_stats
+(segment_id, date, hour, avg_flow, avg_speed, total_readings, missing_readings,
+ data_quality_score, flow_sum, flow_count, speed_sum, speed_count,
+ flow_speed_sum, flow_speed_count, version)
+SELECT
+    segment_id,
+    DATE(timestamp),
+    HOUR(timestamp),
+    ROUND(AVG(traffic_flow), 2),
+    ROUND(AVG(avg_speed), 2),
+    COUNT(*),
+    SUM(traffic_flow IS NULL OR avg_speed IS NULL),
+    ROUND(AVG(quality_score), 2),
+    SUM(traffic_flow),
+    COUNT(traffic_flow),
+    SUM(avg_speed),
+    COUNT(avg_speed),
+    SUM(IF(traffic_flow IS NULL, NULL, avg_speed)),
+    COUNT(IF(traffic_flow IS NULL, NULL, avg_speed)),
+    (SELECT version FROM data_version WHERE id = 1)
+FROM traffic_readings
+WHERE quality_score IS NOT NULL AND ({windows}){segments}
+GROUP BY segment_id, DATE(timestamp), HOUR(timestamp)
+"""
+
+def floor_hours(timestamps: Iterable[datetime]) -> List[datetime]:
+    """Sorted distinct hours (naive wall time) covering the given timestamps."""
+    return sorted({ts.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+                   for ts in timestamps})
+
+def _windows(hours: List[datetime]) -> List[Tuple[datetime, datetime]]:
+    """Merge sorted hours into [start, end) ranges of consecutive hours."""
+    windows = []
+    for hour in hours:
+        if windows and windows[-1][1] == hour:
+            windows[-1] = (windows[-1][0], hour + timedelta(hours=1))
+        else:
+            windows.append((hour, hour + timedelta(hours=1)))
+    return windows
+
+def refresh_statements(timestamps: Iterable[datetime],
+                       segment_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, list]]:
+    """
+    SQL to recompute the hourly_stats rows of every hour touched by timestamps,
+    for the given segments only (every segment if None). Run it after the
+    transaction's data version bump.
+
+    Returns:
+        (query, params) pairs to execute in order, in one transaction
+    """
+    hours = floor_hours(timestamps)
+    statements = []
+
+    segment_condition = ''
+    segment_params = []
+    if segment_ids is not None:
+        segment_params = sorted({str(segment_id) for segment_id in segment_ids})
+        if not segment_params:
+            return []
+        segment_condition = f" AND segment_id IN ({', '.join(['%s'] * len(segment_params))})"
+
+    for start in range(0, len(hours), REFRESH_BATCH_HOURS):
+        batch = hours[start:start + REFRESH_BATCH_HOURS]
+
+        by_date: Dict[date, List[int]] = {}
+        for hour in batch:
+            by_date.setdefault(hour.date(), []).append(hour.hour)
+        delete_conditions = []
+        delete_params = []
+        for day, day_hours in by_date.items():
+            placeholders = ', '.join(['%s'] * len(day_hours))
+            delete_conditions.append(f"(date = %s AND hour IN ({placeholders}))")
+            delete_params.extend([day, *day_hours])
+        statements.append((f"DELETE FROM hourly_stats "
+                           f"WHERE ({' OR '.join(delete_conditions)}){segment_condition}",
+                           delete_params + segment_params))
+
+        windows = _windows(batch)
+        condition = ' OR '.join(['(timestamp >= %s AND timestamp < %s)'] * len(windows))
+        statements.append((ROLLUP_SELECT.format(windows=condition, segments=segment_condition),
+                           [bound for window in windows for bound in window] + segment_params))
+
+    return statements
+
+def refresh_hours(cursor, timestamps: Iterable[datetime],
+                  segment_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Recompute the hourly_stats rows of every hour touched by timestamps, for
+    segment_ids only if given (call after the data version bump of the
+    transaction that changed those readings, before it commits).
+
+    Returns:
+        Number of hourly_stats rows written
+    """
+    written = 0
+    for query, params in refresh_statements(timestamps, segment_ids):
+        cursor.execute(query, params)
+        if query.lstrip().startswith('INSERT'):
+            written += cursor.rowcount
+    return written
+
+def loaded_date_range(cursor) -> Tuple[Optional[date], Optional[date]]:
+    """First and last date in traffic_readings (None, None if empty)."""
+    cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM traffic_readings")
+    first, last = cursor.fetchone()
+    if first is None:
+        return None, None
+    return first.date(), last.date()
+
+def backfill(start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """
+    Rebuild hourly_stats and speed_sketches from readings already loaded,
+    one day per transaction.
+
+    Args:
+        start_date: First day to rebuild (YYYY-MM-DD), default the first loaded day
+        end_date: Last day to rebuild (YYYY-MM-DD), default the last loaded day
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        first, last = loaded_date_range(cursor)
+        if first is None:
+            logger.info("traffic_readings is empty, nothing to backfill")
+            return
+        if start_date:
+            first = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if end_date:
+            last = datetime.strptime(end_date, '%Y-%m-%d').date()
+
+        day = first
+        total = 0
+        while day <= last:
+            midnight = datetime.combine(day, datetime.min.time())
+            data_version.bump(cursor)
+            written = refresh_hours(cursor, [midnight + timedelta(hours=h) for h in range(24)])
+            sketch_rows = speed_sketch.refresh_days(cursor, [day])
+            conn.commit()
+            total += written
+            logger.info(f"{day}: {written} hourly_stats rows, {sketch_rows} speed_sketches rows")
+            day += timedelta(days=1)
+
+        logger.info(f"Backfill complete: {total} hourly_stats rows from {first} to {last}")
+    except mysql.connector.Error as err:
+        logger.error(f"MySQL Error: {err}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description='Rebuild the hourly_stats rollup and speed sketches from loaded readings')
+    parser.add_argument(
+        '--start-date',
+        type=str,
+        help='First day to rebuild, YYYY-MM-DD (default: first loaded day)'
+    )
+    parser.add_argument(
+        '--end-date',
+        type=str,
+        help='Last day to rebuild, YYYY-MM-DD (default: last loaded day)'
+    )
+
+    args = parser.parse_args()
+    backfill(args.start_date, args.end_date)
@@ -0,0 +1,119 @@
+import math
+from typing import Dict, Mapping, Optional, Tuple
+
+import pandas as pd
+
+# Segment metadata compared to detect changes, as named in road_segments.
+# geometry_json is not compared (stringifying geo_shape is what we want to
+# avoid for known segments); it is rewritten whenever another field changes.
+FINGERPRINT_COLUMNS = ['street_name', 'latitude', 'longitude',
+                       'upstream_node_id', 'upstream_node_name',
+                       'downstream_node_id', 'downstream_node_name',
+                       'sensor_install_date', 'sensor_end_date']
+
+# Matching columns in the raw Kaggle records
+RAW_FINGERPRINT_COLUMNS = ['libelle', 'latitude', 'longitude',
+                           'iu_nd_amont', 'libelle_nd_amont',
+                           'iu_nd_aval', 'libelle_nd_aval',
+                           'date_debut', 'date_fin']
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def segment_fingerprint(street_name, latitude, longitude,
+                        upstream_node_id, upstream_node_name,
+                        downstream_node_id, downstream_node_name,
+                        sensor_install_date, sensor_end_date) -> Tuple:
+    """
+    Normalised segment metadata, equal for a raw record and the row MySQL
+    stored for it: coordinates rounded to the DECIMAL(10,7) columns, dates
+    as YYYY-MM-DD strings and everything else as strings.
+    """
+    def text(value):
+        return None if _is_missing(value) else str(value)
+
+    def coordinate(value):
+        return None if _is_missing(value) else round(float(value), 7)
+
+    def date(value):
+        return None if _is_missing(value) else str(value)[:10]
+
+    return (text(street_name), coordinate(latitude), coordinate(longitude),
+            text(upstream_node_id), text(upstream_node_name),
+            text(downstream_node_id), text(downstream_node_name),
+            date(sensor_install_date), date(sensor_end_date))
+
+def fingerprints(df: pd.DataFrame, columns=FINGERPRINT_COLUMNS) -> pd.Series:
+    """Fingerprint of every row of df (columns in FINGERPRINT_COLUMNS order)."""
+    return pd.Series([segment_fingerprint(*row) for row in df[columns].itertuples(index=False)],
+                     index=df.index, dtype=object)
+
+class SegmentRegistry:
+    """
+    Process-wide view of which road segments are already in the database.
+
+    The registry maps segment_id to the fingerprint of its stored metadata.
+    It is warmed from road_segments when the loader connects; chunks are
+    then split into new segments (to insert), changed ones (to update) and
+    known ones (dropped). Changes are staged until the loader commits, so a
+    rolled-back chunk does not leave segments marked as loaded.
+    """
+
+    def __init__(self):
+        self.known: Dict[str, Tuple] = {}
+        self._staged: Dict[str, Tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    def warm(self, cursor):
+        """Load the fingerprints of every segment in road_segments."""
+        cursor.execute(f"""
+        SELECT segment_id, {', '.join(FINGERPRINT_COLUMNS)}
+        FROM road_segments
+        """)
+        self.known = {row[0]: segment_fingerprint(*row[1:]) for row in cursor.fetchall()}
+        self._staged = {}
+
+    def stage(self, segments_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Split a chunk's segments against the registry and stage them.
+
+        Args:
+            segments_df: road_segments rows (one per segment_id)
+
+        Returns:
+            Tuple of (new segments, segments whose metadata changed)
+        """
+        if segments_df.empty:
+            return segments_df, segments_df
+
+        is_new, is_changed = [], []
+        for segment_id, fingerprint in zip(segments_df['segment_id'], fingerprints(segments_df)):
+            previous = self._staged.get(segment_id, self.known.get(segment_id))
+            is_new.append(previous is None)
+            is_changed.append(previous is not None and previous != fingerprint)
+            if previous != fingerprint:
+                self._staged[segment_id] = fingerprint
+
+        return segments_df[is_new], segments_df[is_changed]
+
+    def commit(self):
+        self.known.update(self._staged)
+        self._staged = {}
+
+    def rollback(self):
+        self._staged = {}
+
+def unknown_segments(raw_segments: pd.DataFrame,
+                     known: Optional[Mapping[str, Tuple]]) -> pd.Series:
+    """
+    Mask of raw segment rows (one per iu_ac, with latitude/longitude
+    columns) that are new or differ from the known fingerprints.
+    """
+    if not known:
+        return pd.Series(True, index=raw_segments.index)
+    prints = fingerprints(raw_segments, RAW_FINGERPRINT_COLUMNS)
+    return pd.Series([known.get(iu_ac) != fingerprint
+                      for iu_ac, fingerprint in zip(raw_segments['iu_ac'].astype(str), prints)],
+                     index=raw_segments.index, dtype=bool)
@@ -0,0 +1,143 @@
+from decimal import Decimal
+from typing import Any, Dict, Generator, List
+import logging
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Columnar day shards: Arrow IPC stream files holding the columns transform
+# uses, with fixed types. Low-cardinality text is dictionary-encoded and the
+# GPS point is split into latitude/longitude, so transform can skip parsing
+# geo_point_2d. geo_shape is stored as the str() of the parsed dict, which is
+# what transform writes to road_segments.geometry_json.
+SHARD_SUFFIX = '.arrow'
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+SHARD_SCHEMA = pa.schema([
+    ('iu_ac', pa.string()),
+    ('libelle', _DICTIONARY),
+    ('t_1h', _DICTIONARY),
+    ('q', pa.float64()),
+    ('k', pa.float64()),
+    ('etat_trafic', _DICTIONARY),
+    ('iu_nd_amont', pa.string()),
+    ('libelle_nd_amont', pa.string()),
+    ('iu_nd_aval', pa.string()),
+    ('libelle_nd_aval', pa.string()),
+    ('etat_barre', _DICTIONARY),
+    ('date_debut', pa.string()),
+    ('date_fin', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('geo_shape', pa.string()),
+])
+
+# Rows buffered per record batch while writing
+WRITE_BATCH = 50_000
+
+def is_shard(path: str) -> bool:
+    return path.endswith(SHARD_SUFFIX)
+
+def _floats(value: Any) -> Any:
+    """Replace Decimals (from ijson) with floats, recursively."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {key: _floats(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_floats(item) for item in value]
+    return value
+
+def _text(value: Any):
+    return None if value is None else str(value)
+
+def _number(value: Any):
+    return None if value is None else float(value)
+
+class ShardWriter:
+    """
+    Write raw records to a shard one at a time, in record batches of
+    WRITE_BATCH rows (each batch carries its own dictionaries).
+
+    Usage:
+        with ShardWriter('Data/data_2023-01-02.arrow') as writer:
+            for record in records:
+                writer.add(record)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._columns: Dict[str, List] = {name: [] for name in SHARD_SCHEMA.names}
+        self._sink = pa.OSFile(path, 'wb')
+        self._writer = pa.ipc.new_stream(self._sink, SHARD_SCHEMA)
+
+    def __enter__(self) -> 'ShardWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, record: Dict):
+        columns = self._columns
+        point = record.get('geo_point_2d')
+        shape = record.get('geo_shape')
+
+        for name in ['iu_ac', 'libelle', 't_1h', 'etat_trafic',
+                     'iu_nd_amont', 'libelle_nd_amont', 'iu_nd_aval', 'libelle_nd_aval',
+                     'etat_barre', 'date_debut', 'date_fin']:
+            columns[name].append(_text(record.get(name)))
+        columns['q'].append(_number(record.get('q')))
+        columns['k'].append(_number(record.get('k')))
+        columns['latitude'].append(_number(point['lat']) if isinstance(point, dict) else None)
+        columns['longitude'].append(_number(point['lon']) if isinstance(point, dict) else None)
+        columns['geo_shape'].append(None if shape is None else str(_floats(shape)))
+
+        self.count += 1
+        if len(columns['iu_ac']) >= WRITE_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if not self._columns['iu_ac']:
+            return
+        arrays = []
+        for field in SHARD_SCHEMA:
+            values = self._columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=SHARD_SCHEMA))
+        self._columns = {name: [] for name in SHARD_SCHEMA.names}
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._sink.close()
+        self._writer = None
+
+def read_shard(path: str) -> pa.Table:
+    """
+    Memory-map a shard. The table's buffers point into the mapped file, so
+    nothing is copied until columns are converted to pandas.
+    """
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_stream(source).read_all()
+
+def shard_count(path: str) -> int:
+    return read_shard(path).num_rows
+
+def shard_rows(path: str, first_row: int, count: int) -> pd.DataFrame:
+    """Rows [first_row, first_row + count) of a shard as a DataFrame."""
+    return read_shard(path).slice(first_row, count).to_pandas()
+
+def iter_shard_chunks(path: str, chunk_size: int) -> Generator[pd.DataFrame, None, None]:
+    """Yield a shard as DataFrames of up to chunk_size rows."""
+    table = read_shard(path)
+    for start in range(0, table.num_rows, chunk_size):
+        yield table.slice(start, chunk_size).to_pandas()
@@ -0,0 +1,282 @@
+import ijson
+import json
+import os
+import re
+import argparse
+import itertools
+from typing import Dict, Generator, List, Optional, Tuple
+
+# Sidecar index written next to the source file, e.g.
+# Data/local_merged_data_01_04.json -> Data/local_merged_data_01_04.json.idx
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+DEFAULT_STRIDE = 1000
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# A complete JSON string, a lone quote (string cut off at the end of the
+# buffer) or a bracket. Everything else (numbers, literals, ':' and ',')
+# does not change nesting, so the scanner never has to look at it.
+TOKEN_PATTERN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|"|[\[\]{}]', re.S)
+T1H_KEY = b'"t_1h"'
+
+def index_path(source: str) -> str:
+    return source + INDEX_SUFFIX
+
+class IndexBuilder:
+    """
+    Collects element offsets for an index. Used by build_index while
+    scanning, and by writers that know the offsets of what they write.
+    """
+
+    def __init__(self, stride: int = DEFAULT_STRIDE):
+        self.stride = stride
+        self.count = 0
+        self.rows: List[int] = []
+        self.dates: Dict[str, List[int]] = {}
+        self.hours: Dict[str, List[int]] = {}
+
+    def add(self, start: int, end: int, timestamp: Optional[str]):
+        """Record one array element spanning bytes [start, end)."""
+        if self.count % self.stride == 0:
+            self.rows.append(start)
+        self.count += 1
+
+        if timestamp:
+            for key, spans in ((timestamp[:10], self.dates), (timestamp[:13], self.hours)):
+                span = spans.get(key)
+                if span is None:
+                    spans[key] = [start, end, 1]
+                else:
+                    span[1] = end
+                    span[2] += 1
+
+    def save(self, source: str) -> Dict:
+        """Write the sidecar index for source (which must be complete on disk)."""
+        stat = os.stat(source)
+        index = {
+            'version': INDEX_VERSION,
+            'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'stride': self.stride,
+            'count': self.count,
+            'rows': self.rows,
+            'dates': self.dates,
+            'hours': self.hours,
+        }
+
+        with open(index_path(source), 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        return index
+
+def build_index(source: str, stride: int = DEFAULT_STRIDE) -> Dict:
+    """
+    Scan the source JSON array once and record byte offsets of its elements.
+
+    Args:
+        source: Path to a JSON file holding one top-level array of records
+        stride: Record the start offset of every Nth element
+
+    Returns:
+        Index dictionary with:
+        - rows: start offset of elements 0, stride, 2*stride, ...
+        - dates: {'YYYY-MM-DD': [first_start, last_end, count]} by t_1h
+        - hours: {'YYYY-MM-DDTHH': [first_start, last_end, count]} by t_1h
+    """
+    print(f"Building index for {source} (stride {stride})...")
+
+    builder = IndexBuilder(stride)
+    depth = 0
+    element_start = None
+    timestamp = None
+    t1h_key_end = None
+
+    with open(source, 'rb') as f:
+        buf = b''
+        base = 0
+        eof = False
+
+        while not eof:
+            data = f.read(BLOCK_SIZE)
+            eof = not data
+            buf += data
+            # Bytes before cut are fully scanned; the rest is carried over
+            # so the gap after the last token is still there next round
+            cut = 0
+
+            for match in TOKEN_PATTERN.finditer(buf):
+                token = match.group()
+
+                if token == b'"':
+                    if eof:
+                        raise ValueError(f"Unterminated string at byte {base + match.start()}")
+                    # String continues in the next block: rescan it from there
+                    break
+
+                cut = match.end()
+
+                if token[0] == 0x22:  # string
+                    if depth == 2:
+                        if (t1h_key_end is not None
+                                and buf[t1h_key_end - base:match.start()].strip() == b':'):
+                            timestamp = token[1:-1].decode('utf-8')
+                            t1h_key_end = None
+                        elif token == T1H_KEY:
+                            t1h_key_end = base + match.end()
+                        else:
+                            t1h_key_end = None
+                    continue
+
+                if token in (b'{', b'['):
+                    if depth == 1:
+                        element_start = base + match.start()
+                        timestamp = None
+                        t1h_key_end = None
+                    depth += 1
+                    continue
+
+                # Closing bracket
+                depth -= 1
+                if depth == 1:
+                    builder.add(element_start, base + match.end(), timestamp)
+
+            base += cut
+            buf = buf[cut:]
+
+    index = builder.save(source)
+    print(f"Indexed {index['count']} records, {len(index['dates'])} dates -> {index_path(source)}")
+    return index
+
+def load_index(source: str, stride: int = DEFAULT_STRIDE) -> Dict:
+    """
+    Load the sidecar index, rebuilding it if it is missing or stale.
+
+    The index is stale when the source file's size or mtime no longer match
+    the values recorded at build time, or when a different stride is requested.
+    """
+    stat = os.stat(source)
+    path = index_path(source)
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                index = json.load(f)
+            if (index.get('version') == INDEX_VERSION
+                    and index['source_size'] == stat.st_size
+                    and index['source_mtime'] == stat.st_mtime
+                    and index['stride'] == stride):
+                return index
+        except (ValueError, KeyError):
+            pass
+        print(f"Index {path} is stale, rebuilding")
+
+    return build_index(source, stride)
+
+class _ArraySlice:
+    """
+    File-like view of the byte range [start, end) of the source array,
+    wrapped in '[' and ']' so it parses as a JSON array of whole elements.
+    When end is None the slice runs to the source's own closing bracket.
+    """
+
+    def __init__(self, f, start: int, end: Optional[int] = None):
+        self.f = f
+        self.f.seek(start)
+        self.remaining = None if end is None else end - start
+        self.prefix = b'['
+        self.suffix = b']' if end is not None else b''
+
+    def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b''
+
+        if self.prefix:
+            data, self.prefix = self.prefix, b''
+            return data
+
+        if self.remaining is None:
+            return self.f.read(size)
+
+        if self.remaining > 0:
+            if size < 0 or size > self.remaining:
+                size = self.remaining
+            data = self.f.read(size)
+            self.remaining -= len(data)
+            if data:
+                return data
+            self.remaining = 0
+
+        data, self.suffix = self.suffix, b''
+        return data
+
+def iter_records(source: str, start: int, end: Optional[int] = None,
+                 use_float: bool = False) -> Generator[Dict, None, None]:
+    """
+    Yield records from the source array starting at byte offset start.
+
+    Args:
+        source: Path to the source JSON file
+        start: Byte offset of an element's first character (from the index)
+        end: Byte offset just past the last element to read (None = to the end)
+        use_float: Parse numbers as float instead of Decimal
+    """
+    with open(source, 'rb') as f:
+        yield from ijson.items(_ArraySlice(f, start, end), 'item', use_float=use_float)
+
+def iter_rows(source: str, first_row: int, count: int,
+              stride: int = DEFAULT_STRIDE, use_float: bool = False) -> Generator[Dict, None, None]:
+    """
+    Yield up to count records starting at 0-based first_row. Parsing starts
+    at the nearest indexed offset at or before first_row.
+    """
+    index = load_index(source, stride)
+    if first_row >= index['count'] or count <= 0:
+        return
+
+    checkpoint = first_row // index['stride']
+    skip = first_row - checkpoint * index['stride']
+
+    records = iter_records(source, index['rows'][checkpoint], use_float=use_float)
+    yield from itertools.islice(records, skip, skip + count)
+
+def read_row(source: str, row_number: int, stride: int = DEFAULT_STRIDE) -> Optional[Dict]:
+    """
+    Return the record at 1-based row_number, or None if the file is shorter.
+    Only the records between the nearest indexed offset and the row are parsed.
+    """
+    if row_number < 1:
+        return None
+    return next(iter_rows(source, row_number - 1, 1, stride), None)
+
+def period_span(index: Dict, periods: List[str]) -> Optional[Tuple[int, int]]:
+    """
+    Return the (start, end) byte range covering every record of the given
+    dates ('YYYY-MM-DD') or hours ('YYYY-MM-DDTHH'), or None if none of them
+    are in the source. Records of other periods may be inside the range when
+    the source is not sorted, so callers still filter on t_1h.
+    """
+    spans = []
+    for period in periods:
+        spans.append((index['dates'] if len(period) == 10 else index['hours']).get(period))
+    spans = [span for span in spans if span]
+
+    if not spans:
+        return None
+    return min(span[0] for span in spans), max(span[1] for span in spans)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the byte-offset index for a source JSON file')
+    parser.add_argument(
+        '--file',
+        type=str,
+        default='Data/local_merged_data_01_04.json',
+        help='Source JSON file (default: Data/local_merged_data_01_04.json)'
+    )
+    parser.add_argument(
+        '--stride',
+        type=int,
+        default=DEFAULT_STRIDE,
+        help=f'Index every Nth record (default: {DEFAULT_STRIDE})'
+    )
+
+    args = parser.parse_args()
+    build_index(args.file, args.stride)
@@ -0,0 +1,146 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Mergeable speed distribution for /analytics/speed-stats.
+#
+# speed_sketches keeps, per day and quality_score, a histogram of avg_speed
+# in SPEED_BIN_WIDTH km/h bins: the number of readings in each bin, their sum
+# and sum of squares, and the smallest and largest speed in the bin. Rows for
+# any set of days merge by adding counts and sums and taking min/max, and
+# quality_score is one of the few scores in QUALITY_RULES, so a quality
+# threshold is just a WHERE on the sketch.
+#
+# Error bound: sample_size, mean, std_dev, min and max are exact. Each
+# percentile (and the median) is computed the way np.percentile does it, from
+# order statistics that are placed evenly between their bin's min and max, so
+# it is off by less than SPEED_BIN_WIDTH from the exact value.
+#
+# Days are rebuilt from traffic_readings (not updated with deltas), in the
+# same transaction as the readings that changed them. Readings without a speed
+# or a quality_score are left out, as they never match `quality_score >= x`.
+
+SPEED_BIN_WIDTH = 0.5
+
+SKETCH_SELECT = f"""
+INSERT INTO speed_sketches
+(date, quality_score, speed_bin, readings, speed_sum, speed_sq_sum, min_speed, max_speed)
+SELECT
+    DATE(timestamp),
+    quality_score,
+    FLOOR(avg_speed / {SPEED_BIN_WIDTH}),
+    COUNT(*),
+    SUM(avg_speed),
+    SUM(avg_speed * avg_speed),
+    MIN(avg_speed),
+    MAX(avg_speed)
+FROM traffic_readings
+WHERE timestamp >= %s AND timestamp < %s
+AND avg_speed IS NOT NULL
+AND quality_score IS NOT NULL
+GROUP BY DATE(timestamp), quality_score, FLOOR(avg_speed / {SPEED_BIN_WIDTH})
+"""
+
+# Sketch merged over the rows matching {where} (a quality threshold and
+# optionally a range of days), one row per bin in speed order
+MERGED_SKETCH_QUERY = """
+SELECT
+    speed_bin,
+    SUM(readings) as readings,
+    SUM(speed_sum) as speed_sum,
+    SUM(speed_sq_sum) as speed_sq_sum,
+    MIN(min_speed) as min_speed,
+    MAX(max_speed) as max_speed
+FROM speed_sketches
+WHERE {where}
+GROUP BY speed_bin
+ORDER BY speed_bin
+"""
+
+def _day_ranges(days: Iterable[date]) -> List[Tuple[date, datetime, datetime]]:
+    ranges = []
+    for day in sorted(set(days)):
+        midnight = datetime.combine(day, datetime.min.time())
+        ranges.append((day, midnight, midnight + timedelta(days=1)))
+    return ranges
+
+def refresh_statements(days: Iterable[date]) -> List[Tuple[str, list]]:
+    """
+    SQL to rebuild the sketch rows of the given days.
+
+    Returns:
+        (query, params) pairs to execute in order, in one transaction
+    """
+    statements = []
+    for day, start, end in _day_ranges(days):
+        statements.append(("DELETE FROM speed_sketches WHERE date = %s", [day]))
+        statements.append((SKETCH_SELECT, [start, end]))
+    return statements
+
+def refresh_days(cursor, days: Iterable[date]) -> int:
+    """
+    Rebuild the sketch rows of the given days (call before the transaction
+    that changed their readings commits).
+
+    Returns:
+        Number of sketch rows written
+    """
+    written = 0
+    for query, params in refresh_statements(days):
+        cursor.execute(query, params)
+        if query.lstrip().startswith('INSERT'):
+            written += cursor.rowcount
+    return written
+
+def _order_statistics(ranks: np.ndarray, counts: np.ndarray, mins: np.ndarray,
+                      maxs: np.ndarray) -> np.ndarray:
+    """
+    Estimate the values at 0-based ranks of the sorted speeds. The readings
+    of a bin are spread evenly from its min (first) to its max (last).
+    """
+    cumulative = np.cumsum(counts)
+    bins = np.searchsorted(cumulative, ranks, side='right')
+    position = ranks - (cumulative[bins] - counts[bins])
+    spread = np.where(counts[bins] > 1, position / np.maximum(counts[bins] - 1, 1), 0.0)
+    return mins[bins] + (maxs[bins] - mins[bins]) * spread
+
+def summarize(rows: List[Dict]) -> Dict[str, float]:
+    """
+    Speed statistics from merged sketch rows (MERGED_SKETCH_QUERY).
+
+    Returns:
+        Dictionary with the fields of SpeedStatsResponse (without segment_id)
+    """
+    counts = np.array([row['readings'] for row in rows], dtype=np.int64)
+    n = int(counts.sum())
+    if n == 0:
+        return {'mean_speed': 0, 'median_speed': 0, 'std_dev': 0,
+                'percentile_25': 0, 'percentile_75': 0,
+                'min_speed': 0, 'max_speed': 0, 'sample_size': 0}
+
+    mins = np.array([row['min_speed'] for row in rows], dtype=float)
+    maxs = np.array([row['max_speed'] for row in rows], dtype=float)
+    total = float(sum(row['speed_sum'] for row in rows))
+    total_sq = float(sum(row['speed_sq_sum'] for row in rows))
+
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+
+    def percentile(q: float) -> float:
+        # Linear interpolation between order statistics, as np.percentile
+        position = q / 100 * (n - 1)
+        below, above = np.floor(position), np.ceil(position)
+        values = _order_statistics(np.array([below, above]), counts, mins, maxs)
+        return float(values[0] + (values[1] - values[0]) * (position - below))
+
+    return {
+        'mean_speed': round(mean, 2),
+        'median_speed': round(percentile(50), 2),
+        'std_dev': round(float(np.sqrt(variance)), 2),
+        'percentile_25': round(percentile(25), 2),
+        'percentile_75': round(percentile(75), 2),
+        'min_speed': round(float(mins.min()), 2),
+        'max_speed': round(float(maxs.max()), 2),
+        'sample_size': n,
+    }
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream in a stage queue
+_DONE = object()
+POLL_SECONDS = 0.1
+
+class StageStats:
+    """Time a stage spent working vs. waiting on its neighbours."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    @property
+    def utilisation(self) -> float:
+        return self.busy_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Block until there is room in q (backpressure) or the run is stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    """Block until an item arrives, or return _DONE if the run is stopped."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _DONE
+
+def run_stages(source: Iterable, stages: List[Tuple[str, Callable]],
+               queue_size: int = 2, source_name: str = 'extract') -> List[StageStats]:
+    """
+    Run a linear pipeline with every stage in its own thread.
+
+    The source iterator is consumed by the first worker, and each stage
+    function is applied to the previous stage's output in order. Stages are
+    connected by queues holding at most queue_size items, so a slow stage
+    makes the ones before it wait instead of piling up chunks in memory.
+    Items keep their order because every stage has exactly one worker.
+
+    If any stage raises, all workers stop and the first error is re-raised
+    here once every thread has exited.
+
+    Args:
+        source: Iterable producing the input items (e.g. raw chunks)
+        stages: List of (name, function) applied in order; the last
+            function's return value is discarded
+        queue_size: Maximum items waiting between two stages
+        source_name: Stage name used for the source in the stats
+
+    Returns:
+        StageStats for the source and each stage, in pipeline order
+    """
+    stop = threading.Event()
+    errors: List[Tuple[str, BaseException]] = []
+    error_lock = threading.Lock()
+
+    stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+
+    def fail(name: str, err: BaseException):
+        with error_lock:
+            if not errors:
+                errors.append((name, err))
+        stop.set()
+
+    def source_worker(stat: StageStats, out_q: queue.Queue):
+        iterator = iter(source)
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stat.busy_seconds += time.perf_counter() - started
+                stat.items += 1
+                if not _put(out_q, item, stop):
+                    return
+            _put(out_q, _DONE, stop)
+        except BaseException as err:
+            fail(stat.name, err)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def stage_worker(stat: StageStats, func: Callable, in_q: queue.Queue, out_q: queue.Queue):
+        try:
+            while True:
+                item = _get(in_q, stop)
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                result = func(item)
+                stat.busy_seconds += time.perf_counter() - started
+                stat.items += 1
+                if out_q is not None and not _put(out_q, result, stop):
+                    return
+            if out_q is not None:
+                _put(out_q, _DONE, stop)
+        except BaseException as err:
+            fail(stat.name, err)
+
+    threads = [threading.Thread(target=source_worker, args=(stats[0], queues[0]),
+                                name=f"stage-{source_name}", daemon=True)]
+    for i, (name, func) in enumerate(stages):
+        out_q = queues[i + 1] if i + 1 < len(queues) else None
+        threads.append(threading.Thread(target=stage_worker,
+                                        args=(stats[i + 1], func, queues[i], out_q),
+                                        name=f"stage-{name}", daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=POLL_SECONDS)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, stopping stages")
+        stop.set()
+        for thread in threads:
+            thread.join()
+        raise
+
+    wall = time.perf_counter() - started
+    for stat in stats:
+        stat.wall_seconds = wall
+
+    if errors:
+        name, err = errors[0]
+        logger.error(f"Stage '{name}' failed: {err}")
+        raise err
+
+    return stats
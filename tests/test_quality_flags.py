@@ -0,0 +1,63 @@
+"""
+Parity of the vectorized quality rules (transform.assign_quality_flags) with
+the row-wise function they replaced.
+
+Usage:
+    python -m pytest tests/
+"""
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transform import assign_quality_flags
+from benchmarks.bench_quality_flags import legacy_assign_quality_flag, prepare_frame
+
+def assert_parity(df: pd.DataFrame):
+    legacy = df.apply(legacy_assign_quality_flag, axis=1, result_type='expand')
+    flags, scores = assign_quality_flags(df)
+    assert flags.tolist() == legacy[0].tolist()
+    assert scores.tolist() == legacy[1].tolist()
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_generated_rows(seed):
+    assert_parity(prepare_frame(5_000, seed=seed))
+
+# (q, k, etat_trafic, etat_barre, is_speed_corrected, expected flag)
+EDGE_CASES = [
+    (np.nan, np.nan, 'Inconnu', 'Invalide', False, 'INVALID_SENSOR_NO_DATA'),
+    (np.nan, np.nan, 'Inconnu', 'Barré', False, 'OK'),
+    (np.nan, np.nan, 'Fluide', 'Invalide', True, 'CORRECTED_DECIMAL_ERROR'),
+    (300.0, 0.5, 'Fluide', 'Ouvert', False, 'INCONSISTENT_STOPPED_WITH_FLOW'),
+    (300.0, 50.0, 'Fluide', 'Ouvert', True, 'CORRECTED_DECIMAL_ERROR'),
+    (50.0, 0.5, 'Fluide', 'Ouvert', False, 'OK'),
+    (2500.0, 0.5, 'Fluide', 'Ouvert', False, 'INCONSISTENT_EXTREME_FLOW_SPEED'),
+    (np.nan, 0.5, 'Fluide', 'Ouvert', False, 'MISSING_FLOW'),
+    (400.0, np.nan, 'Fluide', 'Ouvert', False, 'MISSING_SPEED'),
+    (np.nan, 30.0, 'Fluide', 'Invalide', False, 'INVALID_SENSOR_HAS_DATA'),
+    (400.0, np.nan, 'Saturé', 'Invalide', False, 'INVALID_SENSOR_HAS_DATA'),
+    (400.0, 70.0, 'Bloqué', 'Invalide', False, 'INCONSISTENT_SPEED_STATE'),
+    (400.0, 70.0, 'Saturé', 'Barré', False, 'INCONSISTENT_SPEED_STATE'),
+    (np.nan, 70.0, 'Bloqué', 'Ouvert', False, 'MISSING_FLOW'),
+    (400.0, 60.0, 'Bloqué', 'Ouvert', False, 'OK'),
+    (2001.0, 4.9, 'Saturé', 'Barré', False, 'INCONSISTENT_EXTREME_FLOW_SPEED'),
+    (101.0, 1.9, 'Fluide', 'Ouvert', False, 'INCONSISTENT_STOPPED_WITH_FLOW'),
+    (100.0, 1.9, 'Fluide', 'Ouvert', False, 'OK'),
+    (0.0, 0.0, 'Fluide', 'Ouvert', False, 'OK'),
+]
+
+def _edge_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        [case[:5] for case in EDGE_CASES],
+        columns=['q', 'k', 'etat_trafic', 'etat_barre', 'is_speed_corrected'])
+
+def test_edge_cases():
+    flags, _ = assign_quality_flags(_edge_frame())
+    assert flags.tolist() == [case[5] for case in EDGE_CASES]
+
+def test_edge_cases_parity():
+    assert_parity(_edge_frame())
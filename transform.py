@@ -1,112 +1,158 @@
 import pandas as pd
-from typing import Dict, List, Tuple
+import numpy as np
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Union
 import logging
 
+from segment_registry import unknown_segments
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def transform_traffic_data(raw_chunk: List[Dict]) -> Dict[str, pd.DataFrame]:
+def _has_both_metrics(df: pd.DataFrame) -> pd.Series:
+    return df['q'].notna() & df['k'].notna()
+
+# Quality rules as (flag_name, quality_score, mask). Rules are checked in
+# order and the first matching rule wins, so the list order is the tier order.
+#
+# Thresholds based on:
+# - Paris average rush hour speed: 19 km/h
+# - Typical Paris city speeds: 13-17 km/h
+# - Urban arterial capacity: 1,100-1,900 veh/hr/lane
+# - Maximum flow at 40-60 km/h (not at high speeds)
+QUALITY_RULES: List[Tuple[str, float, Callable[[pd.DataFrame], pd.Series]]] = [
+    # Tier 1: Corrected decimal errors
+    ('CORRECTED_DECIMAL_ERROR', 0.7,
+     lambda df: df['is_speed_corrected'].astype(bool)),
+
+    # Tier 2: Genuine inconsistencies (only when both metrics are present)
+    # High speed + blocked state (physically impossible)
+    # Traffic can't be flowing at 60+ km/h if it's "blocked"
+    ('INCONSISTENT_SPEED_STATE', 0.5,
+     lambda df: _has_both_metrics(df) & (df['k'] > 60)
+                & df['etat_trafic'].isin(['Bloqué', 'Saturé'])),
+
+    # Extremely high flow with unrealistically low speed
+    # If flow > 2000 veh/hr (above lane capacity) but speed < 5 km/h
+    # This suggests either sensor malfunction or remaining decimal error
+    ('INCONSISTENT_EXTREME_FLOW_SPEED', 0.3,
+     lambda df: _has_both_metrics(df) & (df['q'] > 2000) & (df['k'] < 5)),
+
+    # Very high flow at moderate-low speed is NORMAL for Paris
+    # (500-1500 veh/hr at 10-25 km/h in rush hour), so it is not flagged.
+
+    # Zero or near-zero speed with high flow (cars can't flow if stopped)
+    ('INCONSISTENT_STOPPED_WITH_FLOW', 0.4,
+     lambda df: _has_both_metrics(df) & (df['q'] > 100) & (df['k'] < 2)),
+
+    # Tier 3: Sensor quality issues
+    ('INVALID_SENSOR_HAS_DATA', 0.6,
+     lambda df: (df['etat_barre'] == 'Invalide') & (df['q'].notna() | df['k'].notna())),
+    ('INVALID_SENSOR_NO_DATA', 0.1,
+     lambda df: df['etat_barre'] == 'Invalide'),
+
+    # Tier 4: Missing single metric
+    ('MISSING_FLOW', 0.8,
+     lambda df: df['q'].isna() & df['k'].notna()),
+    ('MISSING_SPEED', 0.8,
+     lambda df: df['k'].isna() & df['q'].notna()),
+]
+
+# Tier 5: Good quality (no rule matched)
+DEFAULT_QUALITY = ('OK', 1.0)
+
+# Why clean_metrics drops a row
+REJECT_NO_DATA = 'no flow or speed'
+REJECT_OUTLIER = 'impossible value (speed above 200 km/h or negative flow)'
+
+def clean_metrics(df: pd.DataFrame) -> pd.Series:
     """
-    Clean and transform raw traffic data with tiered quality assessment.
-    
+    Fix decimal errors in speed and find rows to drop.
+
+    Speeds between 0 and 1 are decimal errors and are multiplied by 100
+    (in place: 'k', plus 'k_original' and 'is_speed_corrected' columns).
+
     Args:
-        raw_chunk: List of raw traffic records
-        
+        df: DataFrame with 'q' (flow) and 'k' (speed) columns
+
     Returns:
-        Dictionary containing 'segments' and 'readings' DataFrames
+        Rejection reason per row (REJECT_NO_DATA or REJECT_OUTLIER),
+        None for rows to keep
     """
-    logger.info(f"Transforming {len(raw_chunk)} records")
-    
-    df = pd.DataFrame(raw_chunk)
-    
-    # Step 1: Fix decimal errors in speed
     df['k_original'] = df['k'].copy()
     df['is_speed_corrected'] = False
-    
+
     decimal_mask = (df['k'] > 0) & (df['k'] < 1)
     df.loc[decimal_mask, 'k'] = df.loc[decimal_mask, 'k'] * 100
     df.loc[decimal_mask, 'is_speed_corrected'] = True
-    
+
     logger.info(f"Fixed {decimal_mask.sum()} decimal errors in speed")
-    
-    # Step 2: Drop rows missing both flow and speed
+
     both_null = (df['q'].isna()) & (df['k'].isna())
-    df_clean = df[~both_null].copy()
+    outliers = ~both_null & ((df['k'] > 200) | (df['q'] < 0))
     logger.info(f"Dropped {both_null.sum()} rows with no data")
-    
-    # Step 3: Remove impossible outliers
-    outliers = (df_clean['k'] > 200) | (df_clean['q'] < 0)
-    df_clean = df_clean[~outliers]
     logger.info(f"Removed {outliers.sum()} impossible outliers")
+
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    reasons[both_null] = REJECT_NO_DATA
+    reasons[outliers] = REJECT_OUTLIER
+    return reasons
+
+def assign_quality_flags(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """
+    Assign quality flag and score (0.0-1.0) to every row using QUALITY_RULES.
+
+    Each rule is evaluated once as a boolean column mask; np.select then
+    picks the first matching rule per row.
+
+    Args:
+        df: DataFrame with 'q', 'k', 'etat_trafic', 'etat_barre'
+            and 'is_speed_corrected' columns
+
+    Returns:
+        Tuple of (flag Series, quality score Series) aligned with df
+    """
+    conditions = [mask(df).to_numpy(dtype=bool) for _, _, mask in QUALITY_RULES]
+    flags = np.select(conditions, [flag for flag, _, _ in QUALITY_RULES],
+                      default=DEFAULT_QUALITY[0])
+    scores = np.select(conditions, [score for _, score, _ in QUALITY_RULES],
+                       default=DEFAULT_QUALITY[1])
+
+    return (pd.Series(flags, index=df.index, dtype=object),
+            pd.Series(scores, index=df.index, dtype=float))
+
+def transform_traffic_data(raw_chunk: Union[List[Dict], pd.DataFrame],
+                           known_segments: Optional[Mapping[str, Tuple]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Clean and transform raw traffic data with tiered quality assessment.
     
-    # Step 4: Extract GPS coordinates
-    df_clean['latitude'] = df_clean['geo_point_2d'].apply(
-        lambda x: x['lat'] if pd.notna(x) and isinstance(x, dict) else None
-    )
-    df_clean['longitude'] = df_clean['geo_point_2d'].apply(
-        lambda x: x['lon'] if pd.notna(x) and isinstance(x, dict) else None
-    )
-    
-    # Step 5: Assign quality flags and scores
-    def assign_quality_flag(row) -> Tuple[str, float]:
-        """
-        Assign quality flag and score (0.0-1.0) based on data quality.
-        
-        Thresholds based on:
-        - Paris average rush hour speed: 19 km/h
-        - Typical Paris city speeds: 13-17 km/h
-        - Urban arterial capacity: 1,100-1,900 veh/hr/lane
-        - Maximum flow at 40-60 km/h (not at high speeds)
-        
-        Returns:
-            Tuple of (flag_name, quality_score)
-        """
-        
-        # Tier 1: Corrected decimal errors
-        if row.get('is_speed_corrected', False):
-            return 'CORRECTED_DECIMAL_ERROR', 0.7
-        
-        # Tier 2: Check for genuine inconsistencies
-        if pd.notna(row['k']) and pd.notna(row['q']):
-            
-            # High speed + blocked state (physically impossible)
-            # Traffic can't be flowing at 60+ km/h if it's "blocked"
-            if row['k'] > 60 and row['etat_trafic'] in ['Bloqué', 'Saturé']:
-                return 'INCONSISTENT_SPEED_STATE', 0.5
-            
-            # Extremely high flow with unrealistically low speed
-            # If flow > 2000 veh/hr (above lane capacity) but speed < 5 km/h
-            # This suggests either sensor malfunction or remaining decimal error
-            if row['q'] > 2000 and row['k'] < 5:
-                return 'INCONSISTENT_EXTREME_FLOW_SPEED', 0.3
-            
-            # Very high flow at moderate-low speed (this is NORMAL for Paris!)
-            # Paris rush hour: 500-1500 veh/hr at 10-25 km/h is typical
-            # DON'T flag this as inconsistent anymore
-            
-            # Zero or near-zero speed with high flow (cars can't flow if stopped)
-            if row['q'] > 100 and row['k'] < 2:
-                return 'INCONSISTENT_STOPPED_WITH_FLOW', 0.4
-        
-        # Tier 3: Sensor quality issues
-        if row['etat_barre'] == 'Invalide':
-            if pd.notna(row['q']) or pd.notna(row['k']):
-                return 'INVALID_SENSOR_HAS_DATA', 0.6
-            else:
-                return 'INVALID_SENSOR_NO_DATA', 0.1
-        
-        # Tier 4: Missing single metric
-        if pd.isna(row['q']) and pd.notna(row['k']):
-            return 'MISSING_FLOW', 0.8
-        if pd.isna(row['k']) and pd.notna(row['q']):
-            return 'MISSING_SPEED', 0.8
+    Args:
+        raw_chunk: List of raw traffic records, or a DataFrame chunk of a
+            columnar shard (with latitude/longitude already extracted)
+        known_segments: Fingerprints of segments already loaded
+            (SegmentRegistry.known). Segments found there unchanged are
+            left out of 'segments'.
         
-        # Tier 5: Good quality
-        return 'OK', 1.0
+    Returns:
+        Dictionary containing 'segments' and 'readings' DataFrames
+    """
+    logger.info(f"Transforming {len(raw_chunk)} records")
+    
+    from_shard = isinstance(raw_chunk, pd.DataFrame)
+    if from_shard:
+        # Shard chunk: dictionary-encoded columns arrive as categoricals
+        df = raw_chunk.copy()
+        for col in df.columns[df.dtypes == 'category']:
+            df[col] = df[col].astype(object)
+    else:
+        df = pd.DataFrame(raw_chunk)
     
-    df_clean[['data_quality_flag', 'quality_score']] = df_clean.apply(
-        assign_quality_flag, axis=1, result_type='expand'
-    )
+    # Steps 1-3: Fix decimal errors in speed, drop rows missing both flow
+    # and speed, remove impossible outliers
+    rejected = clean_metrics(df)
+    df_clean = df[rejected.isna()].copy()
+    
+    # Step 4: Assign quality flags and scores
+    df_clean['data_quality_flag'], df_clean['quality_score'] = assign_quality_flags(df_clean)
     
     # Log quality distribution
     quality_dist = df_clean['data_quality_flag'].value_counts()
@@ -114,23 +160,41 @@ def transform_traffic_data(raw_chunk: List[Dict]) -> Dict[str, pd.DataFrame]:
     for flag, count in quality_dist.items():
         logger.info(f"  {flag}: {count} ({count/len(df_clean)*100:.1f}%)")
     
-    # Step 6: Prepare road_segments table
-    segments_df = df_clean[['iu_ac', 'libelle', 'latitude', 'longitude', 
-                             'iu_nd_amont', 'libelle_nd_amont',
-                             'iu_nd_aval', 'libelle_nd_aval',
-                             'date_debut', 'date_fin', 'geo_shape']].copy()
-    
-    segments_df['geo_shape'] = segments_df['geo_shape'].apply(
-        lambda x: str(x) if pd.notna(x) else None
-    )
-    
-    segments_df = segments_df.drop_duplicates(subset=['iu_ac'])
+    # Step 5: Prepare road_segments table (one row per segment, before the
+    # per-row GPS and geometry work, and only for new or changed segments)
+    point_columns = ['latitude', 'longitude'] if from_shard else ['geo_point_2d']
+    segments_df = df_clean.drop_duplicates(subset=['iu_ac'])[[
+        'iu_ac', 'libelle', *point_columns,
+        'iu_nd_amont', 'libelle_nd_amont',
+        'iu_nd_aval', 'libelle_nd_aval',
+        'date_debut', 'date_fin', 'geo_shape']].copy()
+    
+    # Extract GPS coordinates (shards already have them, and geo_shape as text)
+    if not from_shard:
+        segments_df['latitude'] = segments_df['geo_point_2d'].apply(
+            lambda x: x['lat'] if pd.notna(x) and isinstance(x, dict) else None
+        )
+        segments_df['longitude'] = segments_df['geo_point_2d'].apply(
+            lambda x: x['lon'] if pd.notna(x) and isinstance(x, dict) else None
+        )
+    
+    segments_df = segments_df[unknown_segments(segments_df, known_segments)].copy()
+    
+    if not from_shard:
+        segments_df['geo_shape'] = segments_df['geo_shape'].apply(
+            lambda x: str(x) if pd.notna(x) else None
+        )
+    
+    segments_df = segments_df[['iu_ac', 'libelle', 'latitude', 'longitude',
+                               'iu_nd_amont', 'libelle_nd_amont',
+                               'iu_nd_aval', 'libelle_nd_aval',
+                               'date_debut', 'date_fin', 'geo_shape']]
     segments_df.columns = ['segment_id', 'street_name', 'latitude', 'longitude',
                            'upstream_node_id', 'upstream_node_name',
                            'downstream_node_id', 'downstream_node_name',
                            'sensor_install_date', 'sensor_end_date', 'geometry_json']
     
-    # Step 7: Prepare traffic_readings table
+    # Step 6: Prepare traffic_readings table
     readings_df = df_clean[['iu_ac', 't_1h', 'q', 'k', 'etat_trafic', 
                             'etat_barre', 'is_speed_corrected',
                             'data_quality_flag', 'quality_score']].copy()